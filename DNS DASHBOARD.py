@@ -5,71 +5,137 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler
-import matplotlib.pyplot as plt
-import time
+from streamlit_autorefresh import st_autorefresh
+from detection import DetectionEngine
+from buffers import RingBuffer
+from worker import ResultHub, session_id, start_worker
+from instrumentation import metrics
+from simulator import PROFILES, TrafficSimulator
+from detectors import DETECTORS, ScreenedDetector, create
+from live_charts import LiveScatter
 
 # --- Set Page Config ---
 st.set_page_config(page_title="DoS Anomaly Detection Dashboard", layout="wide")
 st.title("🚨 Real-Time DoS Anomaly Detection Dashboard")
 
-# --- Model Setup ---
-model = IsolationForest(contamination=0.05, random_state=42)
-scaler = StandardScaler()
-
 # --- Simulated Live Data Function ---
-def simulate_dos_traffic(batch_size=10):
-    np.random.seed(int(time.time()) % 100000)
-    return pd.DataFrame({
-        'packet_length': np.random.normal(loc=500, scale=100, size=batch_size),
-        'inter_arrival_time': np.random.exponential(scale=1.5, size=batch_size)
+def simulate_dos_traffic(simulator, batch_size=10):
+    batch = simulator.batch(batch_size)
+    return batch[['packet_length', 'inter_arrival_time']].astype(float)
+
+# --- Background Simulation ---
+HISTORY_SIZE = 10000
+
+@st.cache_resource
+def get_hub():
+    return ResultHub()
+
+hub = get_hub()
+
+@st.cache_resource
+def get_simulation_worker(profile, batch_size, interval, screen="none", escalate=False):
+    # One simulate -> score loop per (profile, batch size, refresh interval,
+    # screen), shared by every session that picked it; it only runs while one
+    # of them has the simulation started. Switching profile moves a session to
+    # another loop instead of reseeding the simulator under everyone else.
+    topic = ("simulator:dos", f"{profile}-{batch_size}x{interval}s-{screen}{'+iforest' if escalate else ''}")
+    # Each loop trains on its own history
+    engine = DetectionEngine(["packet_length", "inter_arrival_time"], contamination=0.05,
+                             retrain_interval=60, min_train_rows=5)
+    simulator = TrafficSimulator(profile, seed=42)
+    history = RingBuffer(HISTORY_SIZE, {
+        "packet_length": "float64",
+        "inter_arrival_time": "float64",
+        "anomaly": "int8",
     })
 
-# --- App State ---
-if "data" not in st.session_state:
-    st.session_state.data = pd.DataFrame(columns=["packet_length", "inter_arrival_time", "anomaly"])
+    def isolation_forest(X):
+        # Retrain only on schedule/drift, then score just the rows given
+        if engine.needs_training(X) or not engine.is_fitted:
+            train = np.column_stack([
+                np.concatenate([history.view("packet_length"), X[:, 0]]),
+                np.concatenate([history.view("inter_arrival_time"), X[:, 1]]),
+            ])
+            if engine.needs_training(train):
+                engine.fit(train)
+        # Labelled normal until the first fit; the page shows a warming-up notice
+        return engine.predict(X) if engine.is_fitted else np.ones(len(X), dtype=int)
+
+    screened = None
+    if screen != "none":
+        # O(1)-per-point online screen; only flagged rows reach Isolation Forest
+        screened = ScreenedDetector(create(screen), escalate=isolation_forest if escalate else None)
+
+    def step():
+        new_data = simulate_dos_traffic(simulator, batch_size)
+        X = new_data.to_numpy(dtype=float)
+
+        new_data["anomaly"] = isolation_forest(X) if screened is None else screened.predict(X)
+        history.append(new_data)
+        return history.to_frame().copy()
+
+    worker = start_worker(step, interval=interval, store=hub.topic(*topic), name=f"dos-simulation-{topic[1]}",
+                          active=lambda: hub.subscriber_count(*topic) > 0)
+    return topic, worker, engine, screened
 
 # --- Stream Simulation ---
 st.sidebar.subheader("Simulation Settings")
-batch_size = st.sidebar.slider("Packets per refresh", min_value=5, max_value=50, value=10, step=5)
+profile = st.sidebar.selectbox("Traffic profile", list(PROFILES))
+batch_size = st.sidebar.slider("Packets per refresh", min_value=5, max_value=5000, value=10, step=5)
 refresh_interval = st.sidebar.slider("Refresh interval (sec)", min_value=1, max_value=10, value=3)
-
+screen = st.sidebar.selectbox("Online screening detector", ["none"] + list(DETECTORS),
+                              help="Cheap streaming detector run on every packet")
+escalate = st.sidebar.checkbox("Escalate flagged packets to Isolation Forest", value=True,
+                               disabled=screen == "none")
+# escalate only means something with a screen; normalised so "none" maps to one loop
+topic, worker, engine, screened = get_simulation_worker(profile, batch_size, refresh_interval, screen,
+                                                        screen != "none" and escalate)
+sid = session_id(st.session_state)
+if st.session_state.get("sim_topic") not in (None, topic):
+    hub.unsubscribe(*st.session_state.sim_topic, sid)
+st.session_state.sim_topic = topic
+
+# Start/Stop only apply to this session; the shared loop runs while any
+# session subscribed to it has the simulation started
 if st.sidebar.button("Start Simulation"):
-    st.session_state.run = True
+    st.session_state.simulating = True
 
 if st.sidebar.button("Stop Simulation"):
-    st.session_state.run = False
-
-# --- Main Display Loop ---
-if st.session_state.get("run", False):
-    placeholder = st.empty()
-    for _ in range(100):  # simulate 100 refresh cycles
-        new_data = simulate_dos_traffic(batch_size)
-        full_data = pd.concat([st.session_state.data.drop(columns="anomaly", errors="ignore"), new_data], ignore_index=True)
-
-        scaled = scaler.fit_transform(full_data)
-        preds = model.fit_predict(scaled)
-        full_data["anomaly"] = preds
-
-        st.session_state.data = full_data
-
-        with placeholder.container():
-            st.subheader("📊 Live Traffic Data")
-            st.dataframe(full_data.tail(20), use_container_width=True)
-
-            st.subheader("🔍 Anomaly Count")
-            st.bar_chart(full_data['anomaly'].value_counts())
-
-            fig, ax = plt.subplots()
-            ax.scatter(full_data["packet_length"], full_data["inter_arrival_time"],
-                       c=full_data["anomaly"], cmap="coolwarm", alpha=0.7)
-            ax.set_xlabel("Packet Length")
-            ax.set_ylabel("Inter-Arrival Time")
-            ax.set_title("Packet Distribution with Anomaly Label")
-            st.pyplot(fig)
-
-        time.sleep(refresh_interval)
+    st.session_state.simulating = False
+
+# --- Main Display ---
+if st.session_state.get("simulating"):
+    st_autorefresh(interval=refresh_interval * 1000, key="simrefresh")
+    seq, full_data = hub.read(*topic, sid)
+else:
+    hub.unsubscribe(*topic, sid)
+    seq, full_data = worker.store.snapshot()
+st.sidebar.metric("👥 Viewers", hub.subscriber_count())
+if screened is not None:
+    st.sidebar.metric("⬆️ Escalation Rate", f"{screened.escalation_rate:.1%}")
+if worker.store.error is not None:
+    st.error(f"Simulation error: {worker.store.error}")
+if full_data is not None and not engine.is_fitted and (screened is None or escalate):
+    st.info("⏳ Isolation Forest warming up: packets are labelled normal until its first fit.")
+
+if full_data is not None:
+    with metrics.timer("render", rows=len(full_data)):
+        st.subheader("📊 Live Traffic Data")
+        st.dataframe(full_data.tail(20), use_container_width=True)
+
+        st.subheader("🔍 Anomaly Count")
+        st.bar_chart(full_data['anomaly'].value_counts())
+
+        # One figure per session, reused across reruns and only updated when
+        # the worker has published a new snapshot
+        if "packet_scatter" not in st.session_state:
+            st.session_state.packet_scatter = LiveScatter("Packet Length", "Inter-Arrival Time",
+                                                          "Packet Distribution with Anomaly Label")
+        scatter = st.session_state.packet_scatter
+        if st.session_state.get("packet_scatter_seq") != (topic, seq):
+            scatter.update(full_data["packet_length"], full_data["inter_arrival_time"], full_data["anomaly"] == -1)
+            st.session_state.packet_scatter_seq = (topic, seq)
+        st.pyplot(scatter.figure, clear_figure=False)
 
 # Download the dashboard script
 from google.colab import files
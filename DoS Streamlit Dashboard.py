@@ -1 +1 @@
-{"nbformat":4,"nbformat_minor":0,"metadata":{"colab":{"private_outputs":true,"provenance":[],"authorship_tag":"ABX9TyNMVWh0njWOCt9OvjrWcBwa"},"kernelspec":{"name":"python3","display_name":"Python 3"},"language_info":{"name":"python"}},"cells":[{"cell_type":"code","execution_count":null,"metadata":{"id":"0jvt0KpqpNc2"},"outputs":[],"source":["!pip install streamlit\n","\n","import streamlit as st\n","import pandas as pd\n","import numpy as np\n","from sklearn.ensemble import IsolationForest\n","from sklearn.preprocessing import LabelEncoder, StandardScaler\n","from sklearn.pipeline import Pipeline\n","import matplotlib.pyplot as plt\n","\n","# --- Page Config ---\n","st.set_page_config(page_title=\"DoS Anomaly Detection Dashboard\", layout=\"wide\")\n","st.title(\"🚨 DoS Anomaly Detection Dashboard\")\n","\n","# --- Load Dataset ---\n","@st.cache_data\n","def load_data():\n","    df = pd.read_csv(\"Clean_DOS_Capstone.csv\")\n","    df = df[['packet_length', 'inter_arrival_time', 'protocol']]\n","    df['protocol'] = LabelEncoder().fit_transform(df['protocol'])\n","    return df\n","\n","df = load_data()\n","st.success(\"✅ Loaded DoS dataset successfully!\")\n","\n","# --- Display Preview ---\n","st.subheader(\"📋 Data Preview\")\n","st.dataframe(df.head(10), use_container_width=True)\n","\n","# --- Isolation Forest Pipeline ---\n","model_pipeline = Pipeline([\n","    ('scaler', StandardScaler()),\n","    ('model', IsolationForest(contamination=0.01, random_state=42))\n","])\n","\n","model_pipeline.fit(df)\n","df['anomaly'] = model_pipeline.predict(df)\n","df['anomaly'] = df['anomaly'].map({1: 'Normal', -1: 'Anomaly'})\n","\n","# --- Visualization ---\n","st.subheader(\"📊 Anomaly Detection Result\")\n","\n","anomaly_count = df['anomaly'].value_counts()\n","st.write(\"🔍 Anomaly Distribution:\", anomaly_count.to_dict())\n","\n","chart_data = df.copy()\n","chart_data['Index'] = np.arange(len(df))\n","\n","for feature in ['packet_length', 'inter_arrival_time']:\n","    st.write(f\"### 📈 {feature} with Anomaly Overlay\")\n","    fig, ax = plt.subplots()\n","    normal = chart_data[chart_data['anomaly'] == 'Normal']\n","    anomaly = chart_data[chart_data['anomaly'] == 'Anomaly']\n","    ax.plot(normal['Index'], normal[feature], label='Normal', alpha=0.5)\n","    ax.scatter(anomaly['Index'], anomaly[feature], color='red', label='Anomaly', s=10)\n","    ax.set_xlabel(\"Packet Index\")\n","    ax.set_ylabel(feature)\n","    ax.legend()\n","    st.pyplot(fig)\n","\n","# --- Summary ---\n","st.subheader(\"🧾 Summary Statistics\")\n","st.write(df.describe())\n","\n","st.caption(\"Built with ❤️ using Streamlit + Isolation Forest\")"]},{"cell_type":"code","source":["!streamlit run DoS_Streamlit_Dashboard.ipynb\n"],"metadata":{"id":"TruLnX1xAPZH"},"execution_count":null,"outputs":[]},{"cell_type":"code","source":[],"metadata":{"id":"MM6-2wy6Buhu"},"execution_count":null,"outputs":[]},{"cell_type":"code","source":[],"metadata":{"id":"KRCyHXO9_hgk"},"execution_count":null,"outputs":[]}]}
\ No newline at end of file
+{"nbformat":4,"nbformat_minor":0,"metadata":{"colab":{"private_outputs":true,"provenance":[],"authorship_tag":"ABX9TyNMVWh0njWOCt9OvjrWcBwa"},"kernelspec":{"name":"python3","display_name":"Python 3"},"language_info":{"name":"python"}},"cells":[{"cell_type":"code","execution_count":null,"metadata":{"id":"0jvt0KpqpNc2"},"outputs":[],"source":["!pip install streamlit\n","\n","import os\n","import streamlit as st\n","import pandas as pd\n","import numpy as np\n","import matplotlib.pyplot as plt\n","from chunked_loader import fit_and_score\n","\n","# --- Page Config ---\n","st.set_page_config(page_title=\"DoS Anomaly Detection Dashboard\", layout=\"wide\")\n","st.title(\"🚨 DoS Anomaly Detection Dashboard\")\n","\n","# --- Load, Fit and Score in Chunks ---\n","# Bounded memory whatever the capture size: float32 features and int16\n","# protocol codes, fit on a reservoir sample, then score chunk by chunk.\n","@st.cache_resource(show_spinner=False)\n","def load_data(path, mtime):\n","    bar = st.progress(0.0, text=\"Reading capture...\")\n","    model, summary = fit_and_score(path, progress=lambda frac, stage: bar.progress(frac, text=f\"{stage}... {frac:.0%}\"))\n","    bar.empty()\n","    return model, summary\n","\n","model_pipeline, summary = load_data(\"Clean_DOS_Capstone.csv\", os.path.getmtime(\"Clean_DOS_Capstone.csv\"))\n","st.success(f\"✅ Loaded and scored {summary['rows']:,} packets from the DoS dataset!\")\n","\n","# --- Display Preview ---\n","st.subheader(\"📋 Data Preview\")\n","st.dataframe(summary[\"preview\"], use_container_width=True)\n","\n","# --- Visualization ---\n","st.subheader(\"📊 Anomaly Detection Result\")\n","\n","anomaly_count = {\"Normal\": summary[\"rows\"] - summary[\"anomalies\"], \"Anomaly\": summary[\"anomalies\"]}\n","st.write(\"🔍 Anomaly Distribution:\", anomaly_count)\n","\n","# Reservoir sample for the normal trace, plus the anomalous rows found while scoring\n","chart_data = summary[\"sample\"]\n","flagged = summary[\"anomaly_rows\"]\n","\n","for feature in ['packet_length', 'inter_arrival_time']:\n","    st.write(f\"### 📈 {feature} with Anomaly Overlay\")\n","    fig, ax = plt.subplots()\n","    normal = chart_data[chart_data['anomaly'] == 'Normal']\n","    ax.plot(normal['Index'], normal[feature], label='Normal', alpha=0.5)\n","    ax.scatter(flagged['Index'], flagged[feature], color='red', label='Anomaly', s=10)\n","    ax.set_xlabel(\"Packet Index\")\n","    ax.set_ylabel(feature)\n","    ax.legend()\n","    st.pyplot(fig)\n","    # Release the figure; pyplot otherwise keeps every one created per rerun\n","    plt.close(fig)\n","\n","# --- Summary ---\n","st.subheader(\"🧾 Summary Statistics\")\n","st.write(summary[\"describe\"])\n","\n","st.caption(\"Built with ❤️ using Streamlit + Isolation Forest\")"]},{"cell_type":"code","source":["!streamlit run DoS_Streamlit_Dashboard.ipynb\n"],"metadata":{"id":"TruLnX1xAPZH"},"execution_count":null,"outputs":[]},{"cell_type":"code","source":[],"metadata":{"id":"MM6-2wy6Buhu"},"execution_count":null,"outputs":[]},{"cell_type":"code","source":[],"metadata":{"id":"KRCyHXO9_hgk"},"execution_count":null,"outputs":[]}]}
\ No newline at end of file
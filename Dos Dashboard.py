@@ -4,59 +4,59 @@ pandas
 numpy
 matplotlib
 scikit-learn
+import os
 import streamlit as st
-import pandas as pd
-import numpy as np
-from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.pipeline import Pipeline
 import matplotlib.pyplot as plt
+from instrumentation import metrics
+from chunked_loader import fit_and_score
 
 st.set_page_config(page_title="DoS Anomaly Detection Dashboard", layout="wide")
 st.title("🚨 DoS Anomaly Detection Dashboard")
 
-# --- Load Dataset ---
-df = pd.read_csv("Clean_DOS_Capstone.csv")
-df = df[['packet_length', 'inter_arrival_time', 'protocol']]
-df['protocol'] = LabelEncoder().fit_transform(df['protocol'])
+DATA_PATH = "Clean_DOS_Capstone.csv"
 
-# --- Display Preview ---
-st.subheader("📋 Data Preview")
-st.dataframe(df.head(10), use_container_width=True)
+# --- Load, Fit and Score in Chunks ---
+# Bounded memory whatever the capture size: float32 features and int16
+# protocol codes, fit on a reservoir sample, then score chunk by chunk.
+@st.cache_resource(show_spinner=False)
+def analyse(path, mtime):
+    bar = st.progress(0.0, text="Reading capture...")
+    model, summary = fit_and_score(path, progress=lambda frac, stage: bar.progress(frac, text=f"{stage}... {frac:.0%}"))
+    bar.empty()
+    return model, summary
 
-# --- Isolation Forest Pipeline ---
-model_pipeline = Pipeline([
-    ('scaler', StandardScaler()),
-    ('model', IsolationForest(contamination=0.01, random_state=42))
-])
+model_pipeline, summary = analyse(DATA_PATH, os.path.getmtime(DATA_PATH))
 
-model_pipeline.fit(df)
-df['anomaly'] = model_pipeline.predict(df)
-df['anomaly'] = df['anomaly'].map({1: 'Normal', -1: 'Anomaly'})
+# --- Display Preview ---
+st.subheader("📋 Data Preview")
+st.dataframe(summary["preview"], use_container_width=True)
 
 # --- Visualization ---
 st.subheader("📊 Anomaly Detection Result")
 
-anomaly_count = df['anomaly'].value_counts()
-st.write("🔍 Anomaly Distribution:", anomaly_count.to_dict())
+anomaly_count = {"Normal": summary["rows"] - summary["anomalies"], "Anomaly": summary["anomalies"]}
+st.write("🔍 Anomaly Distribution:", anomaly_count)
 
-chart_data = df.copy()
-chart_data['Index'] = np.arange(len(df))
+# Reservoir sample for the normal trace, plus the anomalous rows found while scoring
+chart_data = summary["sample"]
+flagged = summary["anomaly_rows"]
 
 for feature in ['packet_length', 'inter_arrival_time']:
-    st.write(f"### 📈 {feature} with Anomaly Overlay")
-    fig, ax = plt.subplots()
-    normal = chart_data[chart_data['anomaly'] == 'Normal']
-    anomaly = chart_data[chart_data['anomaly'] == 'Anomaly']
-    ax.plot(normal['Index'], normal[feature], label='Normal', alpha=0.5)
-    ax.scatter(anomaly['Index'], anomaly[feature], color='red', label='Anomaly', s=10)
-    ax.set_xlabel("Packet Index")
-    ax.set_ylabel(feature)
-    ax.legend()
-    st.pyplot(fig)
+    with metrics.timer("render", rows=len(chart_data) + len(flagged)):
+        st.write(f"### 📈 {feature} with Anomaly Overlay")
+        fig, ax = plt.subplots()
+        normal = chart_data[chart_data['anomaly'] == 'Normal']
+        ax.plot(normal['Index'], normal[feature], label='Normal', alpha=0.5)
+        ax.scatter(flagged['Index'], flagged[feature], color='red', label='Anomaly', s=10)
+        ax.set_xlabel("Packet Index")
+        ax.set_ylabel(feature)
+        ax.legend()
+        st.pyplot(fig)
+        # Release the figure; pyplot otherwise keeps every one created per rerun
+        plt.close(fig)
 
 # --- Summary ---
 st.subheader("🧾 Summary Statistics")
-st.write(df.describe())
+st.write(summary["describe"])
 
 st.caption("Built with ❤️ using Streamlit + Isolation Forest")
@@ -0,0 +1,396 @@
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import metrics
+
+# --- Alerting ---
+# Anomalous rows are grouped into incidents instead of alerting once per row:
+# rows with the same feature signature (the order of magnitude of each
+# feature) that arrive within ``window`` seconds of each other form one
+# incident. An alert goes out once an incident has ``min_points`` rows and
+# again when it resolves; reopening the same signature within ``cooldown``
+# is deduplicated, and a token bucket caps alerts per minute. Alerts are
+# queued to a background dispatcher, so ``observe`` never waits on a webhook.
+#
+#   engine = AlertEngine(AlertDispatcher([discord_sink(url), file_sink("alerts.jsonl")]),
+#                        features=["inter_arrival_time", "packet_length"])
+#   engine.observe(df_pred)          # vectorised; only rows newer than the last call
+
+
+def _magnitude(values):
+    values = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mag = np.floor(np.log10(np.abs(values)))
+    # Zero and missing values get their own buckets
+    return np.where(np.isfinite(mag), mag, np.where(values == 0, -99, 99)).astype(np.int64)
+
+
+def describe_signature(features, codes):
+    return ", ".join(f"{f}~1e{c}" if abs(c) < 99 else f"{f}={'0' if c < 0 else 'n/a'}"
+                     for f, c in zip(features, codes))
+
+
+class Incident:
+    """Running summary of one group of anomalous rows."""
+
+    def __init__(self, incident_id, signature, description, features):
+        self.id = incident_id
+        self.signature = signature
+        self.description = description
+        self.features = list(features)
+        self.first_seen = None
+        self.last_seen = None
+        self.points = 0
+        self.peak_score = None
+        self._sums = np.zeros(len(self.features))
+        # Opened alert sent or deduplicated / held back by the rate limit
+        self.announced = False
+        self.deferred = False
+        self.alerted = False
+
+    def add(self, times, values, scores=None):
+        if self.first_seen is None:
+            self.first_seen = times[0]
+        self.last_seen = times[-1]
+        self.points += len(times)
+        self._sums += np.nansum(values, axis=0)
+        if scores is not None and np.isfinite(scores).any():
+            peak = float(np.nanmax(scores))
+            self.peak_score = peak if self.peak_score is None else max(self.peak_score, peak)
+
+    def to_dict(self):
+        return {
+            "incident": self.id,
+            "signature": self.description,
+            "first_seen": pd.Timestamp(self.first_seen, tz="UTC").isoformat(timespec="milliseconds"),
+            "last_seen": pd.Timestamp(self.last_seen, tz="UTC").isoformat(timespec="milliseconds"),
+            "duration_sec": (self.last_seen - self.first_seen) / np.timedelta64(1, "s"),
+            "points": self.points,
+            "peak_score": self.peak_score,
+            "mean": {f: float(s / self.points) for f, s in zip(self.features, self._sums)},
+        }
+
+
+class AlertEngine:
+    """Groups anomalous rows into incidents and decides which become alerts.
+
+    Incidents smaller than ``min_points`` rows (isolated false positives)
+    are tracked but never alerted on.
+
+    ``observe(df)`` only looks at rows newer than the last one it has seen,
+    so a frame re-delivered on every rerun is processed once. Grouping and
+    deduplication use the rows' own timestamps; rate limiting (``rate_limit``
+    alerts per ``rate_period`` seconds of ``clock``, wall clock by default)
+    protects the sinks. An "opened" alert held back by the limit stays
+    pending and is retried, oldest incident first, on later calls as tokens
+    come back (a last attempt is made when the incident closes); held-back
+    "resolved" alerts are dropped. Both are counted and reported with the
+    next alert.
+    """
+
+    def __init__(self, dispatch, features, window=60.0, min_points=10, cooldown=300.0, rate_limit=5,
+                 rate_period=60.0, notify_resolved=True, time_col="timestamp",
+                 anomaly_col="anomaly", anomaly_label=1, score_col="reconstruction_error",
+                 clock=time.monotonic):
+        self.dispatch = dispatch
+        self.features = list(features)
+        self.window = np.timedelta64(int(window * 1e9), "ns")
+        self.min_points = min_points
+        self.cooldown = np.timedelta64(int(cooldown * 1e9), "ns")
+        self.rate_limit = rate_limit
+        self.rate_period = rate_period
+        self.notify_resolved = notify_resolved
+        self.time_col = time_col
+        self.anomaly_col = anomaly_col
+        self.anomaly_label = anomaly_label
+        self.score_col = score_col
+        # Seconds for the rate limiter; replay.py substitutes event time
+        self.clock = clock
+
+        self.last_time = None
+        self.open = {}
+        self.recent = []
+        self.rows_seen = 0
+        self.anomalies_seen = 0
+        self.sent = 0
+        self.deduplicated = 0
+        self.rate_limited = 0
+        self._held_back = 0
+        self._last_alerted = {}
+        self._tokens = float(rate_limit)
+        self._refilled_at = None
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    # --- Grouping ---
+    def observe(self, df):
+        """Fold new rows of ``df`` into incidents; returns the alerts queued."""
+        if df is None or df.empty or self.anomaly_col not in df.columns:
+            return 0
+        times = pd.to_datetime(df[self.time_col], utc=True).dt.tz_localize(None).to_numpy(dtype="datetime64[ns]")
+        with self._lock:
+            fresh = np.ones(len(df), dtype=bool) if self.last_time is None else times > self.last_time
+            if not fresh.any():
+                return self._retry() + self._expire()
+            self.last_time = times[fresh].max()
+            self.rows_seen += int(fresh.sum())
+
+            rows = np.flatnonzero(fresh & (df[self.anomaly_col] == self.anomaly_label).to_numpy())
+            rows = rows[np.argsort(times[rows], kind="stable")]
+            self.anomalies_seen += len(rows)
+            # Incidents whose opened alert is waiting for a token go first
+            queued = self._retry()
+            if len(rows):
+                present = [f for f in self.features if f in df.columns]
+                values = np.column_stack([pd.to_numeric(df[f].iloc[rows], errors="coerce").to_numpy(dtype=float)
+                                          for f in present]) if present else np.zeros((len(rows), 0))
+                scores = pd.to_numeric(df[self.score_col].iloc[rows], errors="coerce").to_numpy(dtype=float) \
+                    if self.score_col in df.columns else None
+                codes = np.column_stack([_magnitude(values[:, i]) for i in range(len(present))]) \
+                    if present else np.zeros((len(rows), 1), dtype=np.int64)
+                # One pass per distinct signature, not per row
+                signatures, group = np.unique(codes, axis=0, return_inverse=True)
+                for g, signature in enumerate(signatures):
+                    members = np.flatnonzero(group.ravel() == g)
+                    queued += self._extend(tuple(signature.tolist()), present, times[rows[members]],
+                                           values[members], None if scores is None else scores[members])
+            return queued + self._expire()
+
+    def _extend(self, signature, present, times, values, scores):
+        queued = 0
+        # Split where the signature went quiet for longer than the window
+        breaks = np.flatnonzero(np.diff(times) > self.window) + 1
+        for part in np.split(np.arange(len(times)), breaks):
+            incident = self.open.get(signature)
+            if incident is not None and times[part[0]] - incident.last_seen > self.window:
+                queued += self._close(incident)
+                incident = None
+            if incident is None:
+                incident = Incident(self._next_id, signature, describe_signature(present, signature), present)
+                self._next_id += 1
+                self.open[signature] = incident
+            incident.add(times[part], values[part], None if scores is None else scores[part])
+            if not incident.announced and not incident.deferred and incident.points >= self.min_points:
+                queued += self._opened(incident)
+        return queued
+
+    def _retry(self):
+        queued = 0
+        for incident in sorted(self.open.values(), key=lambda i: i.first_seen):
+            if incident.deferred and not incident.announced:
+                queued += self._opened(incident)
+        return queued
+
+    def _expire(self):
+        queued = 0
+        for incident in list(self.open.values()):
+            if self.last_time - incident.last_seen > self.window:
+                queued += self._close(incident)
+        return queued
+
+    def _opened(self, incident):
+        last = self._last_alerted.get(incident.signature)
+        if last is not None and incident.first_seen - last < self.cooldown:
+            # Same kind of incident again shortly after the last alert
+            incident.announced = True
+            self.deduplicated += 1
+            metrics.incr("alerts.deduplicated")
+            return 0
+        if not self._take_token():
+            # Kept pending for _retry; counted once however often it waits
+            if not incident.deferred:
+                incident.deferred = True
+                self.rate_limited += 1
+                metrics.incr("alerts.rate_limited")
+            return 0
+        incident.announced = True
+        return self._send("opened", incident)
+
+    def _close(self, incident):
+        queued = 0
+        if not incident.announced and incident.points >= self.min_points:
+            # Last chance for an opened alert still waiting on the limit
+            queued = self._opened(incident)
+            if not incident.announced:
+                self._held_back += 1
+        del self.open[incident.signature]
+        self.recent = (self.recent + [dict(incident.to_dict(), status="resolved")])[-50:]
+        if incident.alerted and self.notify_resolved:
+            queued += self._emit("resolved", incident)
+        return queued
+
+    # --- Rate limiting ---
+    def _take_token(self):
+        now = self.clock()
+        if self._refilled_at is not None:
+            self._tokens = min(self.rate_limit,
+                               self._tokens + (now - self._refilled_at) * self.rate_limit / self.rate_period)
+        self._refilled_at = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def _emit(self, status, incident):
+        if not self._take_token():
+            self.rate_limited += 1
+            self._held_back += 1
+            metrics.incr("alerts.rate_limited")
+            return 0
+        return self._send(status, incident)
+
+    def _send(self, status, incident):
+        waiting = sum(1 for i in self.open.values() if i.deferred and not i.announced and i is not incident)
+        alert = dict(incident.to_dict(), status=status, held_back=self._held_back + waiting)
+        alert["text"] = format_alert(alert)
+        self._held_back = 0
+        incident.alerted = True
+        self._last_alerted[incident.signature] = incident.last_seen
+        self.sent += 1
+        self.dispatch(alert)
+        return 1
+
+    def incidents(self):
+        """Open incidents followed by the most recently resolved, newest first."""
+        with self._lock:
+            current = [dict(i.to_dict(), status="open") for i in self.open.values()]
+            return sorted(current, key=lambda i: i["last_seen"], reverse=True) + self.recent[::-1]
+
+    def stats(self):
+        return {
+            "rows": self.rows_seen,
+            "anomalies": self.anomalies_seen,
+            "open_incidents": len(self.open),
+            "alerts_sent": self.sent,
+            "deduplicated": self.deduplicated,
+            "rate_limited": self.rate_limited,
+        }
+
+
+def format_alert(alert):
+    icon = "🚨" if alert["status"] == "opened" else "✅"
+    text = (f"{icon} DoS incident #{alert['incident']} {alert['status']}: {alert['points']:,} anomalous points "
+            f"from {alert['first_seen']} to {alert['last_seen']} ({alert['signature']})")
+    if alert["peak_score"] is not None:
+        text += f", peak score {alert['peak_score']:.4g}"
+    if alert["held_back"]:
+        text += f". {alert['held_back']} more alert(s) held back by the rate limit"
+    return text
+
+
+# --- Dispatch ---
+class AlertDispatcher:
+    """Bounded queue drained by one daemon thread that hands every alert to
+    each sink. ``__call__`` never blocks: when the queue is full the alert is
+    dropped and counted. A failing sink doesn't stop the others."""
+
+    def __init__(self, sinks, max_pending=100):
+        self.sinks = list(sinks)
+        self.delivered = 0
+        self.dropped = 0
+        self.failures = 0
+        self.last_error = None
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="alert-dispatch", daemon=True)
+        self._thread.start()
+
+    def __call__(self, alert):
+        try:
+            self._queue.put_nowait(alert)
+        except queue.Full:
+            self.dropped += 1
+            metrics.incr("alerts.dropped")
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            alert = self._queue.get()
+            if alert is None:
+                return
+            for sink in self.sinks:
+                try:
+                    with metrics.timer("alert_dispatch"):
+                        sink(alert)
+                    self.delivered += 1
+                except Exception as e:
+                    self.failures += 1
+                    self.last_error = e
+            self._queue.task_done()
+
+    def join(self):
+        """Wait until everything queued so far has been handed to the sinks."""
+        self._queue.join()
+
+    def close(self, timeout=10.0):
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "pending": self.pending,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "failures": self.failures,
+            "last_error": None if self.last_error is None else str(self.last_error),
+        }
+
+
+# --- Sinks ---
+def discord_sink(webhook_url, timeout=5.0, max_retry_after=10.0):
+    """Post ``alert["text"]`` to a Discord webhook, waiting out one 429."""
+    import requests
+
+    session = requests.Session()
+
+    def sink(alert):
+        payload = {"content": alert["text"][:2000]}
+        response = session.post(webhook_url, json=payload, timeout=timeout)
+        if response.status_code == 429:
+            retry_after = float(response.json().get("retry_after", 1.0))
+            time.sleep(min(retry_after, max_retry_after))
+            response = session.post(webhook_url, json=payload, timeout=timeout)
+        response.raise_for_status()
+    return sink
+
+
+def file_sink(path):
+    """Append each alert as a JSON line to ``path``."""
+    def sink(alert):
+        with open(path, "a") as f:
+            f.write(json.dumps(alert) + "\n")
+    return sink
+
+
+# --- Local Stand-in for the Webhook ---
+class _WebhookHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.received.append(json.loads(raw))
+        self.send_response(204)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_webhook(host="127.0.0.1", port=0):
+    """Start a webhook stand-in that accepts Discord-style posts and keeps
+    them in ``server.received``; returns ``(server, url)`` for
+    ``discord_sink(url)``. Call ``server.shutdown()`` when done."""
+    server = ThreadingHTTPServer((host, port), _WebhookHandler)
+    server.received = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/webhook"
@@ -6,28 +6,115 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
 from streamlit_autorefresh import st_autorefresh
-import time
+from predict_api import PredictionClient
+from buffers import RingBuffer
+from worker import ResultHub, session_id, start_worker
+from instrumentation import file_sink, metrics, render_pipeline_health
+from thresholds import StreamingThreshold
+from rendering import downsample, downsample_caption
+from live_charts import LabelCounts, LiveLineFigure
+
+
+# Streamlit page configuration
+st.set_page_config(page_title="DNS Anomaly Detection Dashboard", layout="wide")
 
 # Sidebar control
 refresh = st.sidebar.checkbox("🔁 Auto-refresh every 60 seconds", value=False)
 
-# Refresh logic
-if refresh:
-    st.sidebar.warning("Refreshing in 60 seconds...")
-    time.sleep(60)
-    st.experimental_rerun()
+# Adaptive threshold quantiles offered in the sidebar; the worker tracks all
+# of them so each session can show a different one
+THRESHOLD_QUANTILES = (0.95, 0.99, 0.995, 0.999)
 
-
-# Streamlit page configuration
-st.set_page_config(page_title="DNS Anomaly Detection Dashboard", layout="wide")
+def quantile_columns(q):
+    """``(threshold, flag)`` column names for quantile ``q``."""
+    return f"threshold_p{q * 100:g}", f"adaptive_anomaly_p{q * 100:g}"
 
 # Initialize session state for predictions
+PREDICTION_DTYPES = {
+    "timestamp": "datetime64[ns]",
+    "inter_arrival_time": "float64",
+    "dns_rate": "float64",
+    "request_rate": "float64",
+    "reconstruction_error": "float64",
+    "anomaly": "int8",
+}
+for q in THRESHOLD_QUANTILES:
+    threshold_col, flag_col = quantile_columns(q)
+    PREDICTION_DTYPES[threshold_col] = "float64"
+    PREDICTION_DTYPES[flag_col] = "int8"
+history_size = st.sidebar.number_input("Prediction history size", min_value=100, max_value=100000, value=1000, step=100)
 if "predictions" not in st.session_state:
-    st.session_state.predictions = []
+    st.session_state.predictions = RingBuffer(history_size, PREDICTION_DTYPES)
+elif st.session_state.predictions.capacity != history_size:
+    st.session_state.predictions = st.session_state.predictions.resize(history_size)
 
 # API endpoint (update with Hugging Face URL if deployed)
 API_URL = "http://localhost:8000/predict"
 
+@st.cache_resource
+def get_prediction_client():
+    # One pooled keep-alive client per process, shared by every rerun/session
+    return PredictionClient(API_URL, timeout=5)
+
+prediction_client = get_prediction_client()
+
+# --- Incremental Chart State ---
+# Per-session counts and figure, fed only the rows appended since the last
+# rerun; rebuilt from the ring buffer only when the view changes or the buffer
+# was replaced (history resize).
+FLAG_COLUMNS = ("anomaly",) + tuple(quantile_columns(q)[1] for q in THRESHOLD_QUANTILES)
+
+def record(rows=None, **columns):
+    """Append rows to the prediction history and the live chart state."""
+    predictions = st.session_state.predictions
+    view = st.session_state.get("live_view")
+    n = len(rows) if rows is not None else 1
+    in_sync = view is not None and view["buffer"] is predictions and view["total"] == predictions.total
+    if in_sync:
+        for col in FLAG_COLUMNS:
+            view["counts"][col].remove(predictions.evicted(col, n))
+    # Fixed-capacity ring buffer: old rows are overwritten, nothing is reallocated
+    predictions.append(rows, **columns)
+    if in_sync:
+        added = min(n, len(predictions))
+        for col in FLAG_COLUMNS:
+            view["counts"][col].add(predictions.view(col, added))
+        view["chart"].extend(predictions.to_frame(added))
+        view["chart"].trim(predictions.view("timestamp")[0])
+        view["total"] = predictions.total
+
+def live_view(flag_column, quantile):
+    """Session chart state for the current view, rebuilt only when stale."""
+    predictions = st.session_state.predictions
+    key = flag_column
+    view = st.session_state.get("live_view")
+    if view is not None and view["key"] == key and view["buffer"] is predictions \
+            and view["total"] == predictions.total:
+        return view
+    steps = None
+    if flag_column != "anomaly":
+        steps = {quantile_columns(quantile)[0]: dict(color="green", dash="dash", shape="hv",
+                                                     name=f"Threshold (p{quantile * 100:g})")}
+    chart = LiveLineFigure("timestamp", "reconstruction_error", anomaly=flag_column, steps=steps,
+                           title="Real-Time Reconstruction Error (Red = Attack, Blue = Normal)")
+    df = predictions.to_frame()
+    chart.extend(downsample(df, "reconstruction_error", x="timestamp", keep=df[flag_column] == 1))
+    if steps is None:
+        chart.figure.add_hline(y=0.1, line_dash="dash", line_color="green", annotation_text="Threshold (0.1)")
+    counts = {col: LabelCounts() for col in FLAG_COLUMNS}
+    for col, counter in counts.items():
+        counter.reset(predictions.view(col))
+    view = {"key": key, "buffer": predictions, "total": predictions.total, "chart": chart, "counts": counts}
+    st.session_state.live_view = view
+    return view
+
+@st.cache_resource
+def start_telemetry():
+    # Stage summaries are appended to a local JSON-lines file every 10 s
+    return metrics.start_flusher(file_sink("pipeline_metrics.jsonl"), interval=10)
+
+start_telemetry()
+
 # Title and description
 st.title("Real-Time DNS Anomaly Detection Dashboard")
 st.markdown("""
@@ -35,15 +122,62 @@ This dashboard monitors DNS traffic in real-time, detecting anomalies that may i
 Use the manual input form for specific tests or watch the live stream of simulated DNS data.
 """)
 
-# Auto-refresh for real-time updates (every 3 seconds)
-st_autorefresh(interval=3000, key="datarefresh")
+# Auto-refresh for real-time updates (every 3 seconds, or 60 when selected).
+# Non-blocking: the page just reruns and reads the worker's latest results.
+st_autorefresh(interval=60000 if refresh else 3000, key="datarefresh")
 
 # Simulated DNS data stream
-def generate_dns_data():
-    return {
-        "inter_arrival_time": np.random.uniform(0.001, 1.0),  # Realistic range
-        "dns_rate": np.random.uniform(0, 100)  # Realistic range
-    }
+def generate_dns_data(n=1):
+    return pd.DataFrame({
+        "inter_arrival_time": np.random.uniform(0.001, 1.0, size=n),  # Realistic range
+        "dns_rate": np.random.uniform(0, 100, size=n)  # Realistic range
+    })
+
+@st.cache_resource
+def get_hub():
+    return ResultHub()
+
+hub = get_hub()
+
+@st.cache_resource
+def get_live_worker(points_per_refresh):
+    # One background generate -> predict loop per batch size, shared by every
+    # session that picked it; sessions only read its results
+    topic = ("simulator:dns", f"live-{points_per_refresh}")
+    thresholds = {q: StreamingThreshold(q, window=5000) for q in THRESHOLD_QUANTILES}
+
+    def step():
+        data = generate_dns_data(points_per_refresh)
+        result = prediction_client.predict_batch(data, ["inter_arrival_time", "dns_rate"])
+        result = result.drop(columns=["inter_arrival_time", "dns_rate"], errors="ignore").join(data)
+        if "request_rate" not in result.columns:
+            result["request_rate"] = 1 / result["inter_arrival_time"]
+        result["timestamp"] = np.datetime64(datetime.now())
+
+        # Running quantiles of reconstruction_error, O(1) per point each; each
+        # row is judged against the thresholds in force before it arrived
+        for q, threshold in thresholds.items():
+            threshold_col, flag_col = quantile_columns(q)
+            flags, value = threshold.screen(result["reconstruction_error"])
+            result[threshold_col] = np.nan if value is None else value
+            result[flag_col] = flags.astype(int)
+        return result
+
+    # Calls the predict API only while some session has the live stream on
+    worker = start_worker(step, interval=3.0, store=hub.topic(*topic), name=f"dns-live-stream-{points_per_refresh}",
+                          active=lambda: hub.subscriber_count(*topic) > 0)
+    return topic, worker, thresholds
+
+# Per-session choice of stream; changing it switches this session to another
+# worker instead of changing the batch size for every viewer
+points_per_refresh = st.sidebar.slider("Points per refresh", min_value=1, max_value=50, value=1)
+live_topic, live_worker, live_thresholds = get_live_worker(points_per_refresh)
+previous_topic = st.session_state.get("live_topic")
+if previous_topic != live_topic:
+    if previous_topic is not None:
+        hub.unsubscribe(*previous_topic, session_id(st.session_state))
+    st.session_state.live_topic = live_topic
+    st.session_state.live_seq = live_worker.store.seq
 
 # Input form for manual predictions
 st.header("Manual Input")
@@ -68,11 +202,16 @@ with col2:
 if st.button("Detect Anomaly"):
     payload = {"inter_arrival_time": inter_arrival_time, "dns_rate": dns_rate}
     try:
-        response = requests.post(API_URL, json=payload)
-        response.raise_for_status()
-        result = response.json()
+        result = prediction_client.predict(payload)
+        result.setdefault("request_rate", 1 / inter_arrival_time)
+        for q, live_threshold in live_thresholds.items():
+            threshold = live_threshold.value
+            if threshold is not None:
+                threshold_col, flag_col = quantile_columns(q)
+                result[threshold_col] = threshold
+                result[flag_col] = int(result["reconstruction_error"] > threshold)
+        record(**result, timestamp=np.datetime64(datetime.now()))
         result["timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        st.session_state.predictions.append(result)
         st.success("Manual prediction successful!")
         st.json(result)
     except requests.exceptions.RequestException as e:
@@ -80,67 +219,76 @@ if st.button("Detect Anomaly"):
 
 # Real-time monitoring
 st.header("Real-Time Monitoring")
+threshold_mode = st.sidebar.radio("Anomaly threshold", ["Adaptive", "Fixed (0.1)"],
+                                  help="Adaptive: running quantile of recent reconstruction errors")
+quantile = 0.99
+if threshold_mode == "Adaptive":
+    # A view option only: every quantile is tracked by the worker
+    quantile = st.sidebar.select_slider("Threshold quantile", options=THRESHOLD_QUANTILES, value=0.99)
+flag_column = quantile_columns(quantile)[1] if threshold_mode == "Adaptive" else "anomaly"
 if st.checkbox("Enable Live Stream", value=True):
-    try:
-        # Generate and predict new data point
-        data = generate_dns_data()
-        payload = {
-            "inter_arrival_time": data["inter_arrival_time"],
-            "dns_rate": data["dns_rate"]
-        }
-        response = requests.post(API_URL, json=payload)
-        response.raise_for_status()
-        result = response.json()
-        result["timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        st.session_state.predictions.append(result)
-        
-        # Limit to last 100 predictions to prevent memory issues
-        st.session_state.predictions = st.session_state.predictions[-100:]
-        
-    except requests.exceptions.RequestException as e:
-        st.error(f"Error in live stream: {e}")
+    # Pick up only the batches the worker published since this session last looked
+    st.session_state.live_seq, batches = hub.since(*live_topic, session_id(st.session_state),
+                                                   st.session_state.live_seq)
+    for batch in batches:
+        record(batch)
+    if live_worker.store.error is not None:
+        st.error(f"Error in live stream: {live_worker.store.error}")
+else:
+    hub.unsubscribe(*live_topic, session_id(st.session_state))
+    st.session_state.live_seq = live_worker.store.seq
+st.sidebar.metric("👥 Viewers", hub.subscriber_count())
+st.sidebar.metric("🎯 Cache Hit Rate", f"{hub.hit_rate:.0%}")
 
 # Display predictions
-if st.session_state.predictions:
-    df = pd.DataFrame(st.session_state.predictions)
+predictions = st.session_state.predictions
+with metrics.timer("render", rows=len(predictions)):
+    if len(predictions):
+        view = live_view(flag_column, quantile)
+        counts = view["counts"][flag_column]
     
-    # Table
-    st.subheader("Recent Predictions")
-    st.dataframe(df[["timestamp", "inter_arrival_time", "dns_rate", "request_rate", "reconstruction_error", "anomaly"]])
+        # Table, with only the selected quantile's threshold columns
+        st.subheader("Recent Predictions")
+        threshold_col, adaptive_col = quantile_columns(quantile)
+        hidden = [c for q in THRESHOLD_QUANTILES if q != quantile for c in quantile_columns(q)]
+        st.dataframe(predictions.to_frame(100).drop(columns=hidden)
+                     .rename(columns={threshold_col: "threshold", adaptive_col: "adaptive_anomaly"}))
     
-    # Line plot of reconstruction error
-    st.subheader("Reconstruction Error Over Time")
-    fig_line = px.line(
-        df,
-        x="timestamp",
-        y="reconstruction_error",
-        color="anomaly",
-        color_discrete_map={0: "blue", 1: "red"},
-        title="Real-Time Reconstruction Error (Red = Attack, Blue = Normal)"
-    )
-    fig_line.add_hline(y=0.1, line_dash="dash", line_color="green", annotation_text="Threshold (0.1)")
-    st.plotly_chart(fig_line, use_container_width=True)
+        # Line plot of reconstruction error
+        st.subheader("Reconstruction Error Over Time")
+        # Kept across reruns and extended with new points only; LTTB-compacted
+        # so it never holds more than a few thousand points
+        current = live_thresholds[quantile].value
+        if threshold_mode == "Adaptive" and current is not None:
+            st.caption(f"🎚️ Current threshold: {current:.4f} "
+                       f"(p{quantile * 100:g} of recent reconstruction errors)")
+        st.plotly_chart(view["chart"].figure, use_container_width=True)
+        caption = downsample_caption(view["chart"].points, len(predictions),
+                                     anomalies_thinned=view["chart"].anomalies_thinned)
+        if caption:
+            st.caption(caption)
     
-    # Bar chart of anomaly counts
-    st.subheader("Anomaly Distribution")
-    anomaly_counts = df["anomaly"].value_counts().reset_index()
-    anomaly_counts.columns = ["Anomaly", "Count"]
-    anomaly_counts["Anomaly"] = anomaly_counts["Anomaly"].map({0: "Normal", 1: "Attack"})
-    fig_bar = px.bar(
-        anomaly_counts,
-        x="Anomaly",
-        y="Count",
-        title="Normal vs. Attack Counts",
-        color="Anomaly",
-        color_discrete_map={"Normal": "blue", "Attack": "red"}
-    )
-    st.plotly_chart(fig_bar, use_container_width=True)
+        # Bar chart of anomaly counts
+        st.subheader("Anomaly Distribution")
+        anomaly_counts = pd.DataFrame({"Anomaly": ["Normal", "Attack"], "Count": counts.counts})
+        fig_bar = px.bar(
+            anomaly_counts,
+            x="Anomaly",
+            y="Count",
+            title="Normal vs. Attack Counts",
+            color="Anomaly",
+            color_discrete_map={"Normal": "blue", "Attack": "red"}
+        )
+        st.plotly_chart(fig_bar, use_container_width=True)
     
-    # Summary metrics
-    st.subheader("Summary")
-    col1, col2, col3 = st.columns(3)
-    col1.metric("Total Predictions", len(df))
-    col2.metric("Attack Rate", f"{df['anomaly'].mean():.2%}")
-    col3.metric("Recent Attacks", df.tail(10)["anomaly"].sum())
-else:
-    st.info("No predictions yet. Enable live stream or use manual input.")
+        # Summary metrics
+        st.subheader("Summary")
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Total Predictions", predictions.total)
+        col2.metric("Attack Rate", f"{counts.rate():.2%}")
+        col3.metric("Recent Attacks", int(predictions.view(flag_column, 10).sum()))
+    else:
+        st.info("No predictions yet. Enable live stream or use manual input.")
+
+with st.expander("🩺 Pipeline Health"):
+    render_pipeline_health({"Result hub": hub})
@@ -0,0 +1,159 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+import warnings
+
+import numpy as np
+
+# --- Offline Pipeline Benchmark ---
+# Runs ingest -> score -> render stages against the simulator and the local
+# InfluxDB / prediction API stand-ins, so no network is needed, and writes
+# per-stage latency percentiles and throughput as JSON.
+#
+#   python bench.py --sizes 1000,10000,100000 --output bench.json
+#   python bench.py --compare bench.json        # ratios against a saved run
+
+STAGES = ["fetch_parse", "cleanup", "scale", "if_fit", "if_score", "http_predict", "plot"]
+
+
+def percentiles(samples):
+    arr = np.asarray(samples)
+    return {
+        "p50": float(np.percentile(arr, 50)),
+        "p95": float(np.percentile(arr, 95)),
+        "p99": float(np.percentile(arr, 99)),
+        "mean": float(arr.mean()),
+    }
+
+
+def timed(fn, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return samples, result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, repeat, stages, seed=42):
+    import pandas as pd
+    import plotly.express as px
+    from sklearn.preprocessing import StandardScaler
+
+    from local_influx import serve as serve_influx
+    from predict_server import serve as serve_predict
+    from simulator import TrafficSimulator
+
+    influx_server, influx_url, store = serve_influx()
+    predict_server, predict_url = serve_predict()
+    # influx reads its settings at import time
+    os.environ["INFLUXDB_URL"] = influx_url
+    import influx
+    from detection import DetectionEngine
+    from predict_api import PredictionClient
+
+    client = PredictionClient(predict_url + "/predict", max_workers=4)
+    features = ["dns_rate", "inter_arrival_time"]
+    results = []
+    try:
+        for size in sizes:
+            bucket = f"bench_{size}"
+            sim = TrafficSimulator("syn_flood", seed=seed, start=pd.Timestamp.now(tz="UTC") - pd.Timedelta("1h"))
+            frame = sim.batch(size)
+            frame["_time"] = pd.date_range(end=pd.Timestamp.now(tz="UTC"), periods=size, freq="1ms")
+            store.write_frame(bucket, "dns", frame.drop(columns=["protocol"]))
+            query = influx.build_query("dns", start="-1d", bucket=bucket, fields=features)
+
+            stage_samples = {}
+            if "fetch_parse" in stages:
+                stage_samples["fetch_parse"], df = timed(lambda: influx.query_frame(query), repeat)
+            else:
+                df = frame[["_time"] + features]
+            if "cleanup" in stages:
+                def cleanup():
+                    out = df.dropna().reset_index(drop=True)
+                    out["request_rate"] = 1 / out["inter_arrival_time"]
+                    return out.replace([np.inf, -np.inf], np.nan).ffill()
+                stage_samples["cleanup"], _ = timed(cleanup, repeat)
+            X = df[features].to_numpy(dtype=float)
+            if "scale" in stages:
+                stage_samples["scale"], _ = timed(lambda: StandardScaler().fit_transform(X), repeat)
+            engine = DetectionEngine(features, contamination=0.01)
+            if "if_fit" in stages or "if_score" in stages:
+                stage_samples["if_fit"], _ = timed(lambda: engine.fit(X), repeat)
+            if "if_score" in stages:
+                stage_samples["if_score"], _ = timed(lambda: engine.predict(X), repeat)
+            if "http_predict" in stages:
+                stage_samples["http_predict"], _ = timed(lambda: client.predict_batch(df, features), repeat)
+            if "plot" in stages:
+                stage_samples["plot"], _ = timed(
+                    lambda: px.line(df, x="_time", y="dns_rate").to_plotly_json(), repeat)
+
+            for stage, samples in stage_samples.items():
+                if stage not in stages:
+                    continue
+                stats = percentiles(samples)
+                stats.update({"stage": stage, "rows": size, "repeat": repeat,
+                              "rows_per_sec": size / stats["p50"] if stats["p50"] else None})
+                results.append(stats)
+                print(f"{stage:>13} {size:>9} rows  p50 {stats['p50'] * 1000:9.2f} ms  "
+                      f"p95 {stats['p95'] * 1000:9.2f} ms  {stats['rows_per_sec'] or 0:14,.0f} rows/s")
+    finally:
+        client.close()
+        influx_server.shutdown()
+        predict_server.shutdown()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(current, baseline):
+    """Print p50 ratios (current / baseline) for matching stage and size."""
+    old = {(r["stage"], r["rows"]): r for r in baseline["results"]}
+    print(f"\nvs {baseline.get('commit')} ({baseline.get('timestamp')}), ratio > 1 is slower")
+    for r in current["results"]:
+        ref = old.get((r["stage"], r["rows"]))
+        if ref and ref["p50"]:
+            print(f"{r['stage']:>13} {r['rows']:>9} rows  {r['p50'] / ref['p50']:6.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark for the ingest -> score -> render pipeline")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000",
+                        help="comma-separated window sizes in rows")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"subset of {STAGES}")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    report = run([int(s) for s in args.sizes.split(",")], args.repeat,
+                 [s for s in args.stages.split(",") if s], seed=args.seed)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+    if not args.output:
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,181 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+# --- Time-Evicted Columnar Buffer ---
+class RollingWindow:
+    """Bounded in-memory window of the most recent points, stored as one NumPy
+    array per column.
+
+    Rows are kept in time order; anything older than ``window`` (a pandas
+    offset/Timedelta string such as ``"10m"``) relative to the newest point, or
+    beyond ``max_rows``, is evicted. Columns are taken from the first batch
+    appended unless given up front.
+    """
+
+    def __init__(self, window="10m", max_rows=50000, columns=None, time_col="_time"):
+        self.window = pd.Timedelta(window)
+        self.max_rows = max_rows
+        self.time_col = time_col
+        self.columns = list(columns) if columns is not None else None
+
+        self._capacity = 0
+        self._start = 0
+        self._end = 0
+        self._times = None
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._end - self._start
+
+    @property
+    def last_time(self):
+        if len(self) == 0:
+            return None
+        return pd.Timestamp(self._times[self._end - 1], tz="UTC")
+
+    def _allocate(self, capacity):
+        times = np.empty(capacity, dtype="datetime64[ns]")
+        data = {c: np.full(capacity, np.nan) for c in self.columns}
+        n = len(self)
+        if n:
+            times[:n] = self._times[self._start:self._end]
+            for c in self.columns:
+                data[c][:n] = self._data[c][self._start:self._end]
+        self._times, self._data = times, data
+        self._capacity, self._start, self._end = capacity, 0, n
+
+    def append(self, df):
+        """Append rows of ``df`` newer than the last stored point."""
+        if df.empty:
+            return 0
+        with self._lock:
+            if self.columns is None:
+                self.columns = [c for c in df.columns
+                                if c != self.time_col and pd.api.types.is_numeric_dtype(df[c])]
+            times = pd.to_datetime(df[self.time_col], utc=True)
+            order = np.argsort(times.to_numpy(), kind="stable")
+            times = times.dt.tz_localize(None).to_numpy(dtype="datetime64[ns]")[order]
+            if len(self):
+                keep = times > self._times[self._end - 1]
+                times, order = times[keep], order[keep]
+            n = len(times)
+            if n == 0:
+                return 0
+
+            if self._end + n > self._capacity:
+                # Compact in place when there is room, otherwise grow
+                needed = len(self) + n
+                capacity = max(self._capacity, 1024)
+                while capacity < needed:
+                    capacity *= 2
+                self._allocate(capacity)
+
+            self._times[self._end:self._end + n] = times
+            for c in self.columns:
+                if c in df.columns:
+                    values = pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=float)[order]
+                else:
+                    values = np.nan
+                self._data[c][self._end:self._end + n] = values
+            self._end += n
+            self._evict()
+            return n
+
+    def _evict(self, newest=None):
+        if newest is None:
+            newest = self._times[self._end - 1]
+        cutoff = newest - self.window.to_timedelta64()
+        first = self._start + np.searchsorted(self._times[self._start:self._end], cutoff, side="left")
+        self._start = max(first, self._end - self.max_rows)
+
+    def expire(self, now=None):
+        """Drop points older than ``window`` before ``now`` (default: wall
+        clock), so a quiet source doesn't keep showing stale data."""
+        now = pd.Timestamp.now(tz="UTC") if now is None else pd.Timestamp(now)
+        if now.tzinfo is not None:
+            now = now.tz_convert("UTC").tz_localize(None)
+        with self._lock:
+            if len(self):
+                self._evict(now.to_datetime64())
+
+    def to_frame(self):
+        """Current window as a DataFrame (copies the live slice)."""
+        with self._lock:
+            if self.columns is None:
+                return pd.DataFrame()
+            s, e = self._start, self._end
+            out = {self.time_col: pd.to_datetime(self._times[s:e]).tz_localize("UTC")}
+            for c in self.columns:
+                out[c] = self._data[c][s:e].copy()
+            return pd.DataFrame(out)
+
+
+# --- Fixed-Capacity Ring Buffer ---
+class RingBuffer:
+    """Preallocated columnar history of the last ``capacity`` rows.
+
+    Every row is written twice (at ``i`` and ``i + capacity``) so the live rows
+    are always one contiguous slice; ``view()`` and ``to_frame()`` hand out
+    NumPy views instead of copying. ``dtypes`` maps column name to dtype.
+    """
+
+    def __init__(self, capacity, dtypes):
+        self.capacity = int(capacity)
+        self.dtypes = dict(dtypes)
+        self._data = {c: np.zeros(2 * self.capacity, dtype=d) for c, d in self.dtypes.items()}
+        self._pos = 0
+        self._size = 0
+        self.total = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, rows=None, **columns):
+        """Append a batch given as a DataFrame/dict of columns, or one row as
+        keyword arguments. Missing columns are left as zero."""
+        if rows is not None:
+            columns = {c: rows[c] for c in self.dtypes if c in rows}
+        columns = {c: np.atleast_1d(np.asarray(v)) for c, v in columns.items() if c in self.dtypes}
+        if not columns:
+            return
+        n = len(next(iter(columns.values())))
+        skip = max(0, n - self.capacity)
+        idx = (self._pos + np.arange(skip, n)) % self.capacity
+        for c, arr in self._data.items():
+            values = columns[c][skip:].astype(arr.dtype) if c in columns else 0
+            arr[idx] = values
+            arr[idx + self.capacity] = values
+        self._pos = (self._pos + n) % self.capacity
+        self._size = min(self.capacity, self._size + n)
+        self.total += n
+
+    def _bounds(self, n=None):
+        n = self._size if n is None else min(n, self._size)
+        # The newest row sits just before _pos, in the mirrored half
+        end = self._pos + self.capacity if self._pos else self.capacity
+        return end - n, end
+
+    def view(self, column, n=None):
+        """Zero-copy view of the last ``n`` values of ``column``, oldest first."""
+        start, end = self._bounds(n)
+        return self._data[column][start:end]
+
+    def to_frame(self, n=None):
+        return pd.DataFrame({c: self.view(c, n) for c in self.dtypes}, copy=False)
+
+    def evicted(self, column, n):
+        """Values of ``column`` that appending ``n`` rows would overwrite,
+        oldest first, so running aggregates can be updated before the append."""
+        k = max(0, min(self._size, self._size + n - self.capacity))
+        return self.view(column)[:k]
+
+    def resize(self, capacity):
+        """New buffer of ``capacity`` keeping as many of the newest rows as fit."""
+        other = RingBuffer(capacity, self.dtypes)
+        other.append({c: self.view(c) for c in self.dtypes})
+        other.total = self.total
+        return other
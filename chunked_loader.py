@@ -0,0 +1,241 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from detection import labels_from_scores, parallel_score_samples
+from instrumentation import metrics
+
+# --- Chunked Capture Loader ---
+# Streams a DoS capture (CSV or Parquet) in fixed-size chunks with compact
+# dtypes, so memory is bounded by the chunk size rather than the file size:
+# packet_length / inter_arrival_time as float32 and protocol as int16 codes
+# assigned incrementally as new protocols appear. A CSV is copied to Parquet
+# (``parquet_cache``) while it is first read, so the scoring pass and later
+# runs read the memory-mapped copy instead of parsing the CSV again.
+#
+#   model, summary = fit_and_score("Clean_DOS_Capstone.csv", progress=bar.progress)
+
+FEATURES = ["packet_length", "inter_arrival_time", "protocol"]
+NUMERIC_DTYPES = {"packet_length": np.float32, "inter_arrival_time": np.float32}
+
+
+class CategoryEncoder:
+    """Incremental label encoder: codes follow first appearance and stay
+    stable across chunks (unlike refitting ``LabelEncoder`` per chunk)."""
+
+    def __init__(self):
+        self.codes = {}
+
+    def encode(self, values):
+        values = pd.Series(values, copy=False).astype(str)
+        for v in values.unique():
+            if v not in self.codes:
+                self.codes[v] = len(self.codes)
+        return values.map(self.codes).to_numpy(dtype=np.int16)
+
+    @property
+    def categories(self):
+        return list(self.codes)
+
+
+def iter_chunks(path, chunksize=250_000, columns=FEATURES, encoder=None, progress=None, cache=True):
+    """Yield frames of ``columns`` (``None`` for all) with compact dtypes;
+    ``progress(fraction)`` is called after each chunk with the share of the
+    file consumed. With ``cache`` a CSV is read through its Parquet copy,
+    which a complete read builds when it is missing."""
+    encoder = encoder or CategoryEncoder()
+    size = os.path.getsize(path) or 1
+    spool = None
+    if cache and not path.endswith(".parquet"):
+        from parquet_cache import ParquetSpool, csv_copy_path
+
+        copy = csv_copy_path(path, columns)
+        if os.path.exists(copy):
+            metrics.incr("parquet_cache.hit")
+            yield from iter_chunks(copy, chunksize, columns, encoder, progress, cache=False)
+            return
+        metrics.incr("parquet_cache.miss")
+        spool = ParquetSpool(copy)
+
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        source = pq.ParquetFile(path, memory_map=True)
+        total = source.metadata.num_rows or 1
+        done = 0
+        for batch in source.iter_batches(batch_size=chunksize, columns=columns):
+            done += batch.num_rows
+            yield _compact(batch.to_pandas(), encoder)
+            if progress:
+                progress(min(done / total, 1.0))
+        return
+
+    dtypes = {c: t for c, t in NUMERIC_DTYPES.items() if columns is None or c in columns}
+    try:
+        with open(path, "rb") as f:
+            for chunk in pd.read_csv(f, usecols=columns, dtype=dtypes, chunksize=chunksize):
+                if spool is not None:
+                    # Raw values, before protocol is encoded
+                    spool.write(chunk)
+                yield _compact(chunk, encoder)
+                if progress:
+                    progress(min(f.tell() / size, 1.0))
+        if spool is not None:
+            spool.commit()
+    finally:
+        # Reading stopped early or failed: no partial copy
+        if spool is not None:
+            spool.discard()
+
+
+def _compact(df, encoder):
+    for c, t in NUMERIC_DTYPES.items():
+        if c in df.columns:
+            df[c] = df[c].astype(t, copy=False)
+    if "protocol" in df.columns:
+        df["protocol"] = encoder.encode(df["protocol"])
+    return df
+
+
+class Reservoir:
+    """Uniform sample of at most ``k`` rows over a stream of chunks, kept by
+    giving every row a random priority and retaining the ``k`` smallest."""
+
+    def __init__(self, k=100_000, seed=42):
+        self.k = k
+        self.rng = np.random.default_rng(seed)
+        self.sample = None
+        self._keys = np.empty(0)
+
+    def add(self, df):
+        keys = np.concatenate([self._keys, self.rng.random(len(df))])
+        frame = df if self.sample is None else pd.concat([self.sample, df], ignore_index=True)
+        if len(frame) > self.k:
+            keep = np.argpartition(keys, self.k)[:self.k]
+            keep.sort()
+            frame, keys = frame.iloc[keep].reset_index(drop=True), keys[keep]
+        self.sample, self._keys = frame, keys
+
+
+class RunningStats:
+    """Exact streaming count / mean / std / min / max per column (Chan et al.
+    pairwise merge), so the summary table needs no second copy of the data."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = None
+        self.m2 = None
+        self.min = None
+        self.max = None
+        self.columns = None
+
+    def add(self, df):
+        x = df.to_numpy(dtype=np.float64)
+        if len(x) == 0:
+            return
+        n, mean = len(x), x.mean(axis=0)
+        m2 = ((x - mean) ** 2).sum(axis=0)
+        if self.n == 0:
+            self.columns = list(df.columns)
+            self.n, self.mean, self.m2 = n, mean, m2
+            self.min, self.max = x.min(axis=0), x.max(axis=0)
+            return
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta * n / total
+        self.m2 = self.m2 + m2 + delta ** 2 * self.n * n / total
+        self.n = total
+        self.min = np.minimum(self.min, x.min(axis=0))
+        self.max = np.maximum(self.max, x.max(axis=0))
+
+    def describe(self, sample=None):
+        """``DataFrame.describe()``-shaped table; quartiles come from
+        ``sample`` when given, the other rows are exact."""
+        std = np.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else np.full(len(self.columns), np.nan)
+        rows = {"count": np.full(len(self.columns), self.n), "mean": self.mean, "std": std, "min": self.min}
+        if sample is not None and len(sample):
+            q = sample[self.columns].quantile([0.25, 0.5, 0.75]).to_numpy()
+            rows.update({"25%": q[0], "50%": q[1], "75%": q[2]})
+        rows["max"] = self.max
+        return pd.DataFrame(rows, index=self.columns).T
+
+
+def build_pipeline(contamination=0.01, random_state=42, n_jobs=-1):
+    from sklearn.ensemble import IsolationForest
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    return Pipeline([
+        ('scaler', StandardScaler()),
+        ('model', IsolationForest(contamination=contamination, random_state=random_state, n_jobs=n_jobs))
+    ])
+
+
+def fit_and_score(path, chunksize=250_000, sample_size=100_000, contamination=0.01,
+                  max_anomalies=50_000, progress=None, seed=42, n_jobs=-1):
+    """Two passes over ``path`` with bounded memory: fit on a reservoir
+    sample, then score chunk by chunk.
+
+    Returns ``(pipeline, summary)`` where ``summary`` holds the encoder, exact
+    row/anomaly counts, a ``describe()`` table, a head preview, and plot data:
+    the reservoir sample and up to ``max_anomalies`` anomalous rows, each
+    carrying an ``Index`` column with its row number in the file.
+    """
+    encoder = CategoryEncoder()
+    reservoir = Reservoir(sample_size, seed)
+    stats = RunningStats()
+    preview = None
+    offset = 0
+
+    def report(stage, base):
+        return (lambda fraction: progress(base + fraction / 2, stage)) if progress else None
+
+    for chunk in iter_chunks(path, chunksize, encoder=encoder, progress=report("Sampling", 0.0)):
+        with metrics.timer("preprocess", rows=len(chunk)):
+            chunk["Index"] = np.arange(offset, offset + len(chunk))
+            offset += len(chunk)
+            if preview is None:
+                preview = chunk[FEATURES].head(10)
+            stats.add(chunk[FEATURES])
+            reservoir.add(chunk)
+
+    pipeline = build_pipeline(contamination, seed, n_jobs)
+    sample = reservoir.sample
+    if sample is None or sample.empty:
+        raise ValueError(f"No rows found in {path}")
+    with metrics.timer("train", rows=len(sample)):
+        pipeline.fit(sample[FEATURES].to_numpy(dtype=float))
+
+    anomalies = []
+    kept = 0
+    anomaly_count = 0
+    offset = 0
+    for chunk in iter_chunks(path, chunksize, encoder=encoder, progress=report("Scoring", 0.5)):
+        with metrics.timer("score", rows=len(chunk)):
+            scores = parallel_score_samples(pipeline, chunk[FEATURES], n_jobs)
+            labels = labels_from_scores(pipeline, scores)
+        flagged = labels == -1
+        anomaly_count += int(flagged.sum())
+        if kept < max_anomalies and flagged.any():
+            rows = chunk[flagged].head(max_anomalies - kept).copy()
+            rows["Index"] = offset + np.flatnonzero(flagged)[:len(rows)]
+            anomalies.append(rows)
+            kept += len(rows)
+        offset += len(chunk)
+
+    sample = sample.copy()
+    sample_scores = parallel_score_samples(pipeline, sample[FEATURES], n_jobs)
+    sample["anomaly"] = np.where(labels_from_scores(pipeline, sample_scores) == -1, "Anomaly", "Normal")
+    anomaly_rows = pd.concat(anomalies, ignore_index=True) if anomalies else sample.iloc[:0].drop(columns="anomaly")
+    anomaly_rows["anomaly"] = "Anomaly"
+    summary = {
+        "encoder": encoder,
+        "rows": stats.n,
+        "anomalies": anomaly_count,
+        "describe": stats.describe(sample),
+        "preview": preview,
+        "sample": sample.sort_values("Index").reset_index(drop=True),
+        "anomaly_rows": anomaly_rows,
+    }
+    return pipeline, summary
@@ -2,36 +2,46 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler
-from influxdb_client import InfluxDBClient
-import plotly.express as px
 import requests
+from datetime import datetime
+from predict_api import PredictionClient
+from influx import IncrementalFetcher
+from worker import ResultHub, session_id
+from instrumentation import metrics, render_pipeline_health
 
 # --- Streamlit Page Setup ---
 st.set_page_config(page_title="📡 DNS Anomaly Detection", layout="wide")
 st.title("📡 Real-Time DNS Anomaly Detection using Isolation Forest")
 
-# --- InfluxDB Configuration ---
-INFLUXDB_URL = "https://us-east-1-1.aws.cloud2.influxdata.com"
-INFLUXDB_TOKEN = "6gjE97dCC24hgOgWNmRXPqOS0pfc0pMSYeh5psL8e5u2T8jGeV1F17CU-U1z05if0jfTEmPRW9twNPSXN09SRQ=="
-INFLUXDB_ORG = "Anormally Detection"
-INFLUXDB_BUCKET = "realtime_dns"
+# --- Prediction API ---
+API_URL = "http://localhost:8000/predict"
+
+@st.cache_resource
+def get_prediction_client():
+    return PredictionClient(API_URL, timeout=5)
+
+prediction_client = get_prediction_client()
+
+if "predictions" not in st.session_state:
+    st.session_state.predictions = []
 
 # --- Query DNS Data from InfluxDB ---
-client = InfluxDBClient(url=INFLUXDB_URL, token=INFLUXDB_TOKEN, org=INFLUXDB_ORG)
-query_api = client.query_api()
+@st.cache_resource
+def get_fetcher():
+    return IncrementalFetcher("dns", window="5m", fields=[])
+
+@st.cache_resource
+def get_hub():
+    return ResultHub()
 
-query = f"""
-from(bucket: "{INFLUXDB_BUCKET}")
-|> range(start: -5m)
-|> filter(fn: (r) => r["_measurement"] == "dns")
-|> pivot(rowKey:["_time"], columnKey: ["_field"], valueColumn: "_value")
-"""
+def fetch_window():
+    df = get_fetcher().fetch()
+    with metrics.timer("preprocess", rows=len(df)):
+        return df.dropna().reset_index(drop=True)
 
-df = query_api.query_data_frame(query)
-df = pd.concat(df, ignore_index=True) if isinstance(df, list) else df
-df = df.dropna().reset_index(drop=True)
+# Shared by all sessions: at most one InfluxDB query per refresh window
+hub = get_hub()
+df = hub.get("influx:dns", "5m", session_id(st.session_state), fetch_window, max_age=3)
 
 if df.empty:
     st.warning("⚠️ No DNS data found in the last 5 minutes. Please check your InfluxDB source.")
@@ -76,9 +86,7 @@ with col2:
 if st.button("Detect Anomaly"):
     payload = {"inter_arrival_time": inter_arrival_time, "dns_rate": dns_rate}
     try:
-        response = requests.post(API_URL, json=payload)
-        response.raise_for_status()
-        result = response.json()
+        result = prediction_client.predict(payload)
         result["timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         st.session_state.predictions.append(result)
         st.success("Manual prediction successful!")
@@ -94,9 +102,7 @@ if st.checkbox("Enable Live Stream", value=True):
             "inter_arrival_time": data["inter_arrival_time"],
             "dns_rate": data["dns_rate"]
         }
-        response = requests.post(API_URL, json=payload)
-        response.raise_for_status()
-        result = response.json()
+        result = prediction_client.predict(payload)
         result["timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         st.session_state.predictions.append(result)
         st.session_state.predictions = st.session_state.predictions[-100:]
@@ -104,30 +110,36 @@ if st.checkbox("Enable Live Stream", value=True):
         st.error(f"Error in live stream: {e}")
 
 # Display predictions
-if st.session_state.predictions:
-    df = pd.DataFrame(st.session_state.predictions)
-    st.subheader("Recent Predictions")
-    st.dataframe(df[["timestamp", "inter_arrival_time", "dns_rate", "request_rate", "reconstruction_error", "anomaly"]])
-    st.subheader("Reconstruction Error Over Time")
-    fig_line = px.line(df, x="timestamp", y="reconstruction_error", color="anomaly",
-                       color_discrete_map={0: "blue", 1: "red"},
-                       title="Real-Time Reconstruction Error (Red = Attack, Blue = Normal)")
-    fig_line.add_hline(y=0.1, line_dash="dash", line_color="green", annotation_text="Threshold (0.1)")
-    st.plotly_chart(fig_line, use_container_width=True)
-
-    st.subheader("Anomaly Distribution")
-    anomaly_counts = df["anomaly"].value_counts().reset_index()
-    anomaly_counts.columns = ["Anomaly", "Count"]
-    anomaly_counts["Anomaly"] = anomaly_counts["Anomaly"].map({0: "Normal", 1: "Attack"})
-    fig_bar = px.bar(anomaly_counts, x="Anomaly", y="Count",
-                     title="Normal vs. Attack Counts", color="Anomaly",
-                     color_discrete_map={"Normal": "blue", "Attack": "red"})
-    st.plotly_chart(fig_bar, use_container_width=True)
-
-    st.subheader("Summary")
-    col1, col2, col3 = st.columns(3)
-    col1.metric("Total Predictions", len(df))
-    col2.metric("Attack Rate", f"{df['anomaly'].mean():.2%}")
-    col3.metric("Recent Attacks", df.tail(10)["anomaly"].sum())
-else:
-    st.info("No predictions yet. Enable live stream or use manual input.")
+with metrics.timer("render", rows=len(st.session_state.predictions)):
+    if st.session_state.predictions:
+        # plotly is only needed once there is something to chart
+        import plotly.express as px
+        df = pd.DataFrame(st.session_state.predictions)
+        st.subheader("Recent Predictions")
+        st.dataframe(df[["timestamp", "inter_arrival_time", "dns_rate", "request_rate", "reconstruction_error", "anomaly"]])
+        st.subheader("Reconstruction Error Over Time")
+        fig_line = px.line(df, x="timestamp", y="reconstruction_error", color="anomaly",
+                           color_discrete_map={0: "blue", 1: "red"},
+                           title="Real-Time Reconstruction Error (Red = Attack, Blue = Normal)")
+        fig_line.add_hline(y=0.1, line_dash="dash", line_color="green", annotation_text="Threshold (0.1)")
+        st.plotly_chart(fig_line, use_container_width=True)
+
+        st.subheader("Anomaly Distribution")
+        anomaly_counts = df["anomaly"].value_counts().reset_index()
+        anomaly_counts.columns = ["Anomaly", "Count"]
+        anomaly_counts["Anomaly"] = anomaly_counts["Anomaly"].map({0: "Normal", 1: "Attack"})
+        fig_bar = px.bar(anomaly_counts, x="Anomaly", y="Count",
+                         title="Normal vs. Attack Counts", color="Anomaly",
+                         color_discrete_map={"Normal": "blue", "Attack": "red"})
+        st.plotly_chart(fig_bar, use_container_width=True)
+
+        st.subheader("Summary")
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Total Predictions", len(df))
+        col2.metric("Attack Rate", f"{df['anomaly'].mean():.2%}")
+        col3.metric("Recent Attacks", df.tail(10)["anomaly"].sum())
+    else:
+        st.info("No predictions yet. Enable live stream or use manual input.")
+
+with st.expander("🩺 Pipeline Health"):
+    render_pipeline_health({"Result hub": hub})
@@ -0,0 +1,271 @@
+import pickle
+import struct
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import metrics
+
+# sklearn and joblib are imported where they are used, so a dashboard that
+# restores a saved model doesn't pay for them before its first render
+
+
+# --- Parallel Scoring ---
+# Windows above ``2 * shard_rows`` are split into row shards and scored in
+# worker processes (joblib's reusable loky pool); smaller ones run inline,
+# where process start-up and pickling would cost more than they save.
+SHARD_ROWS = 100_000
+# Scores per call fed to the adaptive threshold's P² estimators; larger
+# windows are subsampled so updating the threshold stays cheap next to the
+# parallel scoring
+THRESHOLD_SAMPLE = 10_000
+
+
+def _score_shard(pipeline, X):
+    return pipeline.score_samples(X)
+
+
+def parallel_score_samples(pipeline, X, n_jobs=-1, shard_rows=SHARD_ROWS, backend="loky"):
+    """``pipeline.score_samples(X)`` sharded across ``n_jobs`` workers."""
+    from joblib import Parallel, delayed, effective_n_jobs
+
+    X = np.asarray(X, dtype=float)
+    n_jobs = effective_n_jobs(n_jobs)
+    if n_jobs == 1 or len(X) < 2 * shard_rows:
+        return pipeline.score_samples(X)
+    shards = np.array_split(X, max(n_jobs, -(-len(X) // shard_rows)))
+    results = Parallel(n_jobs=n_jobs, backend=backend)(delayed(_score_shard)(pipeline, shard) for shard in shards)
+    return np.concatenate(results)
+
+
+def labels_from_scores(pipeline, scores):
+    """sklearn labels (``-1`` anomaly, ``1`` normal) from ``score_samples``
+    output, matching ``IsolationForest.predict`` without a second pass."""
+    return np.where(scores < pipeline[-1].offset_, -1, 1)
+
+
+# --- Incremental Isolation Forest Engine ---
+class DetectionEngine:
+    """Scaler + IsolationForest that retrains on a schedule or on drift and
+    otherwise only scores rows it has not seen before.
+
+    One instance is meant to live in ``st.cache_resource`` so every rerun and
+    every session reuses the same fitted pipeline. With a
+    ``model_store.ModelStore`` every fit is saved under ``model_name`` and the
+    latest one is restored on first use, so a restart scores without
+    retraining.
+    """
+
+    def __init__(self, features, contamination=0.01, retrain_interval=300,
+                 drift_threshold=2.0, min_train_rows=50, random_state=42, n_jobs=-1,
+                 adaptive_threshold=None, clock=time.time, store=None, model_name="iforest"):
+        self.features = list(features)
+        self.contamination = contamination
+        # Optional thresholds.StreamingThreshold (tail="lower") replacing the
+        # fixed contamination cut-off once it has warmed up
+        self.adaptive_threshold = adaptive_threshold
+        self.n_jobs = n_jobs
+        self.retrain_interval = retrain_interval
+        self.drift_threshold = drift_threshold
+        self.min_train_rows = min_train_rows
+        self.random_state = random_state
+        # Seconds for the retrain schedule; replay.py substitutes event time
+        self.clock = clock
+        self.store = store
+        self.model_name = model_name
+
+        self.pipeline = None
+        self.trained_at = None
+        self.restored_at = None
+        self.train_count = 0
+        self.train_latency = 0.0
+        self.score_latency = 0.0
+        self.rows_scored = 0
+
+        self._train_mean = None
+        self._train_std = None
+        self._scored = self._empty_scored()
+        self._lock = threading.Lock()
+        self._restore_pending = store is not None
+
+    def _build(self):
+        from sklearn.ensemble import IsolationForest
+        from sklearn.pipeline import Pipeline
+        from sklearn.preprocessing import StandardScaler
+
+        return Pipeline([
+            ('scaler', StandardScaler()),
+            ('clf', IsolationForest(contamination=self.contamination,
+                                    random_state=self.random_state, n_jobs=self.n_jobs))
+        ])
+
+    @staticmethod
+    def _empty_scored():
+        return pd.DataFrame({"label": pd.Series(dtype="int64"), "score": pd.Series(dtype="float64")})
+
+    @property
+    def is_fitted(self):
+        return self.pipeline is not None
+
+    @property
+    def threshold(self):
+        """``score_samples`` value below which a row is labelled anomalous."""
+        if not self.is_fitted:
+            return None
+        if self.adaptive_threshold is not None and self.adaptive_threshold.is_ready:
+            return self.adaptive_threshold.value
+        return self.pipeline[-1].offset_
+
+    @property
+    def model_version(self):
+        """Identifies the fitted pipeline, e.g. for tagging persisted scores."""
+        if not self.is_fitted:
+            return None
+        return f"iforest-{int(self.trained_at)}-{self.train_count}"
+
+    def drift(self, X):
+        """Largest per-feature mean shift of ``X`` from the training data, in
+        training standard deviations."""
+        if self._train_mean is None or len(X) == 0:
+            return 0.0
+        shift = np.abs(X.mean(axis=0) - self._train_mean) / self._train_std
+        return float(np.max(shift))
+
+    def needs_training(self, X):
+        if not self.is_fitted:
+            return len(X) >= self.min_train_rows
+        # A restored model gets a full interval before its scheduled retrain
+        if self.clock() - max(self.trained_at, self.restored_at or 0) >= self.retrain_interval:
+            return len(X) >= self.min_train_rows
+        return len(X) >= self.min_train_rows and self.drift(X) > self.drift_threshold
+
+    def fit(self, X):
+        X = np.asarray(X, dtype=float)
+        start = time.perf_counter()
+        pipeline = self._build().fit(X)
+        self.train_latency = time.perf_counter() - start
+        metrics.record("train", self.train_latency, len(X))
+
+        self.pipeline = pipeline
+        self.trained_at = self.clock()
+        self.train_count += 1
+        self._train_mean = X.mean(axis=0)
+        std = X.std(axis=0)
+        self._train_std = np.where(std > 0, std, 1.0)
+        # Labels and scores from the previous model are no longer comparable
+        self._scored = self._empty_scored()
+        if self.adaptive_threshold is not None:
+            self.adaptive_threshold.reset()
+        self._save(X)
+        return self
+
+    # --- Persistence ---
+    def _save(self, X):
+        if self.store is None:
+            return
+        try:
+            self.store.save(self.model_name, self.pipeline, self.features, trained_at=self.trained_at,
+                            train_count=self.train_count, train_rows=len(X),
+                            train_mean=self._train_mean.tolist(), train_std=self._train_std.tolist())
+        except OSError:
+            # A read-only or full disk shouldn't stop scoring
+            metrics.incr("model_store.save_error")
+
+    def restore(self):
+        """Load the latest saved pipeline for ``model_name``; returns whether
+        one was found. Only tried once, on first use."""
+        self._restore_pending = False
+        if self.store is None:
+            return False
+        try:
+            pipeline, manifest = self.store.load(self.model_name, features=self.features)
+        except (ValueError, OSError, EOFError, pickle.UnpicklingError, struct.error):
+            # A corrupt or unreadable artifact means training a fresh model,
+            # not failing the scoring call that triggered the restore
+            metrics.incr("model_store.load_error")
+            return False
+        if pipeline is None:
+            return False
+        meta = manifest["metadata"]
+        self.pipeline = pipeline
+        self.trained_at = meta["trained_at"]
+        self.train_count = meta["train_count"]
+        self.restored_at = self.clock()
+        self._train_mean = np.asarray(meta["train_mean"])
+        self._train_std = np.asarray(meta["train_std"])
+        self._scored = self._empty_scored()
+        if self.adaptive_threshold is not None:
+            self.adaptive_threshold.reset()
+        return True
+
+    def score(self, X):
+        """Return ``(labels, scores)`` for ``X``: sklearn labels (``-1``
+        anomaly, ``1`` normal) and the ``score_samples`` they are cut from
+        (lower is more abnormal, see ``threshold``). Large inputs are scored
+        in parallel shards."""
+        X = np.asarray(X, dtype=float)
+        start = time.perf_counter()
+        scores = parallel_score_samples(self.pipeline, X, n_jobs=self.n_jobs)
+        if self.adaptive_threshold is not None:
+            flags, _ = self.adaptive_threshold.screen(scores, default=self.pipeline[-1].offset_,
+                                                      chunk_rows=SHARD_ROWS, max_learn=THRESHOLD_SAMPLE)
+            labels = np.where(flags, -1, 1)
+        else:
+            labels = labels_from_scores(self.pipeline, scores)
+        self.score_latency = time.perf_counter() - start
+        metrics.record("score", self.score_latency, len(X))
+        self.rows_scored += len(X)
+        return labels, scores
+
+    def predict(self, X):
+        """Score ``X`` with the current pipeline, returning sklearn labels
+        (``-1`` anomaly, ``1`` normal)."""
+        return self.score(X)[0]
+
+    def process(self, df, time_col="_time", with_scores=False):
+        """Return labels aligned to ``df.index``, training only when due and
+        scoring only rows whose ``time_col`` has not been scored yet.
+
+        Rows that cannot be scored (engine not fitted yet, missing features)
+        are returned as ``NaN``. With ``with_scores`` a ``(labels, scores)``
+        pair is returned instead.
+        """
+        with self._lock:
+            if self._restore_pending:
+                self.restore()
+            X = df[self.features].dropna()
+            if self.needs_training(X.to_numpy()):
+                self.fit(X.to_numpy())
+            if not self.is_fitted:
+                empty = pd.Series(np.nan, index=df.index)
+                return (empty, empty.copy()) if with_scores else empty
+
+            keys = df.loc[X.index, time_col]
+            new = ~keys.isin(self._scored.index)
+            if new.any():
+                labels, scores = self.score(X[new.to_numpy()].to_numpy())
+                fresh = pd.DataFrame({"label": labels, "score": scores}, index=keys[new].to_numpy())
+                self._scored = pd.concat([self._scored, fresh])
+                self._scored = self._scored[~self._scored.index.duplicated(keep="last")]
+            else:
+                self.score_latency = 0.0
+
+            # Forget rows that have left the caller's window
+            self._scored = self._scored[self._scored.index.isin(keys)]
+            labels = pd.Series(keys.map(self._scored["label"]).to_numpy(), index=X.index).reindex(df.index)
+            if not with_scores:
+                return labels
+            scores = pd.Series(keys.map(self._scored["score"]).to_numpy(), index=X.index).reindex(df.index)
+            return labels, scores
+
+    def stats(self):
+        return {
+            "trained_at": self.trained_at,
+            "train_count": self.train_count,
+            "restored_at": self.restored_at,
+            "train_latency": self.train_latency,
+            "score_latency": self.score_latency,
+            "rows_scored": self.rows_scored,
+        }
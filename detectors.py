@@ -0,0 +1,299 @@
+import threading
+
+import numpy as np
+
+from instrumentation import metrics
+from thresholds import StreamingThreshold
+
+# --- Online Detectors ---
+# Cheap streaming detectors sharing one interface: ``score(X)`` returns one
+# anomaly score per row (higher is more anomalous), ``partial_fit(X)`` folds
+# the rows into the model state, and ``update(X)`` does both, scoring each
+# batch against the state from before it. Per-point cost is O(1), so they
+# can screen full-rate streams and pass only suspicious rows to
+# IsolationForest or the remote model.
+#
+#   scores, flags = create("ewma").screen(X)
+#   screen = ScreenedDetector(create("hst"), escalate=engine.predict)
+#   labels = screen.predict(X)          # sklearn labels, -1 = anomaly
+
+DETECTORS = {}
+
+
+def register(name):
+    """Class decorator adding a detector to ``DETECTORS`` under ``name``."""
+    def decorate(cls):
+        DETECTORS[name] = cls
+        cls.name = name
+        return cls
+    return decorate
+
+
+def create(name, **kwargs):
+    if name not in DETECTORS:
+        raise ValueError(f"Unknown detector '{name}', expected one of {list(DETECTORS)}")
+    return DETECTORS[name](**kwargs)
+
+
+class Detector:
+    """Base class: subclasses implement ``score`` and ``partial_fit``."""
+
+    name = None
+    threshold = None
+
+    def __init__(self):
+        self.n_seen = 0
+        self._lock = threading.Lock()
+
+    def score(self, X):
+        raise NotImplementedError
+
+    def partial_fit(self, X):
+        raise NotImplementedError
+
+    @property
+    def is_ready(self):
+        return self.n_seen > 0
+
+    def update(self, X):
+        """Score ``X`` against the current state, then learn from it."""
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        with self._lock:
+            scores = self.score(X) if self.is_ready else np.zeros(len(X))
+            self.partial_fit(X)
+        return scores
+
+    def is_anomaly(self, scores):
+        return np.asarray(scores) > self.threshold
+
+    def screen(self, X):
+        """Like ``update`` but also returns the anomaly flags, judged against
+        the threshold in force before ``X`` was learned."""
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        with self._lock:
+            if self.is_ready:
+                scores = self.score(X)
+                flags = self.is_anomaly(scores)
+            else:
+                scores, flags = np.zeros(len(X)), np.zeros(len(X), dtype=bool)
+            self.partial_fit(X)
+        return scores, flags
+
+
+def _ew_weights(alpha, n):
+    """Weights of each of ``n`` new points in an EWMA after the batch, and the
+    remaining weight of the previous state."""
+    decay = (1 - alpha) ** np.arange(n - 1, -1, -1)
+    return alpha * decay, (1 - alpha) ** n
+
+
+@register("ewma")
+class EWMAZScore(Detector):
+    """Exponentially weighted mean/variance per feature; the score is the
+    largest absolute z-score across features."""
+
+    def __init__(self, alpha=0.01, threshold=4.0):
+        super().__init__()
+        self.alpha = alpha
+        self.threshold = threshold
+        self.mean = None
+        self.var = None
+
+    def score(self, X):
+        std = np.sqrt(np.maximum(self.var, 1e-12))
+        return np.max(np.abs(X - self.mean) / std, axis=1)
+
+    def partial_fit(self, X):
+        if self.mean is None:
+            self.mean, self.var = X.mean(axis=0), X.var(axis=0)
+        else:
+            w, keep = _ew_weights(self.alpha, len(X))
+            mean = keep * self.mean + w @ X
+            # West's EW variance, applied in closed form over the batch
+            self.var = keep * self.var + w @ ((X - self.mean) * (X - mean))
+            self.mean = mean
+        self.n_seen += len(X)
+
+
+@register("mad")
+class RobustMAD(Detector):
+    """Modified z-score ``0.6745 * |x - median| / MAD`` per feature.
+
+    The median and the MAD are streaming P² estimates (``StreamingThreshold``
+    at q=0.5) following the last one to two ``window`` points, so each point
+    costs O(1) and no history is kept. Deviations are measured from the
+    median as of the batch they arrive in.
+    """
+
+    def __init__(self, window=2048, threshold=3.5):
+        super().__init__()
+        self.window = window
+        self.threshold = threshold
+        self.median = None
+        self.mad = None
+        self._medians = None
+        self._deviations = None
+        self._mean_deviation = None
+
+    def score(self, X):
+        return np.max(0.6745 * np.abs(X - self.median) / self.mad, axis=1)
+
+    def partial_fit(self, X):
+        if self._medians is None:
+            self._medians = [StreamingThreshold(0.5, window=self.window, warmup=1) for _ in range(X.shape[1])]
+            self._deviations = [StreamingThreshold(0.5, window=self.window, warmup=1) for _ in range(X.shape[1])]
+        self.median = np.array([m.update(X[:, j]) for j, m in enumerate(self._medians)])
+        deviation = np.abs(X - self.median)
+        mad = np.array([d.update(deviation[:, j]) for j, d in enumerate(self._deviations)])
+        # Fall back to the mean absolute deviation (EWMA over about a window)
+        # when over half the recent points are identical
+        if self._mean_deviation is None:
+            self._mean_deviation = deviation.mean(axis=0)
+        else:
+            w, keep = _ew_weights(1 / self.window, len(X))
+            self._mean_deviation = keep * self._mean_deviation + w @ deviation
+        self.mad = np.where(mad > 0, mad, np.maximum(self._mean_deviation, 1e-12))
+        self.n_seen += len(X)
+
+
+@register("hst")
+class HalfSpaceTrees(Detector):
+    """Half-Space Trees (Tan, Ting & Liu, 2011).
+
+    Random axis-aligned trees over a work space fixed from the first batch.
+    Node masses counted over the previous ``window`` points form the
+    reference profile; a point is anomalous when it lands in low-mass regions.
+    The score is ``-log2`` of the mean ``mass * 2**depth`` at the deepest node
+    holding ``size_limit`` points. Unless ``threshold`` is given, it is
+    recalibrated at each window swap to ``median + k * MAD`` of the window's
+    scores, which a burst of attack traffic inside the window cannot drag up.
+    """
+
+    def __init__(self, n_trees=25, depth=10, window=1000, size_limit=None, threshold=None,
+                 k=5.0, seed=42):
+        super().__init__()
+        self.n_trees = n_trees
+        self.depth = depth
+        self.window = window
+        self.size_limit = size_limit if size_limit is not None else max(window // 10, 1)
+        self.threshold = threshold
+        self.k = k
+        self._auto_threshold = threshold is None
+        self.rng = np.random.default_rng(seed)
+        self.feature = None
+        self.split = None
+        n_nodes = 2 ** (depth + 1) - 1
+        self.reference = np.zeros((n_trees, n_nodes))
+        self.latest = np.zeros((n_trees, n_nodes))
+        self._in_window = 0
+        self._window_rows = []
+        self._has_reference = False
+
+    def _build(self, X):
+        lo, hi = X.min(axis=0), X.max(axis=0)
+        d = X.shape[1]
+        n_internal = 2 ** self.depth - 1
+        self.feature = self.rng.integers(0, d, size=(self.n_trees, n_internal))
+        self.split = np.zeros((self.n_trees, n_internal))
+        for t in range(self.n_trees):
+            s = self.rng.uniform(lo, hi)
+            half = 2 * np.maximum(s - lo, hi - s)
+            half = np.where(half > 0, half, 1.0)
+            bounds = {0: (s - half, s + half)}
+            for node in range(n_internal):
+                low, high = bounds.pop(node)
+                f = self.feature[t, node]
+                mid = (low[f] + high[f]) / 2
+                self.split[t, node] = mid
+                left_high, right_low = high.copy(), low.copy()
+                left_high[f], right_low[f] = mid, mid
+                bounds[2 * node + 1] = (low, left_high)
+                bounds[2 * node + 2] = (right_low, high)
+
+    def _paths(self, X):
+        """Node index per tree, depth and row: shape (trees, depth + 1, rows)."""
+        n = len(X)
+        paths = np.zeros((self.n_trees, self.depth + 1, n), dtype=np.int64)
+        node = np.zeros((self.n_trees, n), dtype=np.int64)
+        trees = np.arange(self.n_trees)[:, None]
+        for level in range(self.depth):
+            f = self.feature[trees, node]
+            go_right = X[np.arange(n)[None, :], f] >= self.split[trees, node]
+            node = 2 * node + 1 + go_right
+            paths[:, level + 1] = node
+        return paths
+
+    @property
+    def is_ready(self):
+        return self._has_reference
+
+    def score(self, X):
+        paths = self._paths(X)
+        trees = np.arange(self.n_trees)[:, None, None]
+        mass = self.reference[trees, paths]                       # (trees, depth+1, rows)
+        # Deepest node on each path still holding at least size_limit points
+        deep = (mass >= self.size_limit).sum(axis=1) - 1
+        deep = np.maximum(deep, 0)
+        rows = np.arange(len(X))[None, :]
+        node_mass = mass[np.arange(self.n_trees)[:, None], deep, rows] * 2.0 ** deep
+        return -np.log2(node_mass.mean(axis=0) + 1)
+
+    def partial_fit(self, X):
+        if self.feature is None:
+            self._build(X)
+        trees = np.arange(self.n_trees)[:, None]
+        start = 0
+        while start < len(X):
+            take = min(self.window - self._in_window, len(X) - start)
+            rows = X[start:start + take]
+            paths = self._paths(rows)
+            for level in range(self.depth + 1):
+                np.add.at(self.latest, (np.broadcast_to(trees, paths[:, level].shape), paths[:, level]), 1)
+            if self._auto_threshold:
+                self._window_rows.append(rows)
+            self._in_window += take
+            start += take
+            if self._in_window == self.window:
+                # Latest window becomes the reference profile; the threshold is
+                # taken from the window's own scores against the new profile
+                # scored from the old one, so it is out-of-sample once warm
+                if self._auto_threshold and self._window_rows:
+                    if not self._has_reference:
+                        self.reference = self.latest
+                    scores = self.score(np.concatenate(self._window_rows))
+                    median = np.median(scores)
+                    self.threshold = float(median + self.k * 1.4826 * np.median(np.abs(scores - median)))
+                    self._window_rows = []
+                self.reference, self.latest = self.latest, np.zeros_like(self.latest)
+                self._in_window = 0
+                self._has_reference = True
+        self.n_seen += len(X)
+
+
+# --- Screening ---
+class ScreenedDetector:
+    """Screens every row with a cheap online ``detector`` and sends only the
+    rows it flags to ``escalate(X) -> sklearn labels`` (IsolationForest,
+    the remote model, ...). Rows the screen clears are labelled normal."""
+
+    def __init__(self, detector, escalate=None):
+        self.detector = detector
+        self.escalate = escalate
+        self.screened = 0
+        self.escalated = 0
+
+    def predict(self, X):
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        with metrics.timer("screen", rows=len(X)):
+            _, suspicious = self.detector.screen(X)
+        labels = np.ones(len(X), dtype=int)
+        self.screened += len(X)
+        if suspicious.any():
+            self.escalated += int(suspicious.sum())
+            metrics.incr("screen.escalated", int(suspicious.sum()))
+            labels[suspicious] = self.escalate(X[suspicious]) if self.escalate else -1
+        return labels
+
+    @property
+    def escalation_rate(self):
+        return self.escalated / self.screened if self.screened else 0.0
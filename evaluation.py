@@ -0,0 +1,240 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from buffers import RingBuffer
+from live_charts import LabelCounts
+
+# --- Streaming Model Evaluation ---
+# Confusion counts, precision/recall/F1 and ROC/PR curves kept current as
+# labelled predictions arrive, instead of recomputed with sklearn over the
+# whole frame on every rerun. Each point costs O(1): it is added to the
+# cumulative counts, to the sliding window's counts and to per-class score
+# histograms, and the point it pushes out of the window is subtracted.
+# Memory is the window (three small columns) plus ``2 * bins`` histogram
+# cells, however many events have been evaluated.
+#
+#   evaluator = StreamingEvaluator(window=10_000)
+#   evaluator.update(df["label"], df["anomaly"], scores=df["reconstruction_error"], times=df["timestamp"])
+#   evaluator.metrics("window")["f1"], evaluator.curves("cumulative")["roc_auc"]
+
+SCOPES = ("window", "cumulative")
+
+# Cells of the flattened 2x2 confusion matrix, index = 2 * actual + predicted
+TN, FP, FN, TP = range(4)
+
+
+def _floats(values):
+    return pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+
+def _metrics(counts):
+    tn, fp, fn, tp = (int(c) for c in counts)
+    total = tn + fp + fn + tp
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return {
+        "count": total,
+        "accuracy": (tp + tn) / total if total else 0.0,
+        "precision": precision,
+        "recall": recall,
+        "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        "confusion": np.array([[tn, fp], [fn, tp]]),
+    }
+
+
+class StreamingEvaluator:
+    """Incremental binary-classification metrics, cumulative and over the
+    last ``window`` labelled predictions.
+
+    ROC/PR curves come from per-class histograms of the anomaly score over
+    ``bins`` quantile-spaced edges, fixed once the window holds ``warmup``
+    finite scores that are not all equal (scores outside that range fall in
+    the two open-ended end bins), so each curve has at most ``bins + 1``
+    points. Scored rows that leave the window before then are held as
+    ``(actual, score)`` counts and folded into the cumulative histogram
+    when the edges are fixed. ``tail="upper"`` means a higher
+    score is more anomalous (reconstruction error); use ``"lower"`` for
+    IsolationForest ``score_samples``.
+    """
+
+    def __init__(self, window=10_000, bins=200, warmup=100, tail="upper"):
+        if tail not in ("upper", "lower"):
+            raise ValueError(f"tail must be 'upper' or 'lower', got {tail!r}")
+        self.window = int(window)
+        self.bins = bins
+        self.warmup = min(warmup, self.window)
+        self.tail = tail
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.edges = None
+            self.last_time = None
+            self._held = (np.empty(0, dtype=np.int8), np.empty(0), np.empty(0, dtype=np.int64))
+            self._counts = {scope: LabelCounts(4) for scope in SCOPES}
+            self._hists = {scope: np.zeros((2, self.bins), dtype=np.int64) for scope in SCOPES}
+            self._recent = RingBuffer(self.window, {"cell": np.int8, "actual": np.int8,
+                                                    "score": np.float64})
+
+    # --- Ingest ---
+    def update(self, y_true, y_pred, scores=None, times=None):
+        """Fold in labelled predictions; rows without a label or prediction
+        are skipped. With ``times``, only rows newer than the last one
+        counted are counted, so a re-delivered (overlapping) batch is not
+        counted twice while rows skipped earlier (e.g. a failed prediction)
+        are picked up when they come back scored. Returns the number of
+        rows added."""
+        actual, predicted = _floats(y_true), _floats(y_pred)
+        score = np.full(len(actual), np.nan) if scores is None else _floats(scores)
+        keep = ~(np.isnan(actual) | np.isnan(predicted))
+        order = np.arange(len(actual))
+        if times is not None:
+            times = pd.to_datetime(pd.Series(times), utc=True).dt.tz_localize(None).to_numpy(dtype="datetime64[ns]")
+            order = np.argsort(times, kind="stable")
+            keep = keep[order]
+            times = times[order]
+        with self._lock:
+            if times is not None:
+                keep &= ~np.isnat(times)
+                if self.last_time is not None:
+                    keep &= times > self.last_time
+            rows = order[keep]
+            if not len(rows):
+                return 0
+            if times is not None:
+                # Only rows actually counted move the watermark
+                self.last_time = times[keep][-1]
+            self._add(actual[rows].astype(np.int8) != 0, predicted[rows].astype(np.int8) != 0, score[rows])
+            return len(rows)
+
+    def _add(self, actual, predicted, score):
+        cells = 2 * actual.astype(np.int8) + predicted.astype(np.int8)
+        self._counts["cumulative"].add(cells)
+
+        # Subtract what the new rows push out of the window, then add the
+        # rows that will still be in it
+        n = len(cells)
+        evicted = {c: self._recent.evicted(c, n) for c in ("cell", "actual", "score")}
+        self._counts["window"].remove(evicted["cell"])
+        tail = slice(max(0, n - self.window), n)
+        self._counts["window"].add(cells[tail])
+        if self.edges is not None:
+            self._hists["window"] -= self._histogram(evicted["actual"], evicted["score"])
+            self._hists["window"] += self._histogram(actual[tail], score[tail])
+            self._hists["cumulative"] += self._histogram(actual, score)
+        else:
+            # Rows leaving the window (or never entering it) before the bins
+            # exist, kept for the cumulative histogram
+            head = slice(0, tail.start)
+            self._hold(np.r_[evicted["actual"], actual[head]], np.r_[evicted["score"], score[head]])
+        self._recent.append(cell=cells, actual=actual.astype(np.int8), score=score)
+
+        finite = self._recent.view("score")
+        finite = finite[np.isfinite(finite)] if self.edges is None else None
+        if finite is not None and len(finite) >= self.warmup and finite.min() < finite.max():
+            # Fix the bins once there is some spread; the window histogram
+            # covers the rows still in the window and the cumulative one
+            # adds the rows held back since the start
+            self._set_edges(finite)
+            hist = self._histogram(self._recent.view("actual"), self._recent.view("score"))
+            held_actual, held_score, held_count = self._held
+            self._hists = {"window": hist, "cumulative": hist + self._histogram(held_actual, held_score, held_count)}
+            self._held = (held_actual[:0], held_score[:0], held_count[:0])
+
+    def _hold(self, actual, score):
+        # Merged into unique (actual, score) counts, so memory is the number
+        # of distinct scores seen before the bins are fixed (typically a few
+        # warm-up constants), not the number of rows
+        finite = np.isfinite(score)
+        if not finite.any():
+            return
+        held_actual, held_score, held_count = self._held
+        pairs = np.column_stack([np.r_[held_actual, np.asarray(actual)[finite]], np.r_[held_score, score[finite]]])
+        pairs, inverse = np.unique(pairs, axis=0, return_inverse=True)
+        counts = np.bincount(inverse.ravel(), weights=np.r_[held_count, np.ones(int(finite.sum()))],
+                             minlength=len(pairs))
+        self._held = (pairs[:, 0].astype(np.int8), pairs[:, 1], counts.astype(np.int64))
+
+    def _set_edges(self, scores):
+        edges = np.unique(np.quantile(scores, np.linspace(0, 1, self.bins - 1)))
+        self.edges = edges
+
+    def _histogram(self, actual, score, counts=None):
+        # Row 0 = actual normal, row 1 = actual attack; NaN scores are left out
+        finite = np.isfinite(score)
+        if not finite.any():
+            return 0
+        bins = np.searchsorted(self.edges, score[finite], side="right")
+        flat = np.asarray(actual, dtype=np.int64)[finite] * self.bins + bins
+        weights = None if counts is None else counts[finite]
+        return np.bincount(flat, weights=weights, minlength=2 * self.bins).astype(np.int64).reshape(2, self.bins)
+
+    # --- Results ---
+    def metrics(self, scope="window"):
+        """Accuracy, precision, recall, F1 (0 where undefined, like sklearn's
+        ``zero_division=0``) and the 2x2 confusion matrix for ``scope``."""
+        with self._lock:
+            return _metrics(self._counts[scope].counts)
+
+    def curves(self, scope="window"):
+        """ROC and PR curves for ``scope`` from the score histograms:
+        ``fpr``/``tpr``/``precision``/``recall`` arrays plus ``roc_auc`` and
+        ``average_precision``; ``None`` until the bins are fixed or while
+        only one class has been seen."""
+        with self._lock:
+            if self.edges is None:
+                return None
+            hist = self._hists[scope].copy()
+        negatives, positives = hist.sum(axis=1)
+        if not negatives or not positives:
+            return None
+        # Sweep the threshold from the most to the least anomalous bin
+        if self.tail == "upper":
+            hist = hist[:, ::-1]
+        fp = np.r_[0, np.cumsum(hist[0])]
+        tp = np.r_[0, np.cumsum(hist[1])]
+        fpr, tpr = fp / negatives, tp / positives
+        flagged = tp + fp
+        precision = np.divide(tp, flagged, out=np.ones(len(tp)), where=flagged > 0)
+        return {
+            "fpr": fpr,
+            "tpr": tpr,
+            "precision": precision,
+            "recall": tpr,
+            "roc_auc": float(np.trapezoid(tpr, fpr)),
+            "average_precision": float(np.sum(np.diff(tpr) * precision[1:])),
+        }
+
+    @property
+    def total(self):
+        return self._counts["cumulative"].total
+
+
+# --- Figures ---
+def confusion_figure(confusion, title=None):
+    """Annotated 2x2 heatmap; a single ``go.Heatmap`` with a text template."""
+    import plotly.graph_objects as go
+
+    fig = go.Figure(go.Heatmap(z=confusion, x=["Pred Normal", "Pred Attack"],
+                               y=["Actual Normal", "Actual Attack"], text=confusion,
+                               texttemplate="%{text:,}", colorscale="Blues", showscale=False))
+    fig.update_layout(title=title, yaxis_autorange="reversed")
+    return fig
+
+
+def curve_figures(curves):
+    """``(roc, pr)`` Plotly figures for ``StreamingEvaluator.curves()``."""
+    import plotly.graph_objects as go
+
+    roc = go.Figure(go.Scatter(x=curves["fpr"], y=curves["tpr"], mode="lines",
+                               name=f"AUC {curves['roc_auc']:.3f}"))
+    roc.add_trace(go.Scatter(x=[0, 1], y=[0, 1], mode="lines", name="Chance",
+                             line=dict(dash="dash", color="gray")))
+    roc.update_layout(title="ROC Curve", xaxis_title="False Positive Rate", yaxis_title="True Positive Rate")
+    pr = go.Figure(go.Scatter(x=curves["recall"], y=curves["precision"], mode="lines",
+                              name=f"AP {curves['average_precision']:.3f}"))
+    pr.update_layout(title="Precision-Recall Curve", xaxis_title="Recall", yaxis_title="Precision")
+    return roc, pr
@@ -0,0 +1,267 @@
+import csv
+import io
+
+import numpy as np
+import pandas as pd
+
+# --- Streaming Flux CSV Decoder ---
+# Decodes InfluxDB's annotated CSV as it streams off the socket, a batch of
+# lines at a time, straight into typed, preallocated NumPy columns (float32
+# fields, int64 nanosecond times) instead of building an object-dtype frame
+# per table and concatenating. inf/NaN handling, ``dropna`` and ``ffill``
+# happen per batch in the same pass, so peak memory is the output arrays
+# plus one batch.
+#
+#   response = query_api.query_raw(query)
+#   df = decode_flux_csv(response, fields=["dns_rate"], dropna=True)
+
+# Columns Flux adds to every table that the dashboards never use
+META_COLUMNS = {"", "result", "table", "_start", "_stop", "_measurement"}
+
+INT_TYPES = {"long", "unsignedLong"}
+
+
+class _Column:
+    """Growable typed array; rows a table did not carry are recorded as gaps
+    (NaN for floats, upcast to float64 for integers, ``None`` for strings)."""
+
+    def __init__(self, dtype, capacity):
+        self.dtype = np.dtype(dtype)
+        self.data = np.empty(capacity, dtype=self.dtype)
+        self.gaps = []
+
+    def reserve(self, capacity):
+        if capacity > len(self.data):
+            grown = np.empty(max(capacity, 2 * len(self.data)), dtype=self.dtype)
+            grown[:len(self.data)] = self.data
+            self.data = grown
+
+    def write(self, start, values):
+        self.data[start:start + len(values)] = values
+
+    def skip(self, start, stop):
+        if stop > start:
+            self.gaps.append((start, stop))
+
+    def finish(self, size):
+        data = self.data[:size]
+        if not self.gaps:
+            return data
+        if data.dtype.kind in "iub":
+            data = data.astype(np.float64)
+        elif data.dtype.kind != "f":
+            data = data.astype(object)
+        for start, stop in self.gaps:
+            data[start:stop] = np.nan if data.dtype.kind == "f" else None
+        return data
+
+
+class FluxCSVDecoder:
+    """Single-pass decoder for pivoted Flux results.
+
+    ``fields`` limits the output to those columns (plus ``_time``); by
+    default every non-metadata column is kept. ``double`` fields are stored
+    as ``float_dtype``, ``long`` as int64 and ``_time`` as int64 ns. Infinite
+    values become NaN; ``dropna`` (``True`` or a list of columns) drops rows
+    missing any of them and ``ffill`` forward-fills what is left, carrying
+    the last value across batches and tables.
+    """
+
+    def __init__(self, fields=None, float_dtype=np.float32, dropna=None, ffill=False,
+                 capacity=1024, batch_rows=10_000):
+        self.fields = list(fields) if fields else None
+        self.float_dtype = float_dtype
+        self.dropna = dropna
+        self.ffill = ffill
+        self.capacity = max(int(capacity or 0), 1)
+        self.batch_rows = batch_rows
+
+        self.size = 0
+        self.tables = 0
+        self._columns = {}
+        self._order = []
+        self._carry = {}
+
+    # --- Sections ---
+    def feed(self, lines):
+        """Consume an iterable of CSV lines (``str`` or ``bytes``)."""
+        annotations, header, batch = {}, None, []
+        for line in lines:
+            if isinstance(line, bytes):
+                line = line.decode("utf-8")
+            line = line.rstrip("\r\n")
+            if not line:
+                # A blank line ends the current table
+                self._flush(header, annotations, batch)
+                annotations, header, batch = {}, None, []
+            elif line.startswith("#"):
+                if header is not None:
+                    self._flush(header, annotations, batch)
+                    annotations, header, batch = {}, None, []
+                name, _, values = line.partition(",")
+                annotations[name] = values.split(",")
+            elif header is None:
+                header = line.split(",")
+                self._check_header(header)
+            else:
+                batch.append(line)
+                if len(batch) >= self.batch_rows:
+                    self._flush(header, annotations, batch, end=False)
+                    batch = []
+        self._flush(header, annotations, batch)
+        return self
+
+    def _check_header(self, header):
+        if "error" in header and "_time" not in header:
+            return
+        if "_time" not in header:
+            raise ValueError(f"Flux result has no _time column: {header}")
+        if "_field" in header and "_value" in header:
+            raise ValueError("Flux result is not pivoted; add "
+                             '|> pivot(rowKey: ["_time"], columnKey: ["_field"], valueColumn: "_value")')
+
+    def _flush(self, header, annotations, batch, end=True):
+        if header is None:
+            return
+        if "error" in header and "_time" not in header:
+            row = next(iter(batch), "")
+            values = dict(zip(header, next(csv.reader([row]), [])))
+            raise ValueError(f"InfluxDB query error: {values.get('error') or row}")
+        if not batch:
+            if end:
+                self.tables += 1
+            return
+
+        types = dict(zip(header, [""] + annotations.get("#datatype", [])))
+        wanted = [c for c in header if c not in META_COLUMNS and c != "_time"]
+        if self.fields is not None:
+            wanted = [c for c in wanted if c in self.fields]
+        dtypes = {"_time": str}
+        for c in wanted:
+            kind = types.get(c, "double")
+            # Nullable Int64 so an empty cell doesn't fail the whole batch
+            dtypes[c] = (self.float_dtype if kind == "double" else "Int64" if kind in INT_TYPES
+                         else "boolean" if kind == "boolean" else object)
+
+        chunk = pd.read_csv(io.StringIO("\n".join(batch)), header=None, names=header,
+                            usecols=["_time"] + wanted, dtype=dtypes, true_values=["true"],
+                            false_values=["false"], engine="c")
+        self._append(chunk, wanted, dtypes)
+        if end:
+            self.tables += 1
+
+    # --- Typed Append ---
+    def _append(self, chunk, wanted, dtypes):
+        arrays = {"_time": pd.to_datetime(chunk["_time"], utc=True, format="ISO8601")
+                  .dt.as_unit("ns").to_numpy(dtype="datetime64[ns]").view(np.int64)}
+        for c in wanted:
+            column = chunk[c]
+            if dtypes[c] in ("Int64", "boolean"):
+                # Integer/boolean columns stay exact unless a cell is empty
+                values = (column.to_numpy(dtype=np.float64, na_value=np.nan) if column.hasnans
+                          else column.to_numpy(dtype=np.int64 if dtypes[c] == "Int64" else bool))
+            else:
+                values = column.to_numpy(dtype=dtypes[c])
+            if values.dtype.kind == "f":
+                inf = np.isinf(values)
+                if inf.any():
+                    values = np.where(inf, np.nan, values)
+            arrays[c] = values
+
+        keep = self._dropna_mask(arrays, len(chunk))
+        if keep is not None:
+            arrays = {c: v[keep] for c, v in arrays.items()}
+        n = len(arrays["_time"])
+        if n == 0:
+            return
+        if self.ffill:
+            self._forward_fill(arrays)
+
+        start = self.size
+        for c, values in arrays.items():
+            if c not in self._columns:
+                dtype = np.int64 if c == "_time" else values.dtype
+                self._columns[c] = _Column(dtype, max(self.capacity, start + n))
+                self._columns[c].skip(0, start)
+                self._order.append(c)
+        for c, column in self._columns.items():
+            column.reserve(start + n)
+            if c in arrays:
+                column.write(start, arrays[c])
+            elif self.ffill and c in self._carry:
+                column.write(start, np.full(n, self._carry[c]))
+            else:
+                column.skip(start, start + n)
+        self.size += n
+
+    def _dropna_mask(self, arrays, n):
+        if not self.dropna:
+            return None
+        if self.dropna is True:
+            required = self.fields or [c for c in arrays if c != "_time"]
+        else:
+            required = self.dropna
+        keep = np.ones(n, dtype=bool)
+        for c in required:
+            values = arrays.get(c)
+            if values is None:
+                # A required column this table does not carry: nothing survives
+                return np.zeros(n, dtype=bool)
+            if values.dtype.kind == "f":
+                keep &= ~np.isnan(values)
+            elif values.dtype.kind == "O":
+                keep &= pd.notna(values)
+        return None if keep.all() else keep
+
+    def _forward_fill(self, arrays):
+        for c, values in arrays.items():
+            if values.dtype.kind != "f":
+                continue
+            missing = np.isnan(values)
+            if missing.any():
+                # Index of the last valid value at or before each row
+                idx = np.where(missing, -1, np.arange(len(values)))
+                np.maximum.accumulate(idx, out=idx)
+                filled = values[np.maximum(idx, 0)]
+                filled[idx < 0] = self._carry.get(c, np.nan)
+                arrays[c] = values = filled
+            valid = values[~np.isnan(values)]
+            if len(valid):
+                self._carry[c] = valid[-1]
+
+    # --- Result ---
+    def frame(self):
+        """Decoded rows as a DataFrame whose columns wrap the decoded arrays."""
+        if not self._columns:
+            return pd.DataFrame(columns=["_time"] + (self.fields or []))
+        out = {}
+        for c in self._order:
+            data = self._columns[c].finish(self.size)
+            if c == "_time":
+                data = pd.DatetimeIndex(data.view("datetime64[ns]")).tz_localize("UTC")
+            out[c] = data
+        df = pd.DataFrame(out, copy=False)
+        if self.dropna:
+            # Rows from tables that lacked a required column altogether
+            required = [c for c in self._order if c != "_time"] if self.dropna is True else self.dropna
+            gaps = [g for c in required if c in self._columns for g in self._columns[c].gaps]
+            if gaps:
+                keep = np.ones(self.size, dtype=bool)
+                for start, stop in gaps:
+                    keep[start:stop] = False
+                df = df[keep].reset_index(drop=True)
+        return df
+
+
+def decode_flux_csv(source, **kwargs):
+    """Decode annotated CSV from ``source`` (a response/file object, a string,
+    or an iterable of lines) into a DataFrame; see ``FluxCSVDecoder``."""
+    if isinstance(source, (str, bytes)):
+        source = io.StringIO(source.decode("utf-8") if isinstance(source, bytes) else source)
+    elif hasattr(source, "read") and not isinstance(source, io.TextIOBase):
+        if hasattr(source, "auto_close"):
+            # urllib3 responses must stay open until TextIOWrapper sees EOF;
+            # the caller releases the connection
+            source.auto_close = False
+        source = io.TextIOWrapper(source, encoding="utf-8", newline="")
+    return FluxCSVDecoder(**kwargs).feed(source).frame()
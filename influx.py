@@ -0,0 +1,156 @@
+import atexit
+import os
+import threading
+
+import numpy as np
+import streamlit as st
+
+from buffers import RollingWindow
+from flux_csv import decode_flux_csv
+from instrumentation import metrics
+
+# --- InfluxDB Configuration ---
+# Environment variables override the defaults so deployments don't need edits.
+INFLUXDB_URL = os.environ.get("INFLUXDB_URL", "https://us-east-1-1.aws.cloud2.influxdata.com")
+INFLUXDB_TOKEN = os.environ.get("INFLUXDB_TOKEN", "6gjE97dCC24hgOgWNmRXPqOS0pfc0pMSYeh5psL8e5u2T8jGeV1F17CU-U1z05if0jfTEmPRW9twNPSXN09SRQ==")
+INFLUXDB_ORG = os.environ.get("INFLUXDB_ORG", "Anormally Detection")
+INFLUXDB_TIMEOUT = int(os.environ.get("INFLUXDB_TIMEOUT", 30000))
+INFLUXDB_POOL_SIZE = int(os.environ.get("INFLUXDB_POOL_SIZE", 8))
+
+# Bucket and default fields for each measurement the dashboards read
+MEASUREMENTS = {
+    "dns": {"bucket": "realtime_dns", "fields": ["dns_rate", "inter_arrival_time"]},
+    "dns_traffic": {"bucket": "realtime_dns", "fields": None},
+    "network_traffic": {"bucket": "realtime", "fields": ["inter_arrival_time", "packet_length"]},
+    # Written back by new.py's scoring worker (see writeback.ResultWriter)
+    "anomaly_scores": {"bucket": "realtime_dns", "fields": ["anomaly", "score", "dns_rate", "inter_arrival_time"]},
+}
+
+
+# --- Shared Client ---
+@st.cache_resource
+def get_client():
+    """One pooled client per process; closed when the interpreter exits.
+    influxdb_client is imported here, on the first query, not at import."""
+    from influxdb_client import InfluxDBClient
+
+    client = InfluxDBClient(url=INFLUXDB_URL, token=INFLUXDB_TOKEN, org=INFLUXDB_ORG,
+                            timeout=INFLUXDB_TIMEOUT, connection_pool_maxsize=INFLUXDB_POOL_SIZE)
+    atexit.register(client.close)
+    return client
+
+
+def get_query_api():
+    return get_client().query_api()
+
+
+# --- Flux Query Builders ---
+def build_query(measurement, start="-5m", fields=None, bucket=None, stop=None, limit=None, sort=False):
+    """Flux for one measurement, pivoted to one row per ``_time``.
+
+    ``fields`` defaults to the measurement's configured fields; pass ``[]`` to
+    keep every field. ``start``/``stop`` accept relative durations or RFC3339
+    times.
+    """
+    config = MEASUREMENTS.get(measurement, {})
+    bucket = bucket or config.get("bucket")
+    if bucket is None:
+        raise ValueError(f"Unknown measurement '{measurement}' and no bucket given")
+    if fields is None:
+        fields = config.get("fields")
+
+    range_args = f"start: {start}" + (f", stop: {stop}" if stop else "")
+    lines = [
+        f'from(bucket: "{bucket}")',
+        f"  |> range({range_args})",
+        f'  |> filter(fn: (r) => r._measurement == "{measurement}")',
+    ]
+    if fields:
+        condition = " or ".join(f'r._field == "{f}"' for f in fields)
+        lines.append(f"  |> filter(fn: (r) => {condition})")
+    lines.append('  |> pivot(rowKey: ["_time"], columnKey: ["_field"], valueColumn: "_value")')
+    if sort:
+        lines.append('  |> sort(columns: ["_time"])')
+    if limit:
+        lines.append(f"  |> limit(n: {int(limit)})")
+    return "\n".join(lines)
+
+
+def dns_query(start="-5m", **kwargs):
+    return build_query("dns", start=start, **kwargs)
+
+
+def dns_traffic_query(start="-5m", **kwargs):
+    return build_query("dns_traffic", start=start, **kwargs)
+
+
+def network_traffic_query(start="-7d", **kwargs):
+    return build_query("network_traffic", start=start, **kwargs)
+
+
+def scores_query(start="-5m", **kwargs):
+    return build_query("anomaly_scores", start=start, **kwargs)
+
+
+# --- Query Execution ---
+def query_frame(query, fields=None, dropna=None, ffill=False, float_dtype=np.float32, capacity=None):
+    """Run ``query`` on the shared client and return a single flat DataFrame.
+
+    The raw annotated CSV is streamed into typed columns (see
+    ``flux_csv.FluxCSVDecoder``): ``_time`` plus each field, ``double``
+    fields as ``float_dtype``, without Flux's result/table/_start/_stop/
+    _measurement columns. ``dropna``/``ffill`` replace a separate cleanup
+    pass; ``capacity`` (e.g. the query's ``limit``) presizes the columns.
+    """
+    with metrics.timer("fetch") as t:
+        response = get_query_api().query_raw(query=query, org=INFLUXDB_ORG)
+        try:
+            df = decode_flux_csv(response, fields=fields, dropna=dropna, ffill=ffill,
+                                 float_dtype=float_dtype, capacity=capacity)
+        except Exception:
+            # Don't hand a half-read connection back to the pool
+            response.close()
+            raise
+        response.release_conn()
+        t["rows"] = len(df)
+    return df
+
+
+# --- Incremental Fetch ---
+class IncrementalFetcher:
+    """Keeps a rolling window of one measurement and on each call queries only
+    points newer than the last ``_time`` seen.
+
+    The first call (or one after ``reset()``) pulls the full ``window``; later
+    calls use ``range(start: <last seen>)`` so per-refresh I/O is proportional
+    to new points. Cache one instance with ``st.cache_resource``.
+    """
+
+    def __init__(self, measurement, window="10m", fields=None, limit=None, max_rows=50000):
+        self.measurement = measurement
+        self.window = window
+        self.fields = fields
+        self.limit = limit
+        self.buffer = RollingWindow(window=window, max_rows=max_rows)
+        self.last_fetched_rows = 0
+        self._lock = threading.Lock()
+
+    def reset(self):
+        self.buffer = RollingWindow(window=self.window, max_rows=self.buffer.max_rows)
+
+    def start(self):
+        last = self.buffer.last_time
+        if last is None:
+            return f"-{self.window}"
+        return last.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+    def fetch(self):
+        """Pull new points into the buffer and return the current window."""
+        with self._lock:
+            query = build_query(self.measurement, start=self.start(), fields=self.fields,
+                                sort=True, limit=self.limit)
+            new = query_frame(query, capacity=self.limit)
+            with metrics.timer("preprocess", rows=len(new)):
+                self.last_fetched_rows = self.buffer.append(new) if "_time" in new.columns else 0
+                self.buffer.expire()
+                return self.buffer.to_frame()
@@ -0,0 +1,226 @@
+import bisect
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+# --- Hot-Path Instrumentation ---
+# Process-wide stage timers with fixed log-spaced histogram buckets, so
+# recording is O(log buckets) and memory stays constant. A background flusher
+# ships per-interval summaries in batches to a sink (JSON-lines file or
+# InfluxDB) without touching the request path.
+#
+#   from instrumentation import metrics
+#   with metrics.timer("fetch", rows=len(df)): ...
+#   @metrics.timed("score")
+#   def score(df): ...
+
+# 1 µs .. 1000 s, ~12% wide buckets
+BUCKETS = np.logspace(-6, 3, 181).tolist()
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.rows = 0
+        self.max = 0.0
+
+    def record(self, seconds, rows=0):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.rows += rows
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q):
+        if not self.count:
+            return 0.0
+        target = q / 100 * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return min(BUCKETS[min(i, len(BUCKETS) - 1)], self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+            "mean": self.total / self.count if self.count else 0.0,
+            "rows": self.rows,
+            "rows_per_sec": self.rows / self.total if self.total else 0.0,
+        }
+
+
+class Metrics:
+    """Stage latency histograms and counters, safe to share across threads."""
+
+    def __init__(self):
+        self._total = {}
+        self._window = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def record(self, stage, seconds, rows=0):
+        with self._lock:
+            for hists in (self._total, self._window):
+                if stage not in hists:
+                    hists[stage] = Histogram()
+                hists[stage].record(seconds, rows)
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    @contextmanager
+    def timer(self, stage, rows=0):
+        """Time the ``with`` block under ``stage``. ``rows`` may be set later
+        through the yielded dict, e.g. ``t["rows"] = len(df)``."""
+        info = {"rows": rows}
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            self.record(stage, time.perf_counter() - start, info["rows"])
+
+    def timed(self, stage, rows=None):
+        """Decorator form of ``timer``; ``rows(result)`` counts rows handled."""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                result = fn(*args, **kwargs)
+                n = rows(result) if rows else 0
+                self.record(stage, time.perf_counter() - start, n)
+                return result
+            return wrapper
+        return decorate
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "stages": {s: h.summary() for s, h in self._total.items()},
+                "counters": dict(self._counters),
+            }
+
+    def hit_rate(self, name):
+        hits = self._counters.get(f"{name}.hit", 0)
+        misses = self._counters.get(f"{name}.miss", 0)
+        return hits / (hits + misses) if hits + misses else 0.0
+
+    def drain(self):
+        """Summaries recorded since the previous drain."""
+        with self._lock:
+            window, self._window = self._window, {}
+            counters = dict(self._counters)
+        return {s: h.summary() for s, h in window.items()}, counters
+
+    def start_flusher(self, sink, interval=10.0):
+        """Ship drained summaries to ``sink(records)`` every ``interval``
+        seconds on a daemon thread. Only the first call starts a flusher."""
+        with self._lock:
+            if self._flusher is not None:
+                return self._flusher
+            self._flusher = MetricsFlusher(self, sink, interval)
+        self._flusher.start()
+        return self._flusher
+
+
+class MetricsFlusher(threading.Thread):
+    def __init__(self, metrics, sink, interval):
+        super().__init__(name="metrics-flusher", daemon=True)
+        self.metrics = metrics
+        self.sink = sink
+        self.interval = interval
+        self.errors = 0
+        self._stop_event = threading.Event()
+
+    def flush(self):
+        stages, counters = self.metrics.drain()
+        if not stages:
+            return
+        now = time.time()
+        records = [dict(summary, stage=stage, time=now) for stage, summary in stages.items()]
+        try:
+            self.sink(records)
+        except Exception:
+            self.errors += 1
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.flush()
+        self.flush()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+# --- Sinks ---
+def file_sink(path):
+    """Append each batch as JSON lines to ``path``."""
+    def sink(records):
+        with open(path, "a") as f:
+            for r in records:
+                f.write(json.dumps(r) + "\n")
+    return sink
+
+
+def influx_sink(write_api, bucket, measurement="pipeline_metrics"):
+    """Write each batch as points tagged by stage; pair with a batching
+    ``write_api`` so the flusher never blocks on one point at a time."""
+    def sink(records):
+        # Imported on the flusher thread, not while the page first renders
+        from influxdb_client import Point, WritePrecision
+
+        points = []
+        for r in records:
+            point = Point(measurement).tag("stage", r["stage"]).time(int(r["time"] * 1e9), WritePrecision.NS)
+            for key in ("count", "p50", "p95", "p99", "max", "mean", "rows", "rows_per_sec"):
+                point = point.field(key, float(r[key]))
+            points.append(point)
+        write_api.write(bucket=bucket, record=points)
+    return sink
+
+
+metrics = Metrics()
+
+
+# --- Pipeline Health Tab ---
+def render_pipeline_health(caches=None):
+    """Per-stage latency percentiles, rows/sec and cache hit rates.
+
+    ``caches`` maps a label to an object with a ``hit_rate`` attribute
+    (e.g. ``worker.ResultHub``).
+    """
+    import pandas as pd
+    import streamlit as st
+
+    snap = metrics.snapshot()
+    st.subheader("🩺 Pipeline Health")
+    if snap["stages"]:
+        table = pd.DataFrame.from_dict(snap["stages"], orient="index")
+        for col in ("p50", "p95", "p99", "max", "mean"):
+            table[col] = table[col] * 1000
+        table = table.rename(columns={"p50": "p50 (ms)", "p95": "p95 (ms)", "p99": "p99 (ms)",
+                                      "max": "max (ms)", "mean": "mean (ms)"})
+        st.dataframe(table.round(2), use_container_width=True)
+    else:
+        st.info("No stages recorded yet.")
+
+    rates = {label: cache.hit_rate for label, cache in (caches or {}).items()}
+    for name in {k.rsplit(".", 1)[0] for k in snap["counters"] if k.endswith((".hit", ".miss"))}:
+        rates[name] = metrics.hit_rate(name)
+    if rates:
+        cols = st.columns(len(rates))
+        for col, (label, rate) in zip(cols, rates.items()):
+            col.metric(f"🎯 {label} hit rate", f"{rate:.0%}")
@@ -0,0 +1,200 @@
+import numpy as np
+import pandas as pd
+
+from rendering import MAX_POINTS, WEBGL_THRESHOLD, lttb_indices
+
+# --- Incremental Figures ---
+# Chart state that lives in ``st.session_state`` across reruns and is fed only
+# the rows that arrived since the last rerun, instead of being rebuilt from
+# the whole window every refresh.
+#
+#   live = st.session_state.setdefault("error_chart", LiveLineFigure("timestamp", "reconstruction_error"))
+#   live.extend(new_rows)
+#   st.plotly_chart(live.figure)
+
+
+def _x_values(values):
+    values = pd.Series(values) if not isinstance(values, pd.Series) else values
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.to_numpy(dtype="datetime64[ns]")
+    return values.to_numpy(dtype=float)
+
+
+def _x_float(x):
+    return x.astype(np.int64).astype(float) if x.dtype.kind == "M" else x
+
+
+class LabelCounts:
+    """Counts of each label in a sliding window, kept current from the rows
+    entering and leaving it rather than recounted over the whole window."""
+
+    def __init__(self, minlength=2):
+        self.counts = np.zeros(minlength, dtype=np.int64)
+
+    def _bincount(self, values):
+        values = np.asarray(values, dtype=np.int64)
+        return np.bincount(values, minlength=len(self.counts))[:len(self.counts)] if len(values) else 0
+
+    def reset(self, values):
+        self.counts = np.zeros(len(self.counts), dtype=np.int64) + self._bincount(values)
+
+    def add(self, values):
+        self.counts += self._bincount(values)
+
+    def remove(self, values):
+        self.counts -= self._bincount(values)
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+    def rate(self, label=1):
+        return self.counts[label] / self.total if self.total else 0.0
+
+
+class LiveLineFigure:
+    """Plotly line of ``y`` over ``x`` with anomaly markers and optional step
+    lines (e.g. a threshold), extended in place with new rows only.
+
+    Points older than ``trim(before)`` are dropped. When the line holds more
+    than ``2 * max_points`` points it is compacted back to ``max_points``
+    with LTTB, so the figure stays bounded and appends are amortised O(new
+    rows). Anomaly markers are kept separately and only thinned past
+    ``max_points``; ``anomalies_thinned`` says whether that has happened.
+    """
+
+    def __init__(self, x, y, anomaly=None, anomaly_label=1, steps=None, max_points=MAX_POINTS,
+                 title=None, labels=None, line_color="blue", anomaly_color="red"):
+        self.x, self.y = x, y
+        self.anomaly = anomaly
+        self.anomaly_label = anomaly_label
+        self.steps = dict(steps or {})
+        self.max_points = max_points
+        self.title = title
+        self.labels = labels or {}
+        self.line_color = line_color
+        self.anomaly_color = anomaly_color
+        self.rows_seen = 0
+        self.clear()
+
+    def clear(self):
+        self._line = None
+        self._marks = None
+        self._figure = None
+        self.anomalies_thinned = False
+
+    def _append(self, current, new):
+        if current is None:
+            return new
+        return {k: np.concatenate([current[k], new[k]]) for k in current}
+
+    def extend(self, df):
+        """Append the rows of ``df``; it must be newer than what is plotted."""
+        if df is None or len(df) == 0:
+            return 0
+        x = _x_values(df[self.x])
+        line = {"x": x, "y": pd.to_numeric(df[self.y], errors="coerce").to_numpy(dtype=float)}
+        for column in self.steps:
+            line[column] = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=float)
+        self._line = self._append(self._line, line)
+        if self.anomaly is not None and self.anomaly in df.columns:
+            flagged = (df[self.anomaly] == self.anomaly_label).to_numpy()
+            self._marks = self._append(self._marks, {"x": x[flagged], "y": line["y"][flagged]})
+        self.rows_seen += len(df)
+        self._compact()
+        self._sync()
+        return len(df)
+
+    def trim(self, before):
+        """Drop points with ``x`` earlier than ``before`` (the window's oldest row)."""
+        if self._line is None or before is None:
+            return
+        before = np.datetime64(pd.Timestamp(before).tz_localize(None), "ns") \
+            if self._line["x"].dtype.kind == "M" else float(before)
+        for name in ("_line", "_marks"):
+            data = getattr(self, name)
+            if data is not None:
+                start = np.searchsorted(data["x"], before, side="left")
+                if start:
+                    setattr(self, name, {k: v[start:] for k, v in data.items()})
+        self._sync()
+
+    def _compact(self):
+        n = len(self._line["x"])
+        if n > 2 * self.max_points:
+            # Step lines are sampled at the same points as the main line
+            keep = lttb_indices(_x_float(self._line["x"]), np.nan_to_num(self._line["y"]), self.max_points)
+            self._line = {k: v[keep] for k, v in self._line.items()}
+        if self._marks is not None and len(self._marks["x"]) > 2 * self.max_points:
+            keep = np.linspace(0, len(self._marks["x"]) - 1, self.max_points).astype(np.int64)
+            self._marks = {k: v[keep] for k, v in self._marks.items()}
+            self.anomalies_thinned = True
+
+    def _trace_type(self):
+        import plotly.graph_objects as go
+
+        return go.Scattergl if self._line is not None and len(self._line["x"]) > WEBGL_THRESHOLD else go.Scatter
+
+    def _build(self):
+        import plotly.graph_objects as go
+
+        scatter = self._trace_type()
+        fig = go.Figure(scatter(mode="lines", name="Normal", line=dict(color=self.line_color)))
+        fig.add_trace(scatter(mode="markers", name="Anomaly", marker=dict(color=self.anomaly_color, size=6)))
+        for column, style in self.steps.items():
+            style = dict(style)
+            fig.add_trace(scatter(mode="lines", name=style.pop("name", column), line=style))
+        fig.update_layout(title=self.title, xaxis_title=self.labels.get(self.x, self.x),
+                          yaxis_title=self.labels.get(self.y, self.y))
+        return fig
+
+    def _sync(self):
+        # Rebuild only when crossing the WebGL threshold; otherwise update the
+        # existing traces' arrays in place
+        if self._figure is None or type(self._figure.data[0]) is not self._trace_type():
+            self._figure = self._build()
+        line = self._line
+        marks = self._marks or {"x": line["x"][:0], "y": line["y"][:0]}
+        with self._figure.batch_update():
+            self._figure.data[0].update(x=line["x"], y=line["y"])
+            self._figure.data[1].update(x=marks["x"], y=marks["y"])
+            for i, column in enumerate(self.steps, start=2):
+                self._figure.data[i].update(x=line["x"], y=line[column])
+
+    @property
+    def points(self):
+        return 0 if self._line is None else len(self._line["x"])
+
+    @property
+    def figure(self):
+        return self._figure if self._figure is not None else self._build()
+
+
+class LiveScatter:
+    """One reusable matplotlib scatter; ``update`` swaps the point data in
+    place instead of creating a new figure each rerun.
+
+    The figure is a plain ``matplotlib.figure.Figure``, not registered with
+    ``pyplot``, so dropping it frees it and nothing accumulates in pyplot's
+    figure manager.
+    """
+
+    def __init__(self, xlabel=None, ylabel=None, title=None, cmap="coolwarm", alpha=0.7):
+        from matplotlib.figure import Figure
+
+        self.figure = Figure()
+        self.ax = self.figure.subplots()
+        self.points = self.ax.scatter([], [], c=[], cmap=cmap, alpha=alpha, vmin=0, vmax=1)
+        self.ax.set_xlabel(xlabel)
+        self.ax.set_ylabel(ylabel)
+        self.ax.set_title(title)
+
+    def update(self, x, y, c):
+        xy = np.column_stack([np.asarray(x, dtype=float), np.asarray(y, dtype=float)])
+        self.points.set_offsets(xy)
+        self.points.set_array(np.asarray(c, dtype=float))
+        if len(xy):
+            # Collections are not part of relim(), so reset the data limits directly
+            self.ax.dataLim.update_from_data_xy(xy, ignore=True)
+            self.ax.autoscale_view()
+        return self.figure
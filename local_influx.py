@@ -0,0 +1,227 @@
+import argparse
+import gzip
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+# --- Local Stand-in for InfluxDB ---
+# In-memory store that understands the Flux produced by influx.build_query and
+# the line protocol written by influxdb_client, served over the same
+# /api/v2/query and /api/v2/write endpoints. Point INFLUXDB_URL at it to run
+# the dashboards, simulator and benchmarks without network access.
+# Run with: python local_influx.py --port 8086
+
+
+def _parse_time(value, now):
+    value = value.strip()
+    if value.startswith("-"):
+        return now - pd.Timedelta(value[1:])
+    if value == "now()":
+        return now
+    ts = pd.Timestamp(value)
+    return ts.tz_convert("UTC") if ts.tzinfo else ts.tz_localize("UTC")
+
+
+def parse_flux(query, now=None):
+    """Pull bucket, range, measurement, fields and limit out of a query shaped
+    like ``influx.build_query`` output (results are always time-sorted)."""
+    now = now or pd.Timestamp.now(tz="UTC")
+    bucket = re.search(r'from\(bucket:\s*"([^"]+)"\)', query)
+    rng = re.search(r"range\(start:\s*([^,)]+)(?:,\s*stop:\s*([^)]+))?\)", query)
+    measurement = re.search(r'_measurement"?\]?\s*==\s*"([^"]+)"', query)
+    if not (bucket and rng and measurement):
+        raise ValueError("Unsupported Flux query for the local stand-in")
+    fields = re.findall(r'r\._field\s*==\s*"([^"]+)"', query)
+    limit = re.search(r"limit\(n:\s*(\d+)\)", query)
+    return {
+        "bucket": bucket.group(1),
+        "start": _parse_time(rng.group(1), now),
+        "stop": _parse_time(rng.group(2), now) if rng.group(2) else now,
+        "measurement": measurement.group(1),
+        "fields": fields or None,
+        "limit": int(limit.group(1)) if limit else None,
+    }
+
+
+def parse_line_protocol(text):
+    """Group line protocol into ``{measurement: DataFrame}`` with ``_time``."""
+    rows = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        head, fields, *ts = line.split(" ")
+        measurement = head.split(",")[0]
+        row = {}
+        for pair in fields.split(","):
+            key, value = pair.split("=", 1)
+            if value.endswith("i"):
+                value = value[:-1]
+            try:
+                row[key] = float(value)
+            except ValueError:
+                row[key] = value.strip('"')
+        row["_time"] = int(ts[0]) if ts else pd.Timestamp.now(tz="UTC").value
+        rows.setdefault(measurement, []).append(row)
+    frames = {}
+    for measurement, records in rows.items():
+        df = pd.DataFrame.from_records(records)
+        df["_time"] = pd.to_datetime(df["_time"], unit="ns", utc=True)
+        frames[measurement] = df
+    return frames
+
+
+def to_annotated_csv(df, measurement, start, stop):
+    """Render a pivoted frame the way InfluxDB answers a query with
+    annotations, so ``query_data_frame``/``query_stream`` can parse it."""
+    fields = [c for c in df.columns if c != "_time"]
+    types = ["double" if pd.api.types.is_float_dtype(df[f]) else
+             "long" if pd.api.types.is_integer_dtype(df[f]) else "string" for f in fields]
+    header = ["", "result", "table", "_start", "_stop", "_time", "_measurement"] + fields
+    lines = [
+        ",".join(["#datatype", "string", "long", "dateTime:RFC3339", "dateTime:RFC3339",
+                  "dateTime:RFC3339", "string"] + types),
+        ",".join(["#group", "false", "false", "true", "true", "false", "true"] + ["false"] * len(fields)),
+        ",".join(["#default", "_result", "", "", "", "", ""] + [""] * len(fields)),
+        ",".join(header),
+    ]
+    if len(df):
+        fmt = "%Y-%m-%dT%H:%M:%S.%fZ"
+        body = pd.DataFrame({
+            "": "",
+            "result": "",
+            "table": 0,
+            "_start": start.strftime(fmt),
+            "_stop": stop.strftime(fmt),
+            "_time": df["_time"].dt.strftime(fmt),
+            "_measurement": measurement,
+        })
+        for f in fields:
+            body[f] = df[f].to_numpy()
+        lines.append(body.to_csv(index=False, header=False, lineterminator="\n").rstrip("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+class LocalInflux:
+    """Thread-safe in-memory time series store keyed by bucket and measurement."""
+
+    def __init__(self):
+        self._chunks = {}
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def write_frame(self, bucket, measurement, df):
+        """Append rows of ``df`` (with a ``_time`` column) to a measurement."""
+        if df.empty:
+            return 0
+        df = df.copy()
+        df["_time"] = pd.to_datetime(df["_time"], utc=True)
+        with self._lock:
+            self._chunks.setdefault((bucket, measurement), []).append(df)
+            self._frames.pop((bucket, measurement), None)
+        return len(df)
+
+    def write_lines(self, bucket, text):
+        return sum(self.write_frame(bucket, m, df) for m, df in parse_line_protocol(text).items())
+
+    def frame(self, bucket, measurement):
+        key = (bucket, measurement)
+        with self._lock:
+            if key not in self._frames:
+                chunks = self._chunks.get(key, [])
+                df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=["_time"])
+                self._chunks[key] = [df] if chunks else []
+                self._frames[key] = df.sort_values("_time", kind="stable").reset_index(drop=True)
+            return self._frames[key]
+
+    def count(self, bucket, measurement):
+        return len(self.frame(bucket, measurement))
+
+    def select(self, bucket, measurement, start, stop=None, fields=None, limit=None):
+        df = self.frame(bucket, measurement)
+        if df.empty:
+            return df
+        times = df["_time"]
+        lo = times.searchsorted(start, side="left")
+        hi = times.searchsorted(stop, side="left") if stop is not None else len(df)
+        out = df.iloc[lo:hi]
+        if fields:
+            out = out[["_time"] + [f for f in fields if f in out.columns]]
+        if limit:
+            out = out.head(limit)
+        return out.reset_index(drop=True)
+
+    def query(self, flux):
+        """Answer a builder-shaped Flux query with a pivoted DataFrame."""
+        q = parse_flux(flux)
+        return self.select(q["bucket"], q["measurement"], q["start"], q["stop"], q["fields"], q["limit"])
+
+    def query_csv(self, flux):
+        q = parse_flux(flux)
+        df = self.select(q["bucket"], q["measurement"], q["start"], q["stop"], q["fields"], q["limit"])
+        return to_annotated_csv(df, q["measurement"], q["start"], q["stop"])
+
+
+# --- HTTP Front End ---
+def make_handler(store):
+    class InfluxHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, body=b"", content_type="application/json"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.startswith(("/ping", "/health")):
+                self._send(200, json.dumps({"status": "pass"}).encode())
+            else:
+                self._send(404, json.dumps({"message": "not found"}).encode())
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.headers.get("Content-Encoding") == "gzip":
+                raw = gzip.decompress(raw)
+            try:
+                if url.path == "/api/v2/write":
+                    bucket = parse_qs(url.query)["bucket"][0]
+                    store.write_lines(bucket, raw.decode())
+                    self._send(204)
+                elif url.path == "/api/v2/query":
+                    body = json.loads(raw)
+                    csv = store.query_csv(body["query"]).encode()
+                    self._send(200, csv, "text/csv; charset=utf-8")
+                else:
+                    self._send(404, json.dumps({"message": "not found"}).encode())
+            except (ValueError, KeyError) as e:
+                self._send(400, json.dumps({"code": "invalid", "message": str(e)}).encode())
+
+        def log_message(self, format, *args):
+            pass
+
+    return InfluxHandler
+
+
+def serve(store=None, host="127.0.0.1", port=0):
+    """Start the stand-in on a daemon thread; returns ``(server, url, store)``."""
+    store = store or LocalInflux()
+    server = ThreadingHTTPServer((host, port), make_handler(store))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}", store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local in-memory stand-in for InfluxDB")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8086)
+    args = parser.parse_args()
+    httpd = ThreadingHTTPServer((args.host, args.port), make_handler(LocalInflux()))
+    print(f"Serving InfluxDB stand-in on http://{args.host}:{args.port}")
+    httpd.serve_forever()
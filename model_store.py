@@ -0,0 +1,113 @@
+import json
+import os
+import time
+import warnings
+
+from instrumentation import metrics
+
+# --- Persisted Model Artifacts ---
+# Fitted scaler + detector pipelines saved with joblib (uncompressed, so the
+# tree arrays can be memory-mapped on load) next to a JSON manifest holding
+# the version, feature schema, library versions and any extra state. A
+# restarted dashboard loads the latest artifact in milliseconds and scores
+# straight away instead of retraining first.
+#
+#   store = ModelStore()
+#   version = store.save("iforest-dns", pipeline, ["dns_rate", "inter_arrival_time"])
+#   pipeline, manifest = store.load("iforest-dns", features=["dns_rate", "inter_arrival_time"])
+
+MODEL_DIR = os.environ.get("MODEL_DIR", "models")
+
+
+def _library_versions():
+    import sklearn
+
+    return {"sklearn": sklearn.__version__}
+
+
+class ModelStore:
+    """Versioned artifacts under ``root/<name>/``; the ``keep`` newest
+    versions of each model are retained."""
+
+    def __init__(self, root=MODEL_DIR, keep=5):
+        self.root = root
+        self.keep = keep
+
+    def _dir(self, name):
+        return os.path.join(self.root, name)
+
+    def versions(self, name):
+        """Saved versions of ``name``, oldest first."""
+        folder = self._dir(name)
+        if not os.path.isdir(folder):
+            return []
+        return sorted(f[:-len(".json")] for f in os.listdir(folder) if f.endswith(".json"))
+
+    def manifest(self, name, version=None):
+        """Manifest of ``version`` (default: latest), or ``None`` if nothing is saved."""
+        version = version or next(iter(self.versions(name)[-1:]), None)
+        if version is None:
+            return None
+        with open(os.path.join(self._dir(name), version + ".json")) as f:
+            return json.load(f)
+
+    def save(self, name, pipeline, features, **metadata):
+        """Write ``pipeline`` as a new version and return the version string.
+        ``metadata`` must be JSON-serialisable."""
+        import joblib
+
+        folder = self._dir(name)
+        os.makedirs(folder, exist_ok=True)
+        version = f"{time.time_ns()}"
+        manifest = {
+            "name": name,
+            "version": version,
+            "features": list(features),
+            "created_at": time.time(),
+            "libraries": _library_versions(),
+            "metadata": metadata,
+        }
+        with metrics.timer("model_save"):
+            # Artifact first, manifest last: a version exists once its manifest does
+            tmp = os.path.join(folder, f".{version}.joblib.tmp")
+            joblib.dump(pipeline, tmp, compress=0)
+            os.replace(tmp, os.path.join(folder, version + ".joblib"))
+            tmp = os.path.join(folder, f".{version}.json.tmp")
+            with open(tmp, "w") as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(tmp, os.path.join(folder, version + ".json"))
+        self._prune(name)
+        return version
+
+    def load(self, name, version=None, features=None, mmap_mode="r"):
+        """Return ``(pipeline, manifest)`` for ``version`` (default: latest),
+        or ``(None, None)`` if nothing is saved.
+
+        Raises ``ValueError`` if ``features`` differs from the saved schema.
+        Arrays are memory-mapped read-only by default, so loading costs page
+        faults on first use rather than a full read.
+        """
+        import joblib
+
+        manifest = self.manifest(name, version)
+        if manifest is None:
+            return None, None
+        if features is not None and list(features) != manifest["features"]:
+            raise ValueError(f"Model '{name}' {manifest['version']} was trained on "
+                             f"{manifest['features']}, not {list(features)}")
+        saved = manifest.get("libraries", {})
+        current = _library_versions()
+        if saved and saved != current:
+            warnings.warn(f"Model '{name}' {manifest['version']} was saved with {saved}, "
+                          f"loading with {current}")
+        with metrics.timer("model_load"):
+            pipeline = joblib.load(os.path.join(self._dir(name), manifest["version"] + ".joblib"),
+                                   mmap_mode=mmap_mode)
+        return pipeline, manifest
+
+    def _prune(self, name):
+        for version in self.versions(name)[:-self.keep]:
+            for ext in (".json", ".joblib"):
+                path = os.path.join(self._dir(name), version + ext)
+                if os.path.exists(path):
+                    os.remove(path)
@@ -1,83 +1,173 @@
 import streamlit as st
-import pandas as pd
-import time
-from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler
-from sklearn.pipeline import Pipeline
-from influxdb_client import InfluxDBClient, Point, WritePrecision, WriteOptions  # ✅ FIXED HERE
+import threading
+from streamlit_autorefresh import st_autorefresh
+from detection import DetectionEngine
+from model_store import ModelStore
+from influx import MEASUREMENTS, IncrementalFetcher, get_client
+from worker import ResultHub, session_id, start_worker
+from instrumentation import influx_sink, metrics, render_pipeline_health
+from writeback import ResultWriter, influx_writer
+from rollups import RollupStore, influx_fetch
+from thresholds import StreamingThreshold
+from rendering import downsample, downsample_caption, paged_dataframe
 
 # --- CONFIG ---
-INFLUXDB_URL = "https://us-east-1-1.aws.cloud2.influxdata.com"
-INFLUXDB_TOKEN = "6gjE97dCC24hgOgWNmRXPqOS0pfc0pMSYeh5psL8e5u2T8jGeV1F17CU-U1z05if0jfTEmPRW9twNPSXN09SRQ=="
-INFLUXDB_ORG = "Anormally Detection"
-INFLUXDB_BUCKET = "realtime_dns"
+INFLUXDB_BUCKET = MEASUREMENTS["dns"]["bucket"]
 
 # --- STREAMLIT SETUP ---
 st.set_page_config(page_title="DNS Anomaly Dashboard", layout="wide")
 st.title("🚨 Real-Time DNS Anomaly Detection")
+st_autorefresh(interval=3000, key="dnsrefresh")
 
 # --- InfluxDB client ---
-client = InfluxDBClient(url=INFLUXDB_URL, token=INFLUXDB_TOKEN, org=INFLUXDB_ORG)
-query_api = client.query_api()
-write_api = client.write_api(write_options=WriteOptions(batch_size=1))  # ✅ FIXED
+@st.cache_resource
+def get_write_api():
+    from influxdb_client.client.write_api import SYNCHRONOUS
+    return get_client().write_api(write_options=SYNCHRONOUS)
+
+def write_lines(bucket, lines):
+    # First called on the writer thread, so the client is never built on the render path
+    influx_writer(get_write_api())(bucket, lines)
+
+@st.cache_resource
+def get_writer():
+    # Writes happen on the writer's own thread in batches; nothing on the
+    # rerun path waits for InfluxDB, and outages spool to disk.
+    return ResultWriter(write_lines, INFLUXDB_BUCKET, measurement="anomaly_scores")
+
+writer = get_writer()
+
+@st.cache_resource
+def start_telemetry():
+    # Stage histograms are summarised and queued to pipeline_metrics every 10 s
+    return metrics.start_flusher(influx_sink(writer, INFLUXDB_BUCKET), interval=10)
+
+start_telemetry()
 
 @st.cache_resource
 def load_model():
-    return Pipeline([
-        ('scaler', StandardScaler()),
-        ('clf', IsolationForest(contamination=0.01, random_state=42))
-    ])
+    # Shared across reruns and sessions; retrains every 5 min or on drift.
+    # Anomalies are cut at the running 1st percentile of recent scores rather
+    # than a fixed share of every window. Every fit is saved to models/ and
+    # the latest is memory-mapped back on the worker's first pass, so a
+    # restart scores immediately instead of retraining first.
+    return DetectionEngine(["dns_rate", "inter_arrival_time"], contamination=0.01, retrain_interval=300,
+                           adaptive_threshold=StreamingThreshold(0.01, window=20000, tail="lower"),
+                           store=ModelStore(), model_name="iforest-dns")
+
+engine = load_model()
 
-model_pipeline = load_model()
+@st.cache_resource
+def get_fetcher():
+    # Remembers the last _time seen so each rerun only pulls new points
+    return IncrementalFetcher("dns", window="10m", limit=5000)
 
 def fetch_dns_data():
-    query = f'''
-    from(bucket: "{INFLUXDB_BUCKET}")
-      |> range(start: -10m)
-      |> filter(fn: (r) => r._measurement == "dns")
-      |> filter(fn: (r) => r._field == "dns_rate" or r._field == "inter_arrival_time")
-      |> pivot(rowKey:["_time"], columnKey: ["_field"], valueColumn: "_value")
-      |> limit(n: 5000)
-    '''
-    try:
-        df = query_api.query_data_frame(org=INFLUXDB_ORG, query=query)
-        if isinstance(df, list):
-            df = pd.concat(df, ignore_index=True)
-        if not df.empty:
-            df.columns = [col[1] if isinstance(col, tuple) else col for col in df.columns]
-        return df
-    except Exception as e:
-        st.error(f"❌ Failed to fetch data from InfluxDB: {e}")
-        return pd.DataFrame()
+    return get_fetcher().fetch()
+
+@st.cache_resource
+def get_rollups():
+    # 1s / 1m / 1h aggregates for long-range views, seeded from the scores
+    # already written back and then kept current by the scoring worker
+    store = RollupStore(["dns_rate", "inter_arrival_time"])
+    backfill = influx_fetch("anomaly_scores", fields=["anomaly", "dns_rate", "inter_arrival_time"])
+    # Stop where the fetcher's first window starts so no point is counted twice
+    threading.Thread(target=store.backfill, args=(backfill, "-7d", "-10m"), name="rollup-backfill",
+                     daemon=True).start()
+    return store
+
+rollups = get_rollups()
 
 def detect_with_latency(data):
-    start = time.time()
-    preds = model_pipeline.fit_predict(data)
-    latency = time.time() - start
-    return preds, latency
+    preds, scores = engine.process(data, with_scores=True)
+    return preds, scores, engine.score_latency
 
-def log_latency(latency):
-    point = Point("model_latency").field("latency_sec", latency)
-    write_api.write(bucket=INFLUXDB_BUCKET, org=INFLUXDB_ORG, record=point)
+def score_window():
+    # Runs on the background worker: fetch new points, score them and queue
+    # the newly fetched rows to the anomaly_scores measurement.
+    # Fetch/score/train latencies are recorded by the instrumentation layer.
+    dns_df = fetch_dns_data()
+    if not dns_df.empty and "dns_rate" in dns_df.columns and "inter_arrival_time" in dns_df.columns:
+        preds, scores, latency = detect_with_latency(dns_df)
+        dns_df["anomaly"] = preds
+        dns_df["score"] = scores
+        new_rows = dns_df.tail(get_fetcher().last_fetched_rows)
+        writer.submit_scores(new_rows, model_version=engine.model_version, source="dns",
+                             fields=["dns_rate", "inter_arrival_time"], anomaly_label=-1)
+        rollups.ingest(new_rows, anomaly_label=-1)
+    return dns_df
+
+@st.cache_resource
+def get_hub():
+    return ResultHub()
+
+hub = get_hub()
+TOPIC = ("influx:dns", "10m")
+# Subscribe before the worker exists so its first pass isn't skipped as idle
+hub.subscribe(*TOPIC, session_id(st.session_state))
+
+@st.cache_resource
+def get_worker():
+    # Queries InfluxDB and scores only while someone is subscribed
+    return start_worker(score_window, interval=3.0, store=hub.topic(*TOPIC), name="dns-scoring",
+                        active=lambda: hub.subscriber_count(*TOPIC) > 0)
+
+worker = get_worker()
 
 # --- MAIN LOGIC ---
-dns_df = fetch_dns_data()
+# Reruns only read the worker's latest snapshot, shared by every viewer
+_, dns_df = hub.read(*TOPIC, session_id(st.session_state))
+st.sidebar.metric("👥 Viewers", hub.subscriber_count())
+st.sidebar.metric("🎯 Cache Hit Rate", f"{hub.hit_rate:.0%}")
+if worker.store.error is not None:
+    st.error(f"❌ Failed to fetch or score data: {worker.store.error}")
 
-if not dns_df.empty and "dns_rate" in dns_df.columns and "inter_arrival_time" in dns_df.columns:
+if dns_df is None:
+    st.info("⏳ Waiting for the first scoring run...")
+elif not dns_df.empty and "anomaly" in dns_df.columns:
     try:
-        features = dns_df[["dns_rate", "inter_arrival_time"]].dropna()
-        preds, latency = detect_with_latency(features)
-        dns_df["anomaly"] = preds
-        log_latency(latency)
+        latency = engine.score_latency
 
-        st.metric("⏱ Model Latency (s)", f"{latency:.4f}")
-        st.subheader("🚨 Detected Anomalies")
-        st.dataframe(dns_df[dns_df["anomaly"] == -1])
+        with metrics.timer("render", rows=len(dns_df)):
+            col1, col2, col3 = st.columns(3)
+            col1.metric("⏱ Scoring Latency (s)", f"{latency:.4f}")
+            col2.metric("🏋️ Training Latency (s)", f"{engine.train_latency:.4f}",
+                        help=f"Model retrained {engine.train_count} time(s)"
+                             + (" (restored from the model store)" if engine.restored_at else ""))
+            adaptive = engine.adaptive_threshold.is_ready
+            col3.metric("🎚️ Score Threshold", "–" if engine.threshold is None else f"{engine.threshold:.4f}",
+                        help="Running 1st percentile of recent scores" if adaptive
+                        else "Contamination cut-off, used until enough scores are seen")
+            st.subheader("🚨 Detected Anomalies")
+            paged_dataframe(dns_df[dns_df["anomaly"] == -1], key="anomaly_page", newest_first=True)
 
-        st.subheader("📈 DNS Rate Over Time")
-        st.line_chart(dns_df.set_index("_time")["dns_rate"])
+            st.subheader("📈 DNS Rate Over Time")
+            # LTTB-reduced so the chart payload is bounded; anomalies are always kept
+            plot_df = downsample(dns_df, "dns_rate", x="_time", keep=dns_df["anomaly"] == -1)
+            st.line_chart(plot_df.set_index("_time")["dns_rate"])
+            caption = downsample_caption(len(plot_df), len(dns_df))
+            if caption:
+                st.caption(caption)
 
     except Exception as e:
         st.error(f"⚠️ Error during processing: {e}")
 else:
     st.warning("⚠️ No valid data returned or required fields missing.")
+
+# --- Long-Range View ---
+st.subheader("📆 Long-Range DNS Rate")
+range_options = {"Last hour": "-1h", "Last 24 hours": "-24h", "Last 7 days": "-7d"}
+long_range = st.selectbox("Time range", list(range_options), index=2)
+resolution, rollup_df = rollups.query(range_options[long_range], max_points=2000)
+if rollup_df.empty:
+    st.info("⏳ No rollups yet for this range.")
+else:
+    with metrics.timer("render", rows=len(rollup_df)):
+        st.caption(f"{len(rollup_df)} buckets at {resolution} resolution")
+        st.line_chart(rollup_df.set_index("_time")[["dns_rate_mean", "dns_rate_p95", "dns_rate_max"]])
+        st.bar_chart(rollup_df.set_index("_time")["anomalies"])
+
+with st.expander("🩺 Pipeline Health"):
+    render_pipeline_health({"Result hub": hub})
+    st.caption("✍️ Write-back")
+    st.json(writer.stats())
@@ -0,0 +1,201 @@
+import hashlib
+import os
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from instrumentation import metrics
+
+# --- On-Disk Columnar Cache ---
+# Historical pulls are stored as one Parquet file per measurement and time
+# partition, so a restart or a wider range only fetches partitions that are
+# missing. Reads are memory-mapped and the cache is trimmed least-recently
+# used first once it grows past ``max_bytes``.
+#
+#   cache = PartitionedCache("cache")
+#   df = cache.load("dns", "-7d", influx_range_fetch("dns", fields))
+
+CACHE_DIR = os.environ.get("PARQUET_CACHE_DIR", "cache")
+TIME_FMT = "%Y%m%dT%H%M%S"
+
+
+def _read(path, columns=None):
+    """Memory-mapped Parquet read; the table's buffers stay backed by the file."""
+    return pq.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+
+class PartitionedCache:
+    """Parquet partitions keyed by measurement, field set and time bucket.
+
+    Only partitions that ended more than ``settle`` ago are persisted; the
+    newest, still-filling partition is always fetched fresh.
+    """
+
+    def __init__(self, root=CACHE_DIR, partition="1h", max_bytes=2 * 1024 ** 3, settle="1m"):
+        self.root = root
+        self.partition = pd.Timedelta(partition)
+        self.max_bytes = max_bytes
+        self.settle = pd.Timedelta(settle)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _dir(self, measurement, fields):
+        key = ",".join(sorted(fields)) if fields else "*"
+        digest = hashlib.sha1(key.encode()).hexdigest()[:10]
+        return os.path.join(self.root, measurement, digest)
+
+    def _partitions(self, start, stop):
+        first = start.floor(self.partition)
+        return pd.date_range(first, stop, freq=self.partition, inclusive="left") if first < stop else []
+
+    def load(self, measurement, start, fetch, fields=None, stop=None):
+        """Return rows of ``measurement`` in ``[start, stop)``.
+
+        ``fetch(start, stop)`` is called only for partitions not on disk and
+        must return a frame with a ``_time`` column.
+        """
+        now = pd.Timestamp.now(tz="UTC")
+        start = now - pd.Timedelta(start.lstrip("-")) if isinstance(start, str) else pd.Timestamp(start)
+        stop = now if stop is None else pd.Timestamp(stop)
+        folder = self._dir(measurement, fields)
+        os.makedirs(folder, exist_ok=True)
+
+        frames = []
+        for part in self._partitions(start, stop):
+            part_stop = part + self.partition
+            path = os.path.join(folder, part.strftime(TIME_FMT) + ".parquet")
+            if os.path.exists(path):
+                with metrics.timer("cache_read") as t:
+                    df = _read(path)
+                    t["rows"] = len(df)
+                os.utime(path)
+                self.hits += 1
+                metrics.incr("parquet_cache.hit")
+            else:
+                df = fetch(part, part_stop)
+                self.misses += 1
+                metrics.incr("parquet_cache.miss")
+                if part_stop <= now - self.settle:
+                    self._write(path, df)
+            frames.append(df)
+
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            return pd.DataFrame(columns=["_time"] + list(fields or []))
+        df = pd.concat(frames, ignore_index=True)
+        times = pd.to_datetime(df["_time"], utc=True)
+        df = df[(times >= start) & (times < stop)].reset_index(drop=True)
+        self.evict()
+        return df
+
+    def _write(self, path, df):
+        tmp = path + ".tmp"
+        table = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False)
+        pq.write_table(table, tmp)
+        os.replace(tmp, path)
+
+    def files(self):
+        out = []
+        for folder, _, names in os.walk(self.root):
+            out.extend(os.path.join(folder, n) for n in names if n.endswith(".parquet"))
+        return out
+
+    def size(self):
+        return sum(os.path.getsize(f) for f in self.files())
+
+    def evict(self):
+        """Remove least-recently used partitions until under ``max_bytes``."""
+        with self._lock:
+            files = sorted(self.files(), key=os.path.getmtime)
+            total = sum(os.path.getsize(f) for f in files)
+            removed = 0
+            while files and total > self.max_bytes:
+                path = files.pop(0)
+                total -= os.path.getsize(path)
+                os.remove(path)
+                removed += 1
+            return removed
+
+    def clear(self, measurement=None):
+        for path in self.files():
+            if measurement is None or os.path.relpath(path, self.root).split(os.sep)[0] == measurement:
+                os.remove(path)
+
+
+def influx_range_fetch(measurement, fields=None, limit=None, **decode_kwargs):
+    """``fetch(start, stop)`` over one measurement for ``PartitionedCache.load``;
+    ``decode_kwargs`` (``dropna``, ``ffill``, ...) go to ``influx.query_frame``."""
+    from influx import build_query, query_frame
+
+    fmt = "%Y-%m-%dT%H:%M:%SZ"
+
+    def fetch(start, stop):
+        return query_frame(build_query(measurement, start=start.strftime(fmt), stop=stop.strftime(fmt),
+                                       fields=fields, sort=True, limit=limit),
+                           fields=fields, capacity=limit, **decode_kwargs)
+    return fetch
+
+
+# --- CSV Copies ---
+def csv_copy_path(path, columns=None, root=CACHE_DIR):
+    """Where the Parquet copy of ``path`` (restricted to ``columns``) lives;
+    the name changes whenever the CSV does."""
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}:{sorted(columns or [])}"
+    return os.path.join(root, "csv", hashlib.sha1(key.encode()).hexdigest()[:16] + ".parquet")
+
+
+class ParquetSpool:
+    """Writes the chunks of a CSV read in progress to its Parquet copy, so
+    the first pass over a CSV also builds the copy that later passes and
+    restarts read instead.
+
+    The copy appears atomically on ``commit``. A chunk whose types don't
+    match the first chunk's abandons the copy rather than failing the read.
+    """
+
+    def __init__(self, target):
+        self.target = target
+        self.failed = False
+        self._tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self._writer = None
+
+    def write(self, df):
+        if self.failed:
+            return
+        try:
+            if self._writer is None:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                os.makedirs(os.path.dirname(self.target), exist_ok=True)
+                self._writer = pq.ParquetWriter(self._tmp, table.schema)
+            else:
+                table = pa.Table.from_pandas(df, schema=self._writer.schema, preserve_index=False)
+            self._writer.write_table(table)
+        except (pa.ArrowException, OSError):
+            self.discard()
+            self.failed = True
+
+    def commit(self):
+        """Publish the copy; returns whether one was written."""
+        if self._writer is None or self.failed:
+            self.discard()
+            return False
+        self._writer.close()
+        self._writer = None
+        os.replace(self._tmp, self.target)
+        return True
+
+    def discard(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
@@ -0,0 +1,183 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrumentation import metrics
+
+# --- Prediction API Client ---
+# /predict takes one row as {"inter_arrival_time": ..., "dns_rate": ...}.
+# /predict_batch takes the whole frame as columns:
+#   {"columns": {"inter_arrival_time": [...], "dns_rate": [...]}}
+# and answers with arrays of the same length:
+#   {"anomaly": [...], "reconstruction_error": [...], ...}
+
+DEFAULT_TIMEOUT = 8
+RESULT_COLUMNS = ["anomaly", "reconstruction_error"]
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def batch_url(api_url):
+    base = api_url.rstrip("/")
+    if base.endswith("/predict"):
+        base = base[: -len("/predict")]
+    return base + "/predict_batch"
+
+
+def to_payload(df, features):
+    return {"columns": {f: df[f].astype(float).tolist() for f in features}}
+
+
+def from_response(body, index):
+    """Turn a columnar /predict_batch response into a frame aligned to ``index``."""
+    missing = [c for c in RESULT_COLUMNS if c not in body]
+    if missing:
+        raise ValueError(f"Batch response missing fields: {missing}")
+    out = pd.DataFrame(index=index)
+    for name, values in body.items():
+        if isinstance(values, list):
+            if len(values) != len(index):
+                raise ValueError(f"Batch response field '{name}' has {len(values)} values, expected {len(index)}")
+            out[name] = np.asarray(values)
+    return out
+
+
+def predict_batch(df, api_url, features, timeout=DEFAULT_TIMEOUT, session=None):
+    """Score every row of ``df`` with a single POST to ``/predict_batch``.
+
+    Rows with missing features are not sent and come back as ``NaN``.
+    Errors are raised to the caller instead of being swallowed.
+    """
+    valid = df[features].dropna()
+    if valid.empty:
+        return pd.DataFrame(columns=RESULT_COLUMNS, index=df.index, dtype=float)
+
+    http = session or requests
+    response = http.post(batch_url(api_url), json=to_payload(valid, features), timeout=timeout)
+    response.raise_for_status()
+    return from_response(response.json(), valid.index).reindex(df.index)
+
+
+# --- Circuit Breaker ---
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised without touching the network while the breaker is open."""
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures and lets a single
+    trial call through once ``reset_timeout`` seconds have passed."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self):
+        with self._lock:
+            if self.state == "open":
+                remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+                raise CircuitOpenError(f"Prediction API unavailable, retrying in {remaining:.0f}s")
+            if self.state == "half-open":
+                # Only one trial request at a time; the rest keep failing fast
+                self.opened_at = time.monotonic()
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+# --- Pooled, Concurrent Client ---
+class PredictionClient:
+    """Keep-alive session, bounded thread pool, jittered retries and a circuit
+    breaker around the prediction API.
+
+    Create one per process with ``st.cache_resource`` so all reruns share the
+    connection pool.
+    """
+
+    def __init__(self, api_url, timeout=DEFAULT_TIMEOUT, max_workers=8, retries=2,
+                 backoff=0.2, failure_threshold=5, reset_timeout=30):
+        self.api_url = api_url
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="predict")
+
+    def _post(self, url, payload):
+        self.breaker.before_call()
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.post(url, json=payload, timeout=self.timeout)
+                if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                    raise requests.exceptions.HTTPError(f"{response.status_code} from {url}", response=response)
+                response.raise_for_status()
+                self.breaker.record_success()
+                return response.json()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                    requests.exceptions.HTTPError) as e:
+                status = getattr(e.response, "status_code", None)
+                if status is not None and status not in RETRY_STATUSES:
+                    # The endpoint answered, so it is reachable: a client error
+                    # closes the breaker (ending a half-open trial) instead of
+                    # tripping it
+                    self.breaker.record_success()
+                    raise
+                if attempt == self.retries:
+                    self.breaker.record_failure()
+                    raise
+                # Full jitter so concurrent callers don't retry in lockstep
+                time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+    def predict(self, payload):
+        with metrics.timer("http_predict", rows=1):
+            return self._post(self.api_url, payload)
+
+    def predict_many(self, payloads):
+        """Send single-row payloads concurrently over the shared pool."""
+        return list(self.pool.map(self.predict, payloads))
+
+    def predict_batch(self, df, features, chunk_size=5000):
+        """Columnar batch scoring; frames larger than ``chunk_size`` are split
+        and the chunks sent concurrently."""
+        valid = df[features].dropna()
+        if valid.empty:
+            return pd.DataFrame(columns=RESULT_COLUMNS, index=df.index, dtype=float)
+
+        with metrics.timer("http_predict", rows=len(valid)):
+            url = batch_url(self.api_url)
+            chunks = [valid.iloc[i:i + chunk_size] for i in range(0, len(valid), chunk_size)]
+            bodies = self.pool.map(lambda c: self._post(url, to_payload(c, features)), chunks)
+            parts = [from_response(body, chunk.index) for body, chunk in zip(bodies, chunks)]
+            return pd.concat(parts).reindex(df.index)
+
+    def close(self):
+        self.pool.shutdown(wait=False)
+        self.session.close()
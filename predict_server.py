@@ -0,0 +1,111 @@
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# --- Local Stand-in for the Prediction API ---
+# Serves the same /predict and /predict_batch contract as the hosted model so the
+# dashboards, benchmarks and load tests can run without network access.
+# Run with: python predict_server.py --port 8000
+
+THRESHOLD = 0.1
+
+# Rough "normal traffic" profile; the reconstruction error is the mean squared
+# z-score of each feature against it, scaled so ~3 sigma crosses THRESHOLD.
+REFERENCE = {
+    "inter_arrival_time": (0.5, 0.3),
+    "dns_rate": (10.0, 8.0),
+    "packet_length": (500.0, 150.0),
+}
+
+
+def score(columns):
+    features = [f for f in columns if f in REFERENCE]
+    if not features:
+        raise ValueError(f"No known features in request, expected any of {list(REFERENCE)}")
+    n = len(columns[features[0]])
+    z2 = np.zeros(n)
+    for f in features:
+        mu, sd = REFERENCE[f]
+        x = np.asarray(columns[f], dtype=float)
+        if len(x) != n:
+            raise ValueError("All feature columns must have the same length")
+        z2 += ((x - mu) / sd) ** 2
+    error = z2 / len(features) / 100.0
+
+    result = {
+        "reconstruction_error": error.tolist(),
+        "anomaly": (error > THRESHOLD).astype(int).tolist(),
+    }
+    for f in features:
+        result[f] = np.asarray(columns[f], dtype=float).tolist()
+    if "inter_arrival_time" in columns:
+        iat = np.asarray(columns["inter_arrival_time"], dtype=float)
+        with np.errstate(divide="ignore"):
+            result["request_rate"] = np.where(iat > 0, 1.0 / iat, 0.0).tolist()
+    return result
+
+
+def predict(body):
+    batch = score({k: [v] for k, v in body.items()})
+    return {k: v[0] for k, v in batch.items()}
+
+
+def predict_batch(body):
+    return score(body["columns"])
+
+
+ROUTES = {
+    "/predict": predict,
+    "/predict_batch": predict_batch,
+}
+
+
+class PredictHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        route = ROUTES.get(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length)
+        if route is None:
+            self._send(404, {"detail": "Not Found"})
+            return
+        try:
+            self._send(200, route(json.loads(raw)))
+        except (ValueError, KeyError, TypeError) as e:
+            self._send(422, {"detail": str(e)})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host="127.0.0.1", port=0):
+    """Start the stand-in on a daemon thread and return ``(server, base_url)``.
+
+    ``port=0`` picks a free port. Call ``server.shutdown()`` when done.
+    """
+    server = ThreadingHTTPServer((host, port), PredictHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the DoS/DNS prediction API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    httpd = ThreadingHTTPServer((args.host, args.port), PredictHandler)
+    print(f"Serving prediction stand-in on http://{args.host}:{args.port}")
+    httpd.serve_forever()
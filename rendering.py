@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+
+# --- Bounded Render Layer ---
+# Charts and tables are reduced on the server before they are serialised, so
+# the payload sent to the browser stays bounded however large the window is:
+# lines are downsampled with LTTB (or min/max bucketing) while every anomaly
+# is kept, big traces switch to WebGL, and tables are paginated.
+#
+#   plot_df = downsample(df, "dns_rate", x="_time", keep=df["anomaly"] == 1)
+#   st.plotly_chart(line_figure(plot_df, "_time", "dns_rate", anomaly="anomaly"))
+#   paged_dataframe(df, key="records")
+
+MAX_POINTS = 2000
+WEBGL_THRESHOLD = 1000
+
+
+def _as_float(values):
+    values = pd.Series(values) if not isinstance(values, pd.Series) else values
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(float)
+    return pd.to_numeric(values, errors="coerce").to_numpy(dtype=float)
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets (Steinarsson, 2013): indices of the
+    ``n_out`` points that best preserve the visual shape of ``y`` over ``x``."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        if i == n_out - 3:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        else:
+            nhi = max(edges[i + 2], edges[i + 1] + 1)
+            avg_x, avg_y = x[edges[i + 1]:nhi].mean(), y[edges[i + 1]:nhi].mean()
+        # Twice the triangle area between the last pick, each candidate and
+        # the next bucket's centroid
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def minmax_indices(y, n_out):
+    """Indices of the minimum and maximum of ``y`` in each of ``n_out // 2``
+    equal-count buckets; cheaper than LTTB and keeps every spike's extent."""
+    n = len(y)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+    buckets = np.arange(n) * (n_out // 2) // n
+    order = np.lexsort((y, buckets))
+    sorted_buckets = buckets[order]
+    first = np.flatnonzero(np.r_[True, sorted_buckets[1:] != sorted_buckets[:-1]])
+    last = np.r_[first[1:] - 1, n - 1]
+    return np.unique(np.concatenate([order[first], order[last]]))
+
+
+def downsample(df, y, x=None, max_points=MAX_POINTS, keep=None, method="lttb"):
+    """Rows of ``df`` reduced to about ``max_points`` for plotting ``y``.
+
+    ``keep`` is a boolean mask of rows that are always retained (anomalies);
+    if it selects more than ``max_points`` rows they are thinned evenly, so
+    the result never exceeds ``2 * max_points`` rows. Row order is preserved.
+    """
+    if len(df) <= max_points:
+        return df
+    values = _as_float(df[y])
+    finite = np.flatnonzero(np.isfinite(values))
+    if method == "minmax":
+        picked = minmax_indices(values[finite], max_points)
+    elif method == "lttb":
+        xs = _as_float(df[x]) if x is not None else np.arange(len(df), dtype=float)
+        picked = lttb_indices(xs[finite], values[finite], max_points)
+    else:
+        raise ValueError(f"Unknown downsampling method '{method}', expected 'lttb' or 'minmax'")
+    rows = finite[picked]
+    if keep is not None:
+        kept = np.flatnonzero(np.asarray(keep, dtype=bool))
+        if len(kept) > max_points:
+            kept = kept[np.linspace(0, len(kept) - 1, max_points).astype(np.int64)]
+        rows = np.union1d(rows, kept)
+    return df.iloc[rows]
+
+
+def line_figure(df, x, y, anomaly=None, anomaly_label=1, title=None, labels=None,
+                line_color="blue", anomaly_color="red", webgl_threshold=WEBGL_THRESHOLD):
+    """Line of ``y`` over ``x`` with the rows where ``anomaly == anomaly_label``
+    overlaid as markers. Traces become ``Scattergl`` above ``webgl_threshold``
+    points."""
+    import plotly.graph_objects as go
+
+    labels = labels or {}
+    scatter = go.Scattergl if len(df) > webgl_threshold else go.Scatter
+    fig = go.Figure(scatter(x=df[x], y=df[y], mode="lines", name="Normal", line=dict(color=line_color)))
+    if anomaly is not None and anomaly in df.columns:
+        flagged = df[df[anomaly] == anomaly_label]
+        fig.add_trace(scatter(x=flagged[x], y=flagged[y], mode="markers", name="Anomaly",
+                              marker=dict(color=anomaly_color, size=6)))
+    fig.update_layout(title=title, xaxis_title=labels.get(x, x), yaxis_title=labels.get(y, y))
+    return fig
+
+
+def downsample_caption(shown, total, anomalies_thinned=False):
+    """Caption noting how many points a reduced chart shows, or ``None``."""
+    if shown >= total:
+        return None
+    kept = "anomaly markers thinned" if anomalies_thinned else "every anomaly kept"
+    return f"📉 Showing {shown:,} of {total:,} points ({kept})"
+
+
+def paged_dataframe(df, page_size=100, key="table", style=None, newest_first=False):
+    """Render one ``page_size`` page of ``df`` with a page picker.
+
+    ``style(page) -> Styler`` is applied to the visible page only, so
+    per-row styling costs the same however long ``df`` is.
+    """
+    import streamlit as st
+
+    if newest_first:
+        df = df.iloc[::-1]
+    pages = max(1, -(-len(df) // page_size))
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1,
+                           key=key) if pages > 1 else 1
+    start = (page - 1) * page_size
+    chunk = df.iloc[start:start + page_size]
+    st.dataframe(style(chunk) if style else chunk, use_container_width=True)
+    if pages > 1:
+        st.caption(f"Rows {start + 1:,}–{start + len(chunk):,} of {len(df):,}")
+    return chunk
@@ -0,0 +1,415 @@
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import Metrics
+
+# --- Historical Replay / Backtest ---
+# Streams a recorded capture (CSV, Parquet, an InfluxDB range or the
+# simulator) through the same score -> alert stages as the live dashboards,
+# in event-time order, either paced at ``speed`` times real time or as fast
+# as possible. Paced replays release rows in ``tick``-second micro-batches
+# of event time, like a live poll; unpaced ones in ``batch_rows``-row
+# batches, so sparse traffic isn't scored a handful of rows at a time. The
+# report covers throughput, per-stage latency, pipeline lag and, when the
+# capture is labelled, per-attack detection lag.
+#
+#   python replay.py Clean_DOS_Capstone.csv --speed 100 --scorer iforest
+#   python replay.py --influx dns --start 2026-01-01T00:00:00Z --stop 2026-01-02T00:00:00Z --scorer hst
+#   python replay.py --simulate syn_flood --rows 500000 --speed 0 --alerts alerts.jsonl
+
+FEATURES = ["packet_length", "inter_arrival_time"]
+
+
+# --- Sources ---
+# Each yields DataFrames in time order; ``event_times`` adds the event clock.
+def file_source(path, chunksize=100_000, columns=None):
+    """Chunks of a CSV or Parquet capture, with compact dtypes."""
+    from chunked_loader import iter_chunks
+
+    yield from iter_chunks(path, chunksize, columns=columns)
+
+
+def influx_source(measurement, start, stop, fields=None, step="1h", cache=None):
+    """``[start, stop)`` of ``measurement`` fetched one ``step`` at a time.
+    With a ``parquet_cache.PartitionedCache`` settled partitions are read
+    from disk, so repeated backtests of the same range skip InfluxDB."""
+    from parquet_cache import influx_range_fetch
+
+    fetch = influx_range_fetch(measurement, fields=fields)
+    start, stop, step = pd.Timestamp(start), pd.Timestamp(stop), pd.Timedelta(step)
+    while start < stop:
+        end = min(start + step, stop)
+        df = cache.load(measurement, start, fetch, fields=fields, stop=end) if cache else fetch(start, end)
+        if not df.empty:
+            yield df
+        start = end
+
+
+def simulator_source(profile="syn_flood", rows=100_000, batch_size=10_000, seed=42, start=None):
+    from simulator import TrafficSimulator
+
+    sim = TrafficSimulator(profile, seed=seed, start=start or "2026-01-01")
+    for offset in range(0, rows, batch_size):
+        yield sim.batch(min(batch_size, rows - offset))
+
+
+def event_times(frames, time_col="_time", start="2026-01-01"):
+    """Set ``time_col`` to UTC event time. Captures without one (such as
+    ``Clean_DOS_Capstone.csv``) get a clock rebuilt from the cumulative
+    ``inter_arrival_time``, continued across chunks from ``start``."""
+    clock = pd.Timestamp(start, tz="UTC")
+    for df in frames:
+        if time_col in df.columns:
+            times = pd.to_datetime(df[time_col], utc=True)
+        else:
+            offsets = np.cumsum(np.nan_to_num(pd.to_numeric(df["inter_arrival_time"], errors="coerce")
+                                              .to_numpy(dtype=float).clip(min=0)))
+            times = pd.Series(clock + pd.to_timedelta(offsets, unit="s"), index=df.index)
+            clock = times.iloc[-1] if len(times) else clock
+        df = df.assign(**{time_col: times})
+        if not times.is_monotonic_increasing:
+            df = df.sort_values(time_col, kind="stable")
+        yield df
+
+
+# --- Scorers ---
+# ``scorer(df) -> (anomaly, score)``: 1/0/NaN flags and the raw score,
+# ``tail`` saying which end of the score is anomalous.
+class Scorer:
+    tail = "upper"
+
+    def __init__(self, features=FEATURES, threshold=None):
+        self.features = list(features)
+        # Optional thresholds.StreamingThreshold replacing the scorer's own cut-off
+        self.threshold = threshold
+
+    def _flags(self, scores, flags):
+        if self.threshold is None:
+            return flags
+        return self.threshold.screen(scores)[0]
+
+    def matrix(self, df):
+        X = df[self.features].apply(pd.to_numeric, errors="coerce")
+        return X.notna().all(axis=1).to_numpy(), X.to_numpy(dtype=float)
+
+
+class EngineScorer(Scorer):
+    """``detection.DetectionEngine`` (IsolationForest), retrained on its
+    schedule measured in replayed event time rather than wall time."""
+
+    tail = "lower"
+
+    def __init__(self, engine, threshold=None):
+        super().__init__(engine.features, threshold)
+        self.engine = engine
+        self.now = 0.0
+        engine.clock = lambda: self.now
+
+    def __call__(self, df):
+        self.now = df["_time"].iloc[-1].timestamp()
+        valid, X = self.matrix(df)
+        anomaly, scores = np.full(len(df), np.nan), np.full(len(df), np.nan)
+        if self.engine.needs_training(X[valid]):
+            self.engine.fit(X[valid])
+        if self.engine.is_fitted and valid.any():
+            labels, raw = self.engine.score(X[valid])
+            anomaly[valid] = self._flags(raw, labels == -1)
+            scores[valid] = raw
+        return anomaly, scores
+
+
+class DetectorScorer(Scorer):
+    """One of the online ``detectors.DETECTORS`` (``ewma``, ``mad``, ``hst``)."""
+
+    def __init__(self, detector, features=FEATURES, threshold=None):
+        super().__init__(features, threshold)
+        self.detector = detector
+
+    def __call__(self, df):
+        valid, X = self.matrix(df)
+        anomaly, scores = np.full(len(df), np.nan), np.full(len(df), np.nan)
+        if valid.any():
+            ready = self.detector.is_ready
+            raw, flags = self.detector.screen(X[valid])
+            anomaly[valid] = self._flags(raw, flags)
+            # A detector that hasn't learned anything yet scores every row 0
+            scores[valid] = raw if ready else np.nan
+        return anomaly, scores
+
+
+class ApiScorer(Scorer):
+    """The prediction API (hosted model or ``predict_server.py``)."""
+
+    def __init__(self, client, features=FEATURES, threshold=None):
+        super().__init__(features, threshold)
+        self.client = client
+
+    def __call__(self, df):
+        result = self.client.predict_batch(df, self.features)
+        scores = pd.to_numeric(result["reconstruction_error"], errors="coerce").to_numpy(dtype=float)
+        anomaly = pd.to_numeric(result["anomaly"], errors="coerce").to_numpy(dtype=float)
+        if self.threshold is not None:
+            valid = np.isfinite(scores)
+            anomaly[valid] = self._flags(scores[valid], anomaly[valid] == 1)
+        return anomaly, scores
+
+
+# --- Replay ---
+class Replay:
+    """Drive ``frames`` (already carrying ``_time``, see ``event_times``)
+    through ``scorer`` and an optional ``alerts.AlertEngine``.
+
+    ``speed`` is the replay rate relative to real time (``None``/``0`` for
+    as fast as possible). ``tick`` defaults to 1 s when paced; without it
+    rows are batched ``batch_rows`` at a time. Labelled captures (``label_col``, 1 = attack) are
+    also split into attack episodes, separated by more than ``episode_gap``
+    seconds without attack rows, to measure how long each took to detect.
+    """
+
+    def __init__(self, frames, scorer, alerts=None, speed=None, tick=None, batch_rows=5000,
+                 label_col="label", episode_gap=10.0):
+        self.frames = frames
+        self.scorer = scorer
+        self.alerts = alerts
+        self.speed = speed or None
+        tick = tick or (1.0 if self.speed else None)
+        self.tick = None if tick is None else np.timedelta64(int(tick * 1e9), "ns")
+        self.batch_rows = batch_rows
+        self.label_col = label_col
+        self.episode_gap = np.timedelta64(int(episode_gap * 1e9), "ns")
+
+        self.metrics = Metrics()
+        self.evaluator = None
+        self.episodes = []
+        self.rows = 0
+        self.anomalies = 0
+        self.alerts_queued = 0
+        self.batches = 0
+        self._episode = None
+        self._now = 0.0
+        if alerts is not None:
+            # Rate-limit alerts per minute of replayed traffic, not of wall clock
+            alerts.clock = lambda: self._now
+
+    def batches_in(self):
+        """Tick-aligned (or ``batch_rows``-sized) micro-batches; the last,
+        possibly partial, one of a chunk is held back until the next chunk
+        completes it."""
+        carry = None
+        frames = iter(self.frames)
+        while True:
+            with self.metrics.timer("fetch") as t:
+                df = next(frames, None)
+                t["rows"] = 0 if df is None else len(df)
+            if df is None:
+                break
+            if carry is not None:
+                df = pd.concat([carry, df], ignore_index=True)
+            if self.tick is None:
+                edges = np.arange(self.batch_rows, len(df) + 1, self.batch_rows)
+            else:
+                times = df["_time"].dt.tz_localize(None).to_numpy(dtype="datetime64[ns]")
+                ticks = (times - times[0]) // self.tick
+                edges = np.flatnonzero(np.diff(ticks)) + 1
+            last = edges[-1] if len(edges) else 0
+            for lo, hi in zip(np.r_[0, edges[:-1]], edges):
+                yield df.iloc[lo:hi]
+            carry = df.iloc[last:]
+        if carry is not None and len(carry):
+            yield carry
+
+    def run(self, max_rows=None, progress=None):
+        """Replay everything (or the first ``max_rows``) and return the report."""
+        from evaluation import StreamingEvaluator
+
+        self.evaluator = StreamingEvaluator(window=100_000, tail=self.scorer.tail)
+        wall_start = time.perf_counter()
+        event_start = None
+        for batch in self.batches_in():
+            times = batch["_time"].dt.tz_localize(None).to_numpy(dtype="datetime64[ns]")
+            if event_start is None:
+                event_start = times[0]
+            self._now = times[-1].astype(np.int64) / 1e9
+            if self.speed:
+                # Release the batch when its last event is due at this speed
+                due = wall_start + (times[-1] - event_start) / np.timedelta64(1, "s") / self.speed
+                ahead = due - time.perf_counter()
+                if ahead > 0:
+                    time.sleep(ahead)
+            else:
+                due = time.perf_counter()
+
+            with self.metrics.timer("score", rows=len(batch)):
+                anomaly, scores = self.scorer(batch)
+            scored = batch.assign(anomaly=anomaly, score=scores)
+            queued = 0
+            if self.alerts is not None:
+                with self.metrics.timer("alert", rows=len(batch)):
+                    queued = self.alerts.observe(scored)
+            self.metrics.record("lag", max(0.0, time.perf_counter() - due), len(batch))
+
+            flagged = anomaly == 1
+            self.rows += len(batch)
+            self.anomalies += int(flagged.sum())
+            self.alerts_queued += queued
+            self.batches += 1
+            if self.label_col in batch.columns:
+                labels = pd.to_numeric(batch[self.label_col], errors="coerce").to_numpy(dtype=float)
+                self.evaluator.update(labels, anomaly, scores)
+                self._track_episodes(times, labels == 1, flagged, queued)
+            if progress:
+                progress(self.rows)
+            if max_rows and self.rows >= max_rows:
+                break
+        self._close_episode()
+        wall = time.perf_counter() - wall_start
+        span = 0.0 if event_start is None else (times[-1] - event_start) / np.timedelta64(1, "s")
+        return self.report(wall, span)
+
+    # --- Detection lag ---
+    def _track_episodes(self, times, attack, flagged, queued):
+        idx = np.flatnonzero(attack)
+        if len(idx):
+            t, f = times[idx], flagged[idx]
+            breaks = np.flatnonzero(np.diff(t) > self.episode_gap) + 1
+            for part in np.split(np.arange(len(t)), breaks):
+                ep = self._episode
+                if ep is not None and t[part[0]] - ep["end"] > self.episode_gap:
+                    self._close_episode()
+                    ep = None
+                if ep is None:
+                    ep = self._episode = {"start": t[part[0]], "end": t[part[0]], "rows": 0, "detected": 0,
+                                          "first_detection": None, "first_alert": None}
+                ep["end"] = t[part[-1]]
+                ep["rows"] += len(part)
+                hits = f[part]
+                ep["detected"] += int(hits.sum())
+                if ep["first_detection"] is None and hits.any():
+                    ep["first_detection"] = t[part][np.argmax(hits)]
+        ep = self._episode
+        # Only count an alert once the detector has actually flagged this attack
+        if (queued and ep is not None and ep["first_alert"] is None and ep["first_detection"] is not None
+                and times[-1] - ep["end"] <= self.episode_gap):
+            ep["first_alert"] = times[-1]
+
+    def _close_episode(self):
+        ep, self._episode = self._episode, None
+        if ep is None:
+            return
+        seconds = lambda t: None if t is None else (t - ep["start"]) / np.timedelta64(1, "s")
+        self.episodes.append({
+            "start": pd.Timestamp(ep["start"], tz="UTC").isoformat(),
+            "duration_sec": seconds(ep["end"]),
+            "rows": ep["rows"],
+            "recall": ep["detected"] / ep["rows"],
+            "detection_lag_sec": seconds(ep["first_detection"]),
+            "alert_lag_sec": seconds(ep["first_alert"]),
+        })
+
+    def report(self, wall, span):
+        stages = self.metrics.snapshot()["stages"]
+        detected = [e["detection_lag_sec"] for e in self.episodes if e["detection_lag_sec"] is not None]
+        alerted = [e["alert_lag_sec"] for e in self.episodes if e["alert_lag_sec"] is not None]
+        out = {
+            "rows": self.rows,
+            "batches": self.batches,
+            "anomalies": self.anomalies,
+            "alerts": self.alerts_queued,
+            "wall_sec": wall,
+            "event_span_sec": span,
+            "target_speed": self.speed,
+            "achieved_speed": span / wall if wall else None,
+            "rows_per_sec": self.rows / wall if wall else 0.0,
+            "stages": {s: {k: v for k, v in h.items() if k in ("count", "p50", "p95", "p99", "max", "mean")}
+                       for s, h in stages.items()},
+        }
+        if self.evaluator is not None and self.evaluator.total:
+            scores = self.evaluator.metrics("cumulative")
+            curves = self.evaluator.curves("cumulative")
+            out["quality"] = {k: scores[k] for k in ("count", "accuracy", "precision", "recall", "f1")}
+            out["quality"]["roc_auc"] = None if curves is None else curves["roc_auc"]
+            out["attacks"] = {
+                "episodes": len(self.episodes),
+                "detected": len(detected),
+                "alerted": len(alerted),
+                "detection_lag_p50_sec": float(np.median(detected)) if detected else None,
+                "detection_lag_max_sec": float(np.max(detected)) if detected else None,
+                "alert_lag_p50_sec": float(np.median(alerted)) if alerted else None,
+            }
+            out["episodes"] = self.episodes
+        return out
+
+
+def build_scorer(name, features=FEATURES, url=None, quantile=None):
+    """Scorer by CLI name: ``iforest``, ``api`` or any registered detector."""
+    from thresholds import StreamingThreshold
+
+    if name == "iforest":
+        from detection import DetectionEngine
+
+        threshold = StreamingThreshold(quantile, window=20000, tail="lower") if quantile else None
+        return EngineScorer(DetectionEngine(features, adaptive_threshold=threshold))
+    threshold = StreamingThreshold(quantile, window=20000) if quantile else None
+    if name == "api":
+        from predict_api import PredictionClient
+
+        return ApiScorer(PredictionClient(url or "http://localhost:8000/predict"), features, threshold)
+    from detectors import create
+
+    return DetectorScorer(create(name), features, threshold)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded capture through score -> alert")
+    parser.add_argument("path", nargs="?", help="CSV or Parquet capture")
+    parser.add_argument("--influx", metavar="MEASUREMENT", help="replay an InfluxDB range instead")
+    parser.add_argument("--start", help="range start for --influx")
+    parser.add_argument("--stop", help="range stop for --influx")
+    parser.add_argument("--simulate", metavar="PROFILE", help="replay simulator traffic instead")
+    parser.add_argument("--rows", type=int, default=None, help="stop after this many rows")
+    parser.add_argument("--speed", type=float, default=0, help="x real time; 0 = as fast as possible")
+    parser.add_argument("--tick", type=float, help="event seconds per micro-batch (default 1 when paced)")
+    parser.add_argument("--batch-rows", type=int, default=5000, help="rows per batch when not paced")
+    parser.add_argument("--scorer", default="iforest", help="iforest, api, ewma, mad or hst")
+    parser.add_argument("--features", default=",".join(FEATURES))
+    parser.add_argument("--quantile", type=float, help="adaptive threshold quantile (e.g. 0.01 for iforest)")
+    parser.add_argument("--url", help="prediction API URL for --scorer api")
+    parser.add_argument("--alerts", metavar="PATH", help="append alerts as JSON lines to PATH")
+    parser.add_argument("--output", help="also write the report to this JSON file")
+    args = parser.parse_args()
+
+    if args.influx:
+        if not args.start or not args.stop:
+            parser.error("--influx needs --start and --stop")
+        source = influx_source(args.influx, args.start, args.stop)
+    elif args.simulate:
+        source = simulator_source(args.simulate, args.rows or 100_000)
+    elif args.path:
+        source = file_source(args.path)
+    else:
+        parser.error("give a capture path, --influx or --simulate")
+
+    features = args.features.split(",")
+    engine = None
+    if args.alerts:
+        from alerts import AlertDispatcher, AlertEngine, file_sink
+
+        dispatcher = AlertDispatcher([file_sink(args.alerts)])
+        engine = AlertEngine(dispatcher, features, time_col="_time", score_col="score")
+    replay = Replay(event_times(source), build_scorer(args.scorer, features, args.url, args.quantile),
+                    alerts=engine, speed=args.speed, tick=args.tick, batch_rows=args.batch_rows)
+    report = replay.run(max_rows=args.rows)
+    report["source"] = args.path or args.influx or f"simulate:{args.simulate}"
+    report["scorer"] = args.scorer
+    if engine is not None:
+        dispatcher.join()
+        report["alert_stats"] = dict(engine.stats(), **dispatcher.stats())
+    text = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    print(text)
@@ -0,0 +1,228 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import metrics
+
+# --- Multi-Resolution Rollups ---
+# Per-bucket count / mean / min / max / p95 of each field plus anomaly counts,
+# kept at 1s, 1m and 1h in fixed-size circular arrays. Ingest is vectorised
+# per batch and a query touches at most ``max_points`` buckets, so a 7-day
+# view costs the same as a 5-minute one.
+#
+#   store = RollupStore(["dns_rate", "inter_arrival_time"])
+#   store.ingest(scored_df, anomaly_label=-1)
+#   resolution, frame = store.query("-7d")
+
+# resolution -> (bucket width, retention)
+RESOLUTIONS = {
+    "1s": ("1s", "2h"),
+    "1m": ("1min", "2d"),
+    "1h": ("1h", "30d"),
+}
+
+# Log-spaced histogram edges shared by every bucket (~15% wide); p95 is read
+# from the histogram, so it is mergeable across batches.
+BINS = np.logspace(-6, 6, 193)
+
+
+class RollupLevel:
+    """Aggregates for one resolution in circular arrays indexed by bucket."""
+
+    def __init__(self, step, retention, fields):
+        self.step_ns = pd.Timedelta(step).value
+        self.capacity = int(pd.Timedelta(retention) // pd.Timedelta(step))
+        self.fields = list(fields)
+        self.bucket = np.full(self.capacity, -1, dtype=np.int64)
+        self.count = np.zeros(self.capacity, dtype=np.int64)
+        self.anomalies = np.zeros(self.capacity, dtype=np.int64)
+        self.n = {f: np.zeros(self.capacity, dtype=np.int64) for f in self.fields}
+        self.sum = {f: np.zeros(self.capacity) for f in self.fields}
+        self.min = {f: np.full(self.capacity, np.inf) for f in self.fields}
+        self.max = {f: np.full(self.capacity, -np.inf) for f in self.fields}
+        self.hist = {f: np.zeros((self.capacity, len(BINS) + 1), dtype=np.int32) for f in self.fields}
+
+    def _reset(self, slots):
+        self.count[slots] = 0
+        self.anomalies[slots] = 0
+        for f in self.fields:
+            self.n[f][slots] = 0
+            self.sum[f][slots] = 0.0
+            self.min[f][slots] = np.inf
+            self.max[f][slots] = -np.inf
+            self.hist[f][slots] = 0
+
+    def ingest(self, t_ns, values, anomaly=None):
+        buckets = t_ns // self.step_ns
+        # Only the newest ``capacity`` buckets fit; older points are past retention
+        keep = buckets > max(buckets.max(), self.bucket.max()) - self.capacity
+        if not keep.all():
+            buckets, values = buckets[keep], {f: v[keep] for f, v in values.items()}
+            anomaly = anomaly[keep] if anomaly is not None else None
+        if len(buckets) == 0:
+            return
+
+        uniq, inv = np.unique(buckets, return_inverse=True)
+        slots = uniq % self.capacity
+        current = self.bucket[slots]
+        # A slot still holding an older bucket is recycled; one holding a newer
+        # bucket means these points are too old to keep
+        fresh = current < uniq
+        self._reset(slots[fresh])
+        self.bucket[slots[fresh]] = uniq[fresh]
+        valid = (current <= uniq)[inv]
+        if not valid.all():
+            inv, values = inv[valid], {f: v[valid] for f, v in values.items()}
+            anomaly = anomaly[valid] if anomaly is not None else None
+
+        k = len(uniq)
+        self.count[slots] += np.bincount(inv, minlength=k)
+        if anomaly is not None:
+            self.anomalies[slots] += np.bincount(inv, weights=anomaly, minlength=k).astype(np.int64)
+        for f, v in values.items():
+            ok = np.isfinite(v)
+            fi, fv = inv[ok], v[ok]
+            self.n[f][slots] += np.bincount(fi, minlength=k)
+            self.sum[f][slots] += np.bincount(fi, weights=fv, minlength=k)
+            lo = np.full(k, np.inf)
+            hi = np.full(k, -np.inf)
+            np.minimum.at(lo, fi, fv)
+            np.maximum.at(hi, fi, fv)
+            self.min[f][slots] = np.minimum(self.min[f][slots], lo)
+            self.max[f][slots] = np.maximum(self.max[f][slots], hi)
+            bins = np.searchsorted(BINS, fv)
+            width = len(BINS) + 1
+            self.hist[f][slots] += np.bincount(fi * width + bins, minlength=k * width).reshape(k, width).astype(np.int32)
+
+    def frame(self, start_ns, stop_ns):
+        lo, hi = start_ns // self.step_ns, stop_ns // self.step_ns
+        slots = np.flatnonzero((self.bucket >= lo) & (self.bucket <= hi) & (self.count > 0))
+        slots = slots[np.argsort(self.bucket[slots])]
+        out = {
+            "_time": pd.to_datetime(self.bucket[slots] * self.step_ns, utc=True),
+            "count": self.count[slots],
+            "anomalies": self.anomalies[slots],
+        }
+        for f in self.fields:
+            n = self.n[f][slots]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                out[f"{f}_mean"] = self.sum[f][slots] / n
+            out[f"{f}_min"] = np.where(n > 0, self.min[f][slots], np.nan)
+            out[f"{f}_max"] = np.where(n > 0, self.max[f][slots], np.nan)
+            cum = self.hist[f][slots].cumsum(axis=1)
+            idx = np.argmax(cum >= np.ceil(0.95 * n)[:, None], axis=1)
+            p95 = BINS[np.minimum(idx, len(BINS) - 1)]
+            out[f"{f}_p95"] = np.where(n > 0, np.clip(p95, out[f"{f}_min"], out[f"{f}_max"]), np.nan)
+        return pd.DataFrame(out)
+
+
+class RollupStore:
+    """Local aggregation store holding every resolution in ``resolutions``.
+
+    Feed it with ``ingest`` (new rows only) or ``backfill``; read with
+    ``query``, which picks the finest resolution that covers the range in at
+    most ``max_points`` buckets. Cache one instance with ``st.cache_resource``.
+    """
+
+    def __init__(self, fields, resolutions=None):
+        self.fields = list(fields)
+        self.resolutions = dict(resolutions or RESOLUTIONS)
+        self.levels = {name: RollupLevel(step, retention, self.fields)
+                       for name, (step, retention) in self.resolutions.items()}
+        self.rows = 0
+        self._lock = threading.Lock()
+
+    def ingest(self, df, time_col="_time", anomaly_col="anomaly", anomaly_label=1):
+        """Add rows of ``df`` to every resolution; ``anomaly_col`` entries equal
+        to ``anomaly_label`` count as anomalies."""
+        if df.empty or time_col not in df.columns:
+            return 0
+        with metrics.timer("rollup", rows=len(df)):
+            t_ns = pd.to_datetime(df[time_col], utc=True).dt.as_unit("ns").astype("int64").to_numpy()
+            values = {f: df[f].to_numpy(dtype=float) for f in self.fields if f in df.columns}
+            anomaly = (df[anomaly_col] == anomaly_label).to_numpy(dtype=float) if anomaly_col in df.columns else None
+            with self._lock:
+                for level in self.levels.values():
+                    level.ingest(t_ns, values, anomaly)
+                self.rows += len(df)
+        return len(df)
+
+    def resolution_for(self, start, stop, max_points=2000):
+        """Finest resolution whose retention reaches ``start`` and whose bucket
+        count over ``[start, stop]`` stays within ``max_points``."""
+        span = stop - start
+        now = pd.Timestamp.now(tz="UTC")
+        choices = sorted(self.resolutions.items(), key=lambda item: pd.Timedelta(item[1][0]))
+        for name, (step, retention) in choices:
+            if now - start <= pd.Timedelta(retention) and span / pd.Timedelta(step) <= max_points:
+                return name
+        return choices[-1][0]
+
+    def query(self, start="-7d", stop=None, max_points=2000, resolution=None):
+        """Return ``(resolution, frame)`` of bucketed aggregates over the range."""
+        now = pd.Timestamp.now(tz="UTC")
+        start = now - pd.Timedelta(start[1:]) if isinstance(start, str) and start.startswith("-") \
+            else pd.Timestamp(start)
+        stop = now if stop is None else pd.Timestamp(stop)
+        resolution = resolution or self.resolution_for(start, stop, max_points)
+        with self._lock:
+            frame = self.levels[resolution].frame(start.value, stop.value)
+        return resolution, frame
+
+    def backfill(self, fetch, start="-7d", stop=None, chunk="1h", **ingest_kwargs):
+        """Ingest history by calling ``fetch(start, stop)`` one ``chunk`` at a
+        time, so memory stays bounded by one chunk of raw points. ``stop``
+        (e.g. ``"-10m"``) leaves the most recent span to live ingestion."""
+        now = pd.Timestamp.now(tz="UTC")
+        end = now - pd.Timedelta(stop.lstrip("-")) if stop else now
+        cursor = now - pd.Timedelta(start.lstrip("-"))
+        total = 0
+        while cursor < end:
+            upper = min(cursor + pd.Timedelta(chunk), end)
+            total += self.ingest(fetch(cursor, upper), **ingest_kwargs)
+            cursor = upper
+        return total
+
+
+def influx_fetch(measurement, fields=None):
+    """``fetch(start, stop)`` for ``RollupStore.backfill`` over one measurement."""
+    from influx import build_query, query_frame
+
+    fmt = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+    def fetch(start, stop):
+        return query_frame(build_query(measurement, start=start.strftime(fmt), stop=stop.strftime(fmt),
+                                       fields=fields))
+    return fetch
+
+
+# --- Flux Tasks ---
+def flux_task(resolution, measurement="dns", fields=("dns_rate", "inter_arrival_time"),
+              bucket="realtime_dns", dest_bucket="realtime_dns_rollups", org="Anormally Detection"):
+    """Flux task that keeps the same rollup in InfluxDB itself, for
+    deployments where a server-side task is preferred to the local store."""
+    step = RESOLUTIONS[resolution][0].replace("min", "m")
+    condition = " or ".join(f'r._field == "{f}"' for f in fields)
+    source = (f'from(bucket: "{bucket}")\n'
+              f"  |> range(start: -task.every)\n"
+              f'  |> filter(fn: (r) => r._measurement == "{measurement}")\n'
+              f"  |> filter(fn: (r) => {condition})")
+    aggregates = []
+    for name in ("count", "mean", "min", "max"):
+        aggregates.append(f"agg_{name} = data |> aggregateWindow(every: {step}, fn: {name}, createEmpty: false)"
+                          f' |> toFloat() |> set(key: "agg", value: "{name}")')
+    aggregates.append(f"agg_p95 = data |> aggregateWindow(every: {step}, createEmpty: false, "
+                      f"fn: (column, tables=<-) => tables |> quantile(q: 0.95, column: column))"
+                      f' |> set(key: "agg", value: "p95")')
+    return "\n".join([
+        f'option task = {{name: "{measurement}_rollup_{resolution}", every: {step}}}',
+        "",
+        f"data = {source}",
+        "",
+        *aggregates,
+        "",
+        "union(tables: [agg_count, agg_mean, agg_min, agg_max, agg_p95])",
+        f'  |> set(key: "_measurement", value: "{measurement}_{resolution}")',
+        f'  |> to(bucket: "{dest_bucket}", org: "{org}", tagColumns: ["agg"])',
+    ])
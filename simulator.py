@@ -0,0 +1,210 @@
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+# --- Traffic Profiles ---
+# Each profile mixes baseline traffic with an attack component. Attack packets
+# arrive in bursts (on/off segments) covering roughly ``attack_ratio`` of rows.
+PROTOCOLS = np.array(["TCP", "UDP", "ICMP"])
+
+PROFILES = {
+    "baseline": {"attack_ratio": 0.0, "mean_burst": 1},
+    "syn_flood": {"attack_ratio": 0.3, "mean_burst": 500},
+    "slow_rate": {"attack_ratio": 0.2, "mean_burst": 50},
+    "dns_amplification": {"attack_ratio": 0.3, "mean_burst": 300},
+}
+
+
+def _baseline(rng, n):
+    return {
+        "packet_length": np.clip(rng.normal(500, 100, n), 40, 1500),
+        "inter_arrival_time": rng.exponential(0.5, n),
+        "dns_rate": rng.poisson(10, n).astype(float),
+        "protocol": rng.choice(3, n, p=[0.6, 0.35, 0.05]),
+    }
+
+
+def _syn_flood(rng, n):
+    # Tiny TCP SYNs at a very high rate
+    return {
+        "packet_length": rng.uniform(40, 64, n),
+        "inter_arrival_time": rng.exponential(0.0005, n),
+        "dns_rate": rng.poisson(2, n).astype(float),
+        "protocol": np.zeros(n, dtype=int),
+    }
+
+
+def _slow_rate(rng, n):
+    # Slowloris-style: small TCP packets trickling in on long-held connections
+    return {
+        "packet_length": rng.uniform(60, 120, n),
+        "inter_arrival_time": rng.uniform(10, 30, n),
+        "dns_rate": rng.poisson(1, n).astype(float),
+        "protocol": np.zeros(n, dtype=int),
+    }
+
+
+def _dns_amplification(rng, n):
+    # Large UDP responses arriving fast with a very high DNS rate
+    return {
+        "packet_length": np.clip(rng.normal(3500, 400, n), 512, 4096),
+        "inter_arrival_time": rng.exponential(0.002, n),
+        "dns_rate": rng.poisson(500, n).astype(float),
+        "protocol": np.ones(n, dtype=int),
+    }
+
+
+ATTACKS = {
+    "syn_flood": _syn_flood,
+    "slow_rate": _slow_rate,
+    "dns_amplification": _dns_amplification,
+}
+
+
+class TrafficSimulator:
+    """Seeded, vectorised traffic generator.
+
+    ``batch(n)`` returns ``n`` packets with ``_time``, ``packet_length``
+    (float32), ``inter_arrival_time``, ``dns_rate``, ``protocol`` and ``label``
+    (1 = attack). Timestamps follow a simulated clock advanced by the
+    inter-arrival times, so the data is reproducible for a given seed.
+    """
+
+    def __init__(self, profile="baseline", seed=42, start=None, attack_ratio=None, mean_burst=None):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown profile '{profile}', expected one of {list(PROFILES)}")
+        self.profile = profile
+        self.attack_ratio = PROFILES[profile]["attack_ratio"] if attack_ratio is None else attack_ratio
+        self.mean_burst = PROFILES[profile]["mean_burst"] if mean_burst is None else mean_burst
+        self.rng = np.random.default_rng(seed)
+        start = pd.Timestamp.now(tz="UTC") if start is None else pd.Timestamp(start)
+        self.clock = start.tz_convert("UTC") if start.tzinfo else start.tz_localize("UTC")
+        self._in_attack = False
+
+    def _attack_mask(self, n):
+        """On/off burst pattern with geometric segment lengths."""
+        if self.attack_ratio <= 0 or self.profile not in ATTACKS:
+            return np.zeros(n, dtype=bool)
+        mean_on = self.mean_burst
+        mean_off = mean_on * (1 - self.attack_ratio) / self.attack_ratio
+        segments = max(2, int(2 * n / (mean_on + mean_off)) + 2)
+        on = self.rng.geometric(1 / mean_on, segments)
+        off = self.rng.geometric(1 / max(mean_off, 1), segments)
+        lengths = np.column_stack([on, off]).ravel() if self._in_attack else np.column_stack([off, on]).ravel()
+        while lengths.sum() < n:
+            lengths = np.concatenate([lengths, lengths])
+        states = np.tile([self._in_attack, not self._in_attack], len(lengths) // 2)
+        mask = np.repeat(states, lengths)[:n]
+        self._in_attack = bool(mask[-1])
+        return mask
+
+    def batch(self, n):
+        mask = self._attack_mask(n)
+        cols = _baseline(self.rng, n)
+        k = int(mask.sum())
+        if k:
+            attack = ATTACKS[self.profile](self.rng, k)
+            for c in cols:
+                cols[c][mask] = attack[c]
+
+        offsets = np.cumsum(cols["inter_arrival_time"])
+        times = self.clock + pd.to_timedelta(offsets, unit="s")
+        self.clock = times[-1]
+        return pd.DataFrame({
+            "_time": times,
+            "packet_length": cols["packet_length"].astype(np.float32),
+            "inter_arrival_time": cols["inter_arrival_time"],
+            "dns_rate": cols["dns_rate"],
+            "protocol": pd.Categorical.from_codes(cols["protocol"], PROTOCOLS),
+            "label": mask.astype(np.int8),
+        })
+
+
+# --- Sinks ---
+def local_influx_sink(store, bucket="realtime_dns", measurement="dns"):
+    """Write batches straight into a ``local_influx.LocalInflux`` store."""
+    def sink(df):
+        out = df.copy()
+        out["protocol"] = out["protocol"].astype(str)
+        store.write_frame(bucket, measurement, out)
+    return sink
+
+
+def influx_sink(write_api, bucket="realtime_dns", measurement="dns"):
+    """Write batches through an influxdb_client write API (real or stand-in)."""
+    def sink(df):
+        out = df.set_index("_time")
+        out["protocol"] = out["protocol"].astype(str)
+        write_api.write(bucket=bucket, record=out, data_frame_measurement_name=measurement,
+                        data_frame_tag_columns=["protocol"])
+    return sink
+
+
+def predict_sink(client, features=("inter_arrival_time", "dns_rate")):
+    """Score batches through ``predict_api.PredictionClient.predict_batch``."""
+    def sink(df):
+        client.predict_batch(df, list(features))
+    return sink
+
+
+# --- Rate-Controlled Streaming ---
+def stream(simulator, sink, rate=10000, duration=10.0, batch_size=5000):
+    """Generate ``rate`` points/sec for ``duration`` seconds into ``sink``.
+
+    Batches are paced against a start time, so a slow sink lowers the achieved
+    rate instead of building up a backlog. Returns throughput stats.
+    """
+    start = time.perf_counter()
+    sent = 0
+    sink_time = 0.0
+    while time.perf_counter() - start < duration:
+        batch = simulator.batch(batch_size)
+        t0 = time.perf_counter()
+        sink(batch)
+        sink_time += time.perf_counter() - t0
+        sent += len(batch)
+        ahead = start + sent / rate - time.perf_counter()
+        if ahead > 0:
+            time.sleep(ahead)
+    elapsed = time.perf_counter() - start
+    return {
+        "profile": simulator.profile,
+        "points": sent,
+        "elapsed_sec": elapsed,
+        "target_rate": rate,
+        "achieved_rate": sent / elapsed if elapsed else 0.0,
+        "sink_sec": sink_time,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline DoS/DNS traffic load generator")
+    parser.add_argument("--profile", choices=list(PROFILES), default="baseline")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--rate", type=float, default=20000, help="target points per second")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--sink", choices=["local", "influx", "predict"], default="local")
+    parser.add_argument("--url", help="InfluxDB or prediction API URL for the influx/predict sinks")
+    parser.add_argument("--bucket", default="realtime_dns")
+    parser.add_argument("--measurement", default="dns")
+    args = parser.parse_args()
+
+    sim = TrafficSimulator(args.profile, seed=args.seed)
+    if args.sink == "local":
+        from local_influx import LocalInflux
+        target = local_influx_sink(LocalInflux(), args.bucket, args.measurement)
+    elif args.sink == "influx":
+        from influxdb_client import InfluxDBClient
+        from influxdb_client.client.write_api import SYNCHRONOUS
+        from influx import INFLUXDB_ORG, INFLUXDB_TOKEN, INFLUXDB_URL
+        client = InfluxDBClient(url=args.url or INFLUXDB_URL, token=INFLUXDB_TOKEN, org=INFLUXDB_ORG)
+        target = influx_sink(client.write_api(write_options=SYNCHRONOUS), args.bucket, args.measurement)
+    else:
+        from predict_api import PredictionClient
+        target = predict_sink(PredictionClient(args.url or "http://localhost:8000/predict"))
+
+    print(json.dumps(stream(sim, target, args.rate, args.duration, args.batch_size), indent=2))
@@ -3,35 +3,64 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler
-from influxdb_client import InfluxDBClient
-import plotly.express as px
+from influx import IncrementalFetcher
+from detection import DetectionEngine
+from worker import ResultHub, session_id
+from instrumentation import metrics, render_pipeline_health
+from rendering import downsample, downsample_caption, line_figure
 
 # --- Streamlit Page Setup ---
 st.set_page_config(page_title="📡 DNS Anomaly Detection", layout="wide")
 st.title("📡 Real-Time DNS Anomaly Detection using Isolation Forest")
 
-# --- InfluxDB Configuration ---
-INFLUXDB_URL = "https://us-east-1-1.aws.cloud2.influxdata.com"
-INFLUXDB_TOKEN = "6gjE97dCC24hgOgWNmRXPqOS0pfc0pMSYeh5psL8e5u2T8jGeV1F17CU-U1z05if0jfTEmPRW9twNPSXN09SRQ=="
-INFLUXDB_ORG = "Anormally Detection"
-INFLUXDB_BUCKET = "realtime_dns"
-
 # --- Query DNS Data from InfluxDB ---
-client = InfluxDBClient(url=INFLUXDB_URL, token=INFLUXDB_TOKEN, org=INFLUXDB_ORG)
-query_api = client.query_api()
-
-query = f"""
-from(bucket: "{INFLUXDB_BUCKET}")
-|> range(start: -5m)
-|> filter(fn: (r) => r["_measurement"] == "dns")
-|> pivot(rowKey:["_time"], columnKey: ["_field"], valueColumn: "_value")
-"""
-
-df = query_api.query_data_frame(query)
-df = pd.concat(df, ignore_index=True) if isinstance(df, list) else df
-df = df.dropna().reset_index(drop=True)
+features = ["dns_rate", "inter_arrival_time"]
+
+@st.cache_resource
+def get_fetcher():
+    return IncrementalFetcher("dns", window="5m", fields=[])
+
+@st.cache_resource
+def get_scores_fetcher():
+    # Points already scored and written back by new.py's worker
+    return IncrementalFetcher("anomaly_scores", window="5m")
+
+@st.cache_resource
+def load_engine():
+    return DetectionEngine(features, contamination=0.05, retrain_interval=300)
+
+@st.cache_resource
+def get_hub():
+    return ResultHub()
+
+engine = load_engine()
+hub = get_hub()
+
+def fetch_and_score():
+    df = get_fetcher().fetch()
+    with metrics.timer("preprocess", rows=len(df)):
+        df = df.dropna().reset_index(drop=True)
+    if not df.empty and all(f in df.columns for f in features):
+        # Vectorised label mapping: sklearn -1 (anomaly) -> 1, everything else -> 0
+        df["anomaly"] = np.where(engine.process(df) == -1, 1, 0)
+    return df
+
+def fetch_scores():
+    df = get_scores_fetcher().fetch()
+    if "anomaly" not in df.columns:
+        return df  # nothing scored yet in the window
+    return df.dropna(subset=["anomaly"]).reset_index(drop=True)
+
+use_precomputed = st.sidebar.checkbox("📥 Read precomputed scores", value=False,
+                                      help="Read the anomaly_scores measurement instead of re-scoring here")
+
+# Every session shares one fetch + score per refresh window
+if use_precomputed:
+    df = hub.get("influx:anomaly_scores", "5m", session_id(st.session_state), fetch_scores, max_age=3)
+else:
+    df = hub.get("influx:dns", "5m", session_id(st.session_state), fetch_and_score, max_age=3)
+st.sidebar.metric("👥 Viewers", hub.subscriber_count())
+st.sidebar.metric("🎯 Cache Hit Rate", f"{hub.hit_rate:.0%}")
 st.subheader("🧾 Available Columns from InfluxDB")
 st.write(df.columns.tolist())
 
@@ -43,29 +72,36 @@ if df.empty:
 # --- Isolation Forest Anomaly Detection ---
 st.subheader("🧠 Anomaly Detection on Fields: dns_rate, inter_arrival_time")
 
-features = ["dns_rate", "inter_arrival_time"]
 if not all(f in df.columns for f in features):
     st.error("Required fields not found in data.")
     st.write("Available columns:", df.columns.tolist())
     st.stop()
 
-X = df[features]
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
-
-model = IsolationForest(contamination=0.05, random_state=42)
-df["anomaly"] = model.fit_predict(X_scaled)
-df["anomaly"] = df["anomaly"].apply(lambda x: 1 if x == -1 else 0)
+if not use_precomputed:
+    col1, col2 = st.columns(2)
+    col1.metric("⏱ Scoring Latency (s)", f"{engine.score_latency:.4f}")
+    col2.metric("🏋️ Training Latency (s)", f"{engine.train_latency:.4f}")
 
 # --- Visualization: dns_rate over time ---
 st.subheader("📈 DNS Rate with Anomaly Overlay")
 
-fig = px.line(df, x="_time", y="dns_rate",
-              color=df["anomaly"].map({1: "Anomaly", 0: "Normal"}),
-              title="DNS Rate with Detected Anomalies",
-              labels={"_time": "Time", "dns_rate": "DNS Rate"})
-st.plotly_chart(fig, use_container_width=True)
+with metrics.timer("render", rows=len(df)):
+    # Bounded payload: LTTB-reduced line, every anomaly kept, WebGL when large
+    plot_df = downsample(df, "dns_rate", x="_time", keep=df["anomaly"] == 1)
+    fig = line_figure(plot_df, "_time", "dns_rate", anomaly="anomaly",
+                      title="DNS Rate with Detected Anomalies",
+                      labels={"_time": "Time", "dns_rate": "DNS Rate"})
+    st.plotly_chart(fig, use_container_width=True)
+    caption = downsample_caption(len(plot_df), len(df))
+    if caption:
+        st.caption(caption)
+
+    # --- Show Recent Records ---
+    st.subheader("🔍 Recent Records")
+    columns = [c for c in ["_time", "dns_rate", "inter_arrival_time", "packet_length", "score", "anomaly"]
+               if c in df.columns]
+    st.dataframe(df[columns].tail(10))
+
+with st.expander("🩺 Pipeline Health"):
+    render_pipeline_health({"Result hub": hub})
 
-# --- Show Recent Records ---
-st.subheader("🔍 Recent Records")
-st.dataframe(df[["_time", "dns_rate", "inter_arrival_time", "packet_length", "anomaly"]].tail(10))
@@ -0,0 +1,178 @@
+import threading
+
+import numpy as np
+
+# --- Streaming Thresholds ---
+# Anomaly thresholds taken from a running quantile of the scores themselves
+# (reconstruction_error, IsolationForest score_samples, ...) instead of a
+# fixed constant or a contamination fraction. Quantiles are tracked with the
+# P² algorithm: five markers per estimator, O(1) work per point and no
+# stored history.
+#
+#   threshold = StreamingThreshold(0.99, window=5000)
+#   flags, value = threshold.screen(result["reconstruction_error"])
+
+
+class P2Quantile:
+    """P² estimate of the ``q`` quantile of a stream (Jain & Chlamtac, 1985).
+
+    Keeps five marker heights and positions; each point moves the markers by
+    at most one position with a piecewise-parabolic height correction.
+    """
+
+    def __init__(self, q):
+        if not 0 < q < 1:
+            raise ValueError(f"Quantile must be in (0, 1), got {q}")
+        self.q = q
+        self.count = 0
+        self._initial = []
+        self._heights = None
+        self._positions = None
+        self._desired = None
+        self._increments = np.array([0.0, q / 2, q, (1 + q) / 2, 1.0])
+
+    @property
+    def value(self):
+        if self._heights is not None:
+            return float(self._heights[2])
+        if not self._initial:
+            return None
+        # Fewer than five points: exact quantile of what has been seen
+        return float(np.quantile(self._initial, self.q))
+
+    def add(self, x):
+        self.count += 1
+        if self._heights is None:
+            self._initial.append(x)
+            if len(self._initial) == 5:
+                self._heights = sorted(self._initial)
+                self._positions = [1, 2, 3, 4, 5]
+                self._desired = [1.0, 1 + 2 * self.q, 1 + 4 * self.q, 3 + 2 * self.q, 5.0]
+            return
+
+        h, n = self._heights, self._positions
+        if x < h[0]:
+            h[0] = x
+            k = 0
+        elif x >= h[4]:
+            h[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= h[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        for i in (1, 2, 3):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                # Parabolic prediction, falling back to linear if it would
+                # break the ordering of the markers
+                height = h[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (h[i] - h[i - 1]) / (n[i] - n[i - 1]))
+                if not h[i - 1] < height < h[i + 1]:
+                    height = h[i] + d * (h[i + d] - h[i]) / (n[i + d] - n[i])
+                h[i] = height
+                n[i] += d
+
+    def update(self, values):
+        for x in np.asarray(values, dtype=float).ravel():
+            if np.isfinite(x):
+                self.add(float(x))
+        return self.value
+
+
+class StreamingThreshold:
+    """Adaptive cut-off at the ``q`` quantile of recent scores.
+
+    ``tail="upper"`` flags scores above the threshold (reconstruction error);
+    ``tail="lower"`` flags scores below it (IsolationForest ``score_samples``,
+    where lower is more abnormal). With ``window`` set, a fresh estimator
+    starts every ``window`` points and takes over once it has seen a full
+    window, so the threshold follows the last one to two windows of traffic.
+    No threshold is reported until ``warmup`` points have been seen.
+    """
+
+    def __init__(self, q=0.99, window=None, warmup=100, tail="upper"):
+        if tail not in ("upper", "lower"):
+            raise ValueError(f"tail must be 'upper' or 'lower', got {tail!r}")
+        self.q = q
+        self.window = window
+        self.warmup = warmup
+        self.tail = tail
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget every score, e.g. after the model producing them is retrained."""
+        with self._lock:
+            self._active = P2Quantile(self.q)
+            self._next = P2Quantile(self.q) if self.window else None
+            self.n_seen = 0
+
+    @property
+    def is_ready(self):
+        return self._active.count >= self.warmup
+
+    @property
+    def value(self):
+        return self._active.value if self.is_ready else None
+
+    def _learn(self, values, stride=1):
+        # Only every ``stride``-th value reaches the estimators; ``window``
+        # counts the values they learn
+        learned = values[::stride]
+        self._active.update(learned)
+        if self._next is not None:
+            self._next.update(learned)
+            if self._next.count >= self.window:
+                self._active, self._next = self._next, P2Quantile(self.q)
+        self.n_seen += len(values)
+
+    def update(self, values):
+        """Fold ``values`` into the estimate and return the new threshold."""
+        values = np.atleast_1d(np.asarray(values, dtype=float))
+        with self._lock:
+            self._learn(values)
+            return self.value
+
+    def flag(self, values, threshold):
+        values = np.asarray(values, dtype=float)
+        return values < threshold if self.tail == "lower" else values > threshold
+
+    def screen(self, values, default=None, chunk_rows=None, max_learn=None):
+        """Return ``(flags, threshold)`` for ``values``, judged against the
+        threshold in force before they are learned. ``default`` stands in
+        while the estimator is warming up; without it nothing is flagged.
+
+        For large batches, ``chunk_rows`` judges each chunk against the
+        threshold learned from the chunks before it (``threshold`` is then
+        a per-row array, compared in one vectorised step) and ``max_learn``
+        learns only an evenly strided subsample of about that many values,
+        bounding the P² loop whatever the batch size.
+        """
+        values = np.atleast_1d(np.asarray(values, dtype=float))
+        n = len(values)
+        stride = -(-n // max_learn) if max_learn and n > max_learn else 1
+        with self._lock:
+            if not chunk_rows or n <= chunk_rows:
+                threshold = self.value if self.is_ready else default
+                if threshold is None:
+                    flags = np.zeros(n, dtype=bool)
+                else:
+                    flags = self.flag(values, threshold)
+                self._learn(values, stride)
+                return flags, threshold
+
+            threshold = np.empty(n)
+            for start in range(0, n, chunk_rows):
+                current = self.value if self.is_ready else default
+                threshold[start:start + chunk_rows] = np.nan if current is None else current
+                self._learn(values[start:start + chunk_rows], stride)
+        # NaN (no threshold yet) compares False, so those rows aren't flagged
+        return self.flag(values, threshold), threshold
@@ -0,0 +1,222 @@
+import threading
+import time
+import uuid
+from collections import deque
+
+
+# --- Shared Result Store ---
+class ResultStore:
+    """Latest results published by a background worker.
+
+    Each publish gets a sequence number; readers keep the last number they saw
+    and call ``since()`` to pick up only the batches published after it.
+    """
+
+    def __init__(self, history=100):
+        self._batches = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self.seq = 0
+        self.latest = None
+        self.updated_at = None
+        self.error = None
+        self.failures = 0
+
+    def publish(self, result):
+        with self._lock:
+            self.seq += 1
+            self._batches.append((self.seq, result))
+            self.latest = result
+            self.updated_at = time.time()
+            self.error = None
+            return self.seq
+
+    def fail(self, error):
+        with self._lock:
+            self.error = error
+            self.failures += 1
+
+    @property
+    def calls(self):
+        """Backend calls behind this store: every publish or failure."""
+        return self.seq + self.failures
+
+    def snapshot(self):
+        with self._lock:
+            return self.seq, self.latest
+
+    def since(self, seq):
+        """Return ``(latest_seq, [results published after seq])``."""
+        with self._lock:
+            return self.seq, [r for s, r in self._batches if s > seq]
+
+
+# --- Background Worker ---
+class IngestionWorker(threading.Thread):
+    """Daemon thread that calls ``step()`` every ``interval`` seconds and
+    publishes whatever it returns (``None`` is skipped) to ``store``.
+
+    ``step`` does the ingest + score work; page reruns only read the store.
+    Start one per process from ``st.cache_resource``. With ``active`` (e.g.
+    "the topic has subscribers") steps are skipped while it returns False,
+    so nobody watching means no backend calls.
+    """
+
+    def __init__(self, step, interval=3.0, store=None, name="ingestion-worker", active=None):
+        super().__init__(name=name, daemon=True)
+        self.step = step
+        self.interval = interval
+        self.active = active
+        self.store = store or ResultStore()
+        self.last_step_latency = 0.0
+        self._stop_event = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            if self._running.is_set() and not self.idle:
+                start = time.perf_counter()
+                try:
+                    result = self.step()
+                    if result is not None:
+                        self.store.publish(result)
+                except Exception as e:
+                    self.store.fail(e)
+                self.last_step_latency = time.perf_counter() - start
+            self._stop_event.wait(self.interval)
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    @property
+    def idle(self):
+        return self.active is not None and not self.active()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def start_worker(step, interval=3.0, store=None, name="ingestion-worker", paused=False, active=None):
+    worker = IngestionWorker(step, interval=interval, store=store, name=name, active=active)
+    if paused:
+        worker.pause()
+    worker.start()
+    return worker
+
+
+# --- Process-wide Pub/Sub Cache ---
+def session_id(state):
+    """Stable id for a Streamlit session, kept in its ``st.session_state``."""
+    if "session_id" not in state:
+        state["session_id"] = uuid.uuid4().hex
+    return state["session_id"]
+
+
+class ResultHub:
+    """One ``ResultStore`` per ``(source, window)`` shared by every session.
+
+    Sessions subscribe with an id and either read what a background worker
+    publishes (``read``) or go through ``get``, which recomputes at most once
+    per ``max_age`` no matter how many sessions ask. Subscriber counts and the
+    hit rate are kept so backend load can be checked against viewer count:
+    every read is a hit unless it cost a backend call (a worker step or a
+    ``get`` recompute), so one viewer polling as often as the worker steps
+    scores 0% and N viewers sharing it score ``1 - 1/N``.
+    """
+
+    def __init__(self, subscriber_ttl=60):
+        self.subscriber_ttl = subscriber_ttl
+        self.reads = 0
+        self._topics = {}
+        self._key_locks = {}
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def topic(self, source, window):
+        key = (source, window)
+        with self._lock:
+            if key not in self._topics:
+                self._topics[key] = ResultStore()
+                self._key_locks[key] = threading.Lock()
+                self._subscribers[key] = {}
+            return self._topics[key]
+
+    def subscribe(self, source, window, subscriber):
+        """Register (or refresh) ``subscriber`` on a topic and return its store."""
+        store = self.topic(source, window)
+        with self._lock:
+            self._subscribers[(source, window)][subscriber] = time.time()
+        return store
+
+    def unsubscribe(self, source, window, subscriber):
+        """Drop ``subscriber`` from a topic now rather than after the TTL."""
+        with self._lock:
+            self._subscribers.get((source, window), {}).pop(subscriber, None)
+
+    def _count_read(self):
+        with self._lock:
+            self.reads += 1
+
+    def read(self, source, window, subscriber):
+        """Latest ``(seq, result)`` published on a topic by a worker."""
+        self._count_read()
+        return self.subscribe(source, window, subscriber).snapshot()
+
+    def since(self, source, window, subscriber, seq):
+        """Batches published on a topic after ``seq``; see ``ResultStore.since``."""
+        self._count_read()
+        return self.subscribe(source, window, subscriber).since(seq)
+
+    def get(self, source, window, subscriber, compute, max_age=3.0):
+        """Cached result for the topic, calling ``compute()`` only when the
+        cached one is older than ``max_age`` seconds. Concurrent callers wait
+        for the one computing instead of computing again."""
+        self._count_read()
+        store = self.subscribe(source, window, subscriber)
+        with self._key_locks[(source, window)]:
+            if store.latest is not None and time.time() - store.updated_at < max_age:
+                return store.latest
+            try:
+                result = compute()
+            except Exception as e:
+                store.fail(e)
+                raise
+            store.publish(result)
+            return result
+
+    def subscriber_count(self, source=None, window=None):
+        cutoff = time.time() - self.subscriber_ttl
+        with self._lock:
+            for subs in self._subscribers.values():
+                for sid in [s for s, seen in subs.items() if seen < cutoff]:
+                    del subs[sid]
+            if source is not None:
+                return len(self._subscribers.get((source, window), {}))
+            return len({s for subs in self._subscribers.values() for s in subs})
+
+    @property
+    def backend_calls(self):
+        with self._lock:
+            return sum(store.calls for store in self._topics.values())
+
+    @property
+    def hit_rate(self):
+        """Share of reads served without a backend call of their own."""
+        reads = self.reads
+        return max(0.0, 1 - self.backend_calls / reads) if reads else 0.0
+
+    def stats(self):
+        return {
+            "topics": len(self._topics),
+            "subscribers": self.subscriber_count(),
+            "reads": self.reads,
+            "backend_calls": self.backend_calls,
+            "hit_rate": self.hit_rate,
+        }
@@ -0,0 +1,228 @@
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import metrics
+
+# --- Asynchronous Write-Back ---
+# Scored points and telemetry are queued from the request/worker path and
+# written to InfluxDB by one background thread in large batches. The queue is
+# bounded: when it is full, or InfluxDB is unreachable, batches go to an
+# on-disk line-protocol spool that is replayed once writes succeed again.
+#
+#   writer = ResultWriter(influx_writer(write_api), bucket="realtime_dns")
+#   writer.submit_scores(df, model_version=engine.model_version)
+
+
+def _escape_tag(value):
+    return str(value).replace("\\", "\\\\").replace(",", "\\,").replace("=", "\\=").replace(" ", "\\ ")
+
+
+def scores_to_lines(df, measurement="anomaly_scores", tags=None, fields=(), time_col="_time",
+                    anomaly_label=1):
+    """Encode scored rows as line protocol, vectorised over the frame.
+
+    ``anomaly`` is written as an integer flag (1 where the column equals
+    ``anomaly_label``; pass ``-1`` for sklearn labels), ``score`` and any
+    extra ``fields`` as floats. Rows without a label are skipped.
+    """
+    if df.empty or "anomaly" not in df.columns:
+        return []
+    df = df[df["anomaly"].notna()]
+    if df.empty:
+        return []
+    key = measurement + "".join(f",{k}={_escape_tag(v)}" for k, v in sorted((tags or {}).items()) if v is not None)
+
+    flag = (df["anomaly"] == anomaly_label).astype(int).astype(str)
+    body = "anomaly=" + flag + "i"
+    for col in ["score", *fields]:
+        if col in df.columns:
+            values = df[col].astype(float)
+            part = ("," + col + "=" + values.map(repr)).where(np.isfinite(values), "")
+            body = body + part
+    ns = pd.to_datetime(df[time_col], utc=True).dt.as_unit("ns").astype("int64").astype(str)
+    return (key + " " + body + " " + ns).tolist()
+
+
+def influx_writer(write_api):
+    """Adapt a synchronous ``influxdb_client`` write API to ``write(bucket, lines)``."""
+    def write(bucket, lines):
+        write_api.write(bucket=bucket, record="\n".join(lines))
+    return write
+
+
+class ResultWriter:
+    """Bounded, batched, non-blocking writer with an on-disk spool.
+
+    ``submit_*`` calls only enqueue. A daemon thread flushes whenever
+    ``batch_size`` lines are pending or ``flush_interval`` seconds have passed.
+    A full queue (after waiting up to ``block_timeout``) or a failed write
+    spools the lines under ``spool_dir`` instead of dropping them; the spool
+    is capped at ``max_spool_bytes`` by discarding its oldest files.
+
+    ``write(bucket=..., record=...)`` mirrors the ``influxdb_client`` write API,
+    so it can back ``instrumentation.influx_sink`` as well.
+    """
+
+    def __init__(self, write, bucket, measurement="anomaly_scores", batch_size=5000,
+                 flush_interval=5.0, max_pending=200, block_timeout=0.0,
+                 spool_dir="spool", max_spool_bytes=256 * 1024 * 1024):
+        self._write = write
+        self.bucket = bucket
+        self.measurement = measurement
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+        self.spool_dir = spool_dir
+        self.max_spool_bytes = max_spool_bytes
+
+        self.written = 0
+        self.spooled = 0
+        self.replayed = 0
+        self.failures = 0
+        self.last_error = None
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._stop_event = threading.Event()
+        self._spool_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="influx-writeback", daemon=True)
+        self._thread.start()
+
+    # --- Producer side ---
+    def submit_lines(self, lines, bucket=None):
+        """Queue line-protocol strings; never blocks longer than ``block_timeout``."""
+        if not lines:
+            return 0
+        item = (bucket or self.bucket, list(lines))
+        try:
+            if self.block_timeout:
+                self._queue.put(item, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(item)
+            metrics.incr("writeback.queued", len(item[1]))
+        except queue.Full:
+            # Backpressure: keep the request path moving and persist for later
+            metrics.incr("writeback.overflow", len(item[1]))
+            self._spool(*item)
+        return len(item[1])
+
+    def submit_scores(self, df, model_version=None, source=None, fields=(), time_col="_time",
+                      anomaly_label=1):
+        """Queue one results point per scored row of ``df``."""
+        tags = {"model_version": model_version, "source": source}
+        return self.submit_lines(scores_to_lines(df, self.measurement, tags, fields, time_col, anomaly_label))
+
+    def write(self, bucket=None, record=None, **kwargs):
+        records = record if isinstance(record, (list, tuple)) else [record]
+        lines = [r if isinstance(r, str) else r.to_line_protocol() for r in records if r is not None]
+        return self.submit_lines(lines, bucket)
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def spool_files(self):
+        if not os.path.isdir(self.spool_dir):
+            return []
+        return sorted(os.path.join(self.spool_dir, f) for f in os.listdir(self.spool_dir) if f.endswith(".lp"))
+
+    def stats(self):
+        return {
+            "pending": self.pending,
+            "written": self.written,
+            "spooled": self.spooled,
+            "replayed": self.replayed,
+            "failures": self.failures,
+            "spool_files": len(self.spool_files()),
+            "last_error": None if self.last_error is None else str(self.last_error),
+        }
+
+    # --- Writer thread ---
+    def _run(self):
+        batches = {}
+        size = 0
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                bucket, lines = self._queue.get(timeout=timeout)
+                batches.setdefault(bucket, []).extend(lines)
+                size += len(lines)
+            except queue.Empty:
+                pass
+            stopping = self._stop_event.is_set()
+            if size >= self.batch_size or time.monotonic() >= deadline or (stopping and self._queue.empty()):
+                for bucket, lines in batches.items():
+                    self._flush(bucket, lines)
+                if not batches and not stopping:
+                    # Idle tick: retry the spool in case InfluxDB is back
+                    self._replay()
+                batches, size = {}, 0
+                deadline = time.monotonic() + self.flush_interval
+                if stopping and self._queue.empty():
+                    return
+
+    def _flush(self, bucket, lines):
+        for start in range(0, len(lines), self.batch_size):
+            chunk = lines[start:start + self.batch_size]
+            try:
+                with metrics.timer("writeback", rows=len(chunk)):
+                    self._write(bucket, chunk)
+                self.written += len(chunk)
+            except Exception as e:
+                self.failures += 1
+                self.last_error = e
+                self._spool(bucket, lines[start:])
+                return
+        self.last_error = None
+        self._replay()
+
+    # --- Spool ---
+    def _spool(self, bucket, lines):
+        with self._spool_lock:
+            os.makedirs(os.path.join(self.spool_dir, "tmp"), exist_ok=True)
+            name = f"{time.time_ns()}-{threading.get_ident()}.lp"
+            tmp = os.path.join(self.spool_dir, "tmp", name)
+            with open(tmp, "w") as f:
+                f.write(f"# bucket={bucket}\n")
+                f.write("\n".join(lines) + "\n")
+            os.replace(tmp, os.path.join(self.spool_dir, name))
+            self.spooled += len(lines)
+            metrics.incr("writeback.spooled", len(lines))
+            self._trim_spool()
+
+    def _trim_spool(self):
+        files = self.spool_files()
+        total = sum(os.path.getsize(f) for f in files)
+        while files and total > self.max_spool_bytes:
+            oldest = files.pop(0)
+            total -= os.path.getsize(oldest)
+            os.remove(oldest)
+            metrics.incr("writeback.spool_dropped")
+
+    def _replay(self):
+        """Resend spooled batches oldest-first; stop at the first failure."""
+        for path in self.spool_files():
+            with open(path) as f:
+                header, *lines = f.read().splitlines()
+            bucket = header.split("=", 1)[1]
+            try:
+                for start in range(0, len(lines), self.batch_size):
+                    self._write(bucket, lines[start:start + self.batch_size])
+            except Exception as e:
+                self.failures += 1
+                self.last_error = e
+                return
+            os.remove(path)
+            self.replayed += len(lines)
+            self.written += len(lines)
+            self.last_error = None
+
+    def close(self, timeout=10.0):
+        """Flush what is queued, then stop the writer thread."""
+        self._stop_event.set()
+        self._thread.join(timeout)